@@ -1,51 +1,105 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_wtf.csrf import CSRFProtect
 from flask_bootstrap import Bootstrap
 from flask_moment import Moment
-from peewee import SqliteDatabase
 
 from app.config import config
 from app.error_handlers import page_not_found, internal_server_error
-from app.base_model import database_proxy
+from app.base_model import database_proxy, InstrumentedSqliteDatabase
+from app.versions import DataVersion
+from app.weather.models import WeatherObservation, WeatherRollup
+from app.weather.countries import country_table
 from app.auth.utils import login_manager
+from app.compression import init_app as init_app_compression
+from app.assets import init_app as init_app_assets
+from app.api.serializers import init_app as init_app_serializers
 from app.api.weather.cities import init_app as init_app_cities
+from app.fragment_cache import init_app as init_app_fragment_cache
+from app.auth.avatars import init_app as init_app_avatars
+from app.auth.passwords import init_app as init_app_passwords
+from app.auth.throttle import init_app as init_app_throttle
+from app.storage import init_app as init_app_storage
+from app.proxy.media_cache import init_app as init_app_media_proxy
+from app.proxy.sprites import init_app as init_app_flag_sprite
+from app.metrics import init_app as init_app_metrics
+from app.slow_queries import init_app as init_app_slow_queries
+from app.profiling import init_app as init_app_profiling
+from app.tracing import init_app as init_app_tracing
+from app.jobs import init_app as init_app_jobs
+from weather.response_store import response_store
+from weather.weather_cache import weather_cache
+from weather.getting_weather import configure as configure_weather_api
 
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.static_folder = 'static'
     app.config.from_object(config[config_name])
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=app.config['PROXY_FIX_X_PROTO']
+        )
 
     app.register_error_handler(404, page_not_found)
     app.register_error_handler(500, internal_server_error)
 
     if config_name == 'testing':
-        db = SqliteDatabase(':memory:', pragmas={'foreign_keys': 1})
+        db = InstrumentedSqliteDatabase(':memory:', pragmas={'foreign_keys': 1})
     else:
-        db = SqliteDatabase(app.config['DB_NAME'], pragmas={'foreign_keys': 1})
+        db = InstrumentedSqliteDatabase(app.config['DB_NAME'], pragmas={'foreign_keys': 1, 'journal_mode': 'wal'})
 
     database_proxy.initialize(db)
+    country_table.clear()
+    db.create_tables([DataVersion, WeatherObservation, WeatherRollup])
     app.config['db'] = db
 
+    if app.config['WEATHER_STORE_PATH']:
+        response_store.initialize(app.config['WEATHER_STORE_PATH'])
+
+    weather_cache.configure(app.config['WEATHER_CACHE_TTL'], app.config['WEATHER_CACHE_SIZE'])
+    weather_cache.warm_up(response_store)
+    configure_weather_api(app.config['WEATHER_API_URL'])
+
     login_manager.init_app(app)
 
     csrf = CSRFProtect(app)
-    csrf.init_app(app)
     app.config['CSRF'] = csrf
 
+    # after_request handlers run in reverse order, compression sees final body of response
+    init_app_compression(app)
+    init_app_assets(app)
+    init_app_serializers(app)
     init_app_cities(app)
+    init_app_fragment_cache(app)
+    init_app_storage(app)
+    init_app_avatars(app)
+    init_app_passwords(app)
+    init_app_throttle(app)
+    init_app_media_proxy(app)
+    init_app_flag_sprite(app)
+    init_app_metrics(app)
+    init_app_slow_queries(app)
+    init_app_profiling(app)
+    init_app_tracing(app)
+    init_app_jobs(app)
 
     Bootstrap(app)
 
-    moment = Moment(app)
-    moment.init_app(app)
+    Moment(app)
 
     from app import main
     from app import weather
     from app import auth
+    from app import media
+    from app import proxy
+    from app import admin
 
     app.register_blueprint(main.main)
     app.register_blueprint(weather.weather)
     app.register_blueprint(auth.auth)
+    app.register_blueprint(media.media)
+    app.register_blueprint(proxy.proxy)
+    app.register_blueprint(admin.admin)
 
     return app
@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+
+import click
+from flask import (
+    Response, abort, current_app, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
+)
+from flask_login import current_user
+
+from app.admin import admin
+from app.auth.utils import check_permissions
+from app.profiling import ProfilerBusy, format_collapsed, memory_diff, sampling_profiler
+from app.slow_queries import slow_query_log
+from app.migrations import get_pending, migrate
+from app.transfer import FORMATS, TABLES, export_rows, get_format, import_rows
+from app.jobs import job_queue
+from app.assets import build_assets
+from weather.response_store import response_store
+
+
+@admin.before_request
+def check_admin():
+    """Admin pages are available for admins only"""
+    if not current_user.is_authenticated or not check_permissions(current_user.id):
+        flash('You don\'t have access to this page')
+        return redirect(url_for('main.index'))
+
+
+@admin.route('/slow-queries')
+def show_slow_queries():
+    """Slow queries grouped by shape"""
+    return render_template(
+        'admin/slow_queries.html',
+        title='Slow queries',
+        threshold=slow_query_log.threshold,
+        shapes=slow_query_log.report(),
+        recent=list(reversed(slow_query_log.recent))
+    )
+
+
+@admin.route('/slow-queries/clear', methods=['POST'])
+def clear_slow_queries():
+    slow_query_log.clear()
+    flash('Slow query log cleared')
+    return redirect(url_for('admin.show_slow_queries'))
+
+
+def get_seconds():
+    seconds = request.args.get('seconds', 10, type=float)
+    if not 0 < seconds <= current_app.config['PROFILER_MAX_SECONDS']:
+        abort(400)
+    return seconds
+
+
+@admin.route('/profile')
+def sample_stacks():
+    """Sample stacks of all threads for some seconds, flamegraph compatible output"""
+    seconds = get_seconds()
+    interval = request.args.get('interval', current_app.config['PROFILER_INTERVAL'], type=float)
+    try:
+        stacks = sampling_profiler.sample(seconds, max(interval, 0.001))
+    except ProfilerBusy as error:
+        return Response(f'{error}\n', status=409, content_type='text/plain; charset=utf-8')
+    return Response(format_collapsed(stacks), content_type='text/plain; charset=utf-8')
+
+
+@admin.route('/memory')
+def show_memory_diff():
+    """Allocation sites grown over some seconds"""
+    seconds = get_seconds()
+    limit = request.args.get('limit', 25, type=int)
+    frames = request.args.get('frames', 1, type=int)
+    return Response(memory_diff(seconds, limit, max(frames, 1)), content_type='text/plain; charset=utf-8')
+
+
+
+@admin.route('/transfer')
+def show_transfer():
+    """Export and import of users, profiles and monitored cities"""
+    return render_template('admin/transfer.html', title='Export and import', tables=TABLES, formats=FORMATS)
+
+
+@admin.route('/export/<table>.<file_format>')
+def export_table(table, file_format):
+    """Stream all rows of table as csv or ndjson file"""
+    if table not in TABLES or file_format not in FORMATS:
+        abort(404)
+    return Response(
+        stream_with_context(export_rows(TABLES[table], file_format)),
+        content_type=FORMATS[file_format],
+        headers={'Content-Disposition': f'attachment; filename={table}.{file_format}'}
+    )
+
+
+@admin.route('/import/<table>', methods=['POST'])
+def import_table(table):
+    """Save uploaded csv or ndjson file and import it into table in background job"""
+    upload = request.files.get('file')
+    if table not in TABLES or upload is None or not upload.filename:
+        abort(400)
+    file_format = request.form.get('format') or get_format(upload.filename)
+    if file_format not in FORMATS:
+        abort(400)
+    folder = current_app.config['IMPORT_UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{uuid.uuid4().hex}.{file_format}')
+    upload.save(path)
+    job_id = job_queue.enqueue('import_table', {
+        'table': table, 'path': path, 'file_format': file_format,
+        'chunk_size': current_app.config['IMPORT_CHUNK_SIZE'],
+    })
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job': job_id, 'url': url_for('admin.show_job', job_id=job_id)}), 202
+    flash(f'Import of {upload.filename} into {table} queued')
+    return redirect(url_for('admin.show_jobs'))
+
+
+@admin.route('/countries/reload', methods=['POST'])
+def reload_countries():
+    """Load countries from json file in background job"""
+    job_queue.enqueue('reload_countries', unique=True)
+    flash('Reload of countries queued')
+    return redirect(url_for('admin.show_jobs'))
+
+
+@admin.route('/jobs')
+def show_jobs():
+    """Recent background jobs with progress and results"""
+    return render_template('admin/jobs.html', title='Background jobs', jobs=job_queue.recent())
+
+
+@admin.route('/jobs/<int:job_id>')
+def show_job(job_id):
+    """Background job with its result as json"""
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@admin.cli.command('migrate')
+@click.option('--pending', is_flag=True, help='List pending migrations without applying them.')
+def migrate_command(pending):
+    """Apply pending schema migrations to database"""
+    db = current_app.config['db']
+    if pending:
+        for name in get_pending(db):
+            click.echo(name)
+        return
+    try:
+        applied = migrate(db)
+    except Exception as error:
+        raise click.ClickException(str(error))
+    for name in applied:
+        click.echo(f'applied {name}')
+    click.echo(f'{len(applied)} migrations applied')
+
+
+@admin.cli.command('export')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.option('--format', 'file_format', type=click.Choice(sorted(FORMATS)), help='Defaults to output extension.')
+@click.option('-o', '--output', default='-', help='Output file, stdout by default.')
+def export_command(table, file_format, output):
+    """Stream rows of table to csv or ndjson file"""
+    file_format = file_format or get_format(output)
+    with click.open_file(output, 'w', encoding='utf-8', lazy=False) as output_file:
+        for chunk in export_rows(TABLES[table], file_format):
+            output_file.write(chunk)
+
+
+@admin.cli.command('import')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(sorted(FORMATS)), help='Defaults to file extension.')
+@click.option('--chunk-size', default=1000, help='Rows per transaction.')
+@click.option('--show-errors', default=20, help='Row errors to print.')
+def import_command(table, path, file_format, chunk_size, show_errors):
+    """Import csv or ndjson file into table in chunked transactions"""
+    with open(path, encoding='utf-8', newline='') as file:
+        report = import_rows(current_app.config['db'], TABLES[table], file, file_format or get_format(path), chunk_size)
+    for error in sorted(report.errors)[:show_errors]:
+        click.echo(f'line {error.line}: {error.message}', err=True)
+    click.echo(f'{report.inserted} rows imported, {report.failed} failed')
+    if report.failed:
+        raise SystemExit(1)
+
+
+@admin.cli.command('run-jobs')
+def run_jobs_command():
+    """Run queued background jobs in this process until queue is empty"""
+    click.echo(f'{job_queue.run_pending()} jobs run')
+
+
+@admin.cli.command('compact-weather-store')
+@click.option('--days', type=float, help='Keep responses of this many days, WEATHER_STORE_RETENTION by default.')
+@click.option('--vacuum', is_flag=True, help='Give freed pages back to file system.')
+def compact_weather_store_command(days, vacuum):
+    """Delete old weather responses, latest response of every city is kept"""
+    if not response_store.is_initialized:
+        raise click.ClickException('weather response store is disabled')
+    retention = current_app.config['WEATHER_STORE_RETENTION'] if days is None else days * 24 * 3600
+    deleted = response_store.compact(time.time() - retention, vacuum)
+    click.echo(f'{deleted} weather responses deleted')
+
+
+@admin.cli.command('export-weather-store')
+@click.option('-o', '--output', default='-', help='Output file, stdout by default.')
+def export_weather_store_command(output):
+    """Write stored weather responses as ndjson"""
+    with click.open_file(output, 'w', encoding='utf-8', lazy=False) as output_file:
+        exported = response_store.export(output_file)
+    click.echo(f'{exported} weather responses exported', err=True)
+
+
+@admin.cli.command('import-weather-files')
+@click.argument('path', type=click.Path(exists=True, file_okay=False))
+def import_weather_files_command(path):
+    """Import legacy per city json files into weather response store"""
+    imported = response_store.import_json_files(path)
+    click.echo(f'{len(imported)} weather responses imported')
+
+
+@admin.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static files into ASSETS_FOLDER"""
+    manifest = build_assets(
+        current_app.static_folder, current_app.config['ASSETS_FOLDER'], current_app.config['ASSETS_EXCLUDE']
+    )
+    compressed = sum(1 for asset in manifest.values() if asset['encodings'])
+    click.echo(f'{len(manifest)} assets built, {compressed} precompressed, restart server to serve them')
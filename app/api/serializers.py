@@ -0,0 +1,96 @@
+import json
+from typing import Callable, Dict, Optional
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+
+def stdlib_json(data) -> bytes:
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def fast_json(data) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def msgpack_dumps(data) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+JSON_BACKENDS = {'stdlib': stdlib_json}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = fast_json
+
+
+class Serializer:
+    """Encoders of API responses by mimetype, json is always available and is the default.
+
+    Json backend 'auto' picks orjson when it is installed, msgpack is offered when
+    msgpack package is installed.
+    """
+
+    def __init__(self):
+        self.encoders: Dict[str, Callable] = {}
+        self.configure()
+
+    def configure(self, json_backend: str = 'auto', msgpack_enabled: bool = True):
+        if json_backend == 'auto':
+            json_backend = 'orjson' if 'orjson' in JSON_BACKENDS else 'stdlib'
+        if json_backend not in JSON_BACKENDS:
+            raise ValueError(f'json backend {json_backend} is not available')
+        self.json_backend = json_backend
+        self.encoders = {JSON: JSON_BACKENDS[json_backend]}
+        if msgpack_enabled and msgpack is not None:
+            self.encoders[MSGPACK] = msgpack_dumps
+
+    @property
+    def mimetypes(self):
+        return list(self.encoders)
+
+    def negotiate(self) -> str:
+        """Mimetype of current request answer, json when client accepts nothing else"""
+        return request.accept_mimetypes.best_match(self.mimetypes, default=JSON)
+
+    def dumps(self, data, mimetype: str = JSON) -> bytes:
+        return self.encoders[mimetype](data)
+
+    def make_response(self, data, status: int = 200, headers: Optional[Dict] = None, mimetype: Optional[str] = None):
+        """Response with data encoded for accepted mimetype, varies by Accept header"""
+        mimetype = mimetype or self.negotiate()
+        response = current_app.response_class(self.dumps(data, mimetype), status=status, mimetype=mimetype)
+        response.headers.extend(headers or {})
+        if len(self.encoders) > 1:
+            response.vary.add('Accept')
+        return response
+
+
+serializer = Serializer()
+
+
+def make_api_response(data, status: int = 200, headers: Optional[Dict] = None):
+    return serializer.make_response(data, status, headers)
+
+
+def init_api(api):
+    """Use serializer for responses of resources returning plain data and for api errors"""
+    for mimetype in serializer.mimetypes:
+        api.representation(mimetype)(
+            lambda data, code, headers=None, mimetype=mimetype: serializer.make_response(data, code, headers, mimetype)
+        )
+
+
+def init_app(app):
+    serializer.configure(app.config['API_JSON_BACKEND'], app.config['API_MSGPACK_ENABLED'])
@@ -1,8 +1,13 @@
 from flask_restful import Api, Resource, reqparse
-from flask import make_response, jsonify
+from flask import make_response
 from flask import current_app
 
-from app.weather.models import City, Country
+from app.api.serializers import init_api, make_api_response, serializer
+from app.weather.models import City
+from app.weather.countries import country_table
+from app.api.weather.history import CityHistory
+from app.http_cache import conditional
+from app.versions import bump_version, get_version, CITIES_LIST
 from weather.getting_weather import main as getting_weather
 
 # /api/v1/cities/1
@@ -11,40 +16,47 @@ from weather.getting_weather import main as getting_weather
 # PUT = update_cities 204
 # DELETE = delete_all_cities 204
 
+CITY_FIELDS = ('id', 'name', 'country_id')
+
+
+def cities_version(resource):
+    """Version of cities list in negotiated format"""
+    return get_version(CITIES_LIST), serializer.negotiate()
+
 
 class Cities(Resource):
     """API for cities"""
     def __init__(self):
-        self.cities = None
         self.request = None
         self.api_key = current_app.config['WEATHER_API_KEY']
         self.regparse = reqparse.RequestParser()
         self.regparse.add_argument('name', type=str, required=True, location='json')
         self.regparse.add_argument('id', type=int, required=False, location='json')
 
+    @conditional(cities_version)
     def get(self):
-        """HTTP method GET"""
-        self.cities = City.select()
-        self.cities = self.prepare_cities_to_json()
-        return make_response(jsonify(self.cities), 200)
+        """HTTP method GET, rows are read as tuples without building model instances"""
+        rows = City.select(City.id, City.name, City.country).tuples()
+        return make_api_response([dict(zip(CITY_FIELDS, row)) for row in rows.iterator()])
 
     def post(self):
         """HTTP method POST"""
         self.request = self.regparse.parse_args()
         self.request.name = self.request.name.capitalize()
         city_weather = getting_weather(self.request.name, self.api_key)
-        if 'error' in city_weather:
-            return make_response(jsonify(city_weather), 500)
-        country = Country.select().where(Country.code == city_weather['country']).first()
+        if isinstance(city_weather, dict):
+            return make_api_response(city_weather, 500)
+        country = country_table.get(city_weather.country)
         city_check = City.select().where(City.name == self.request.name).first()
         if city_check:
             response = {'message': f'{self.request.name} already in database.'}
-            return make_response(jsonify(response), 200)
+            return make_api_response(response)
         city = City(
             name=self.request.name,
             country=country.id
         )
         city.save()
+        bump_version(CITIES_LIST)
         return make_response('', 201)
 
     def put(self):
@@ -53,34 +65,26 @@ class Cities(Resource):
         self.request.name = self.request.name.capitalize()
         if not self.request.id:
             response = {'message': 'field id is necessary.'}
-            return make_response(jsonify(response), 200)
+            return make_api_response(response)
         city = City.select().where(City.id == self.request.id).first()
         if not city:
             response = {'message': f'city with id {self.request.id} not found.'}
-            return make_response(jsonify(response), 200)
+            return make_api_response(response)
         city.name = self.request.name
         city.save()
+        bump_version(CITIES_LIST)
         return make_response('', 204)
 
     def delete(self):
         """HTTP method DELETE"""
         City.delete().execute()
+        bump_version(CITIES_LIST)
         return make_response('', 204)
 
-    def prepare_cities_to_json(self):
-        """Prepare cities for json format"""
-        cities = []
-        for city in self.cities:
-            city_temp = {
-                'id': city.id,
-                'name': city.name,
-                'country_id': city.country.id
-            }
-            cities.append(city_temp)
-        return cities
-
 
 def init_app(app):
     with app.app_context():
         api = Api(app, decorators=[current_app.config['CSRF'].exempt])
+        init_api(api)
         api.add_resource(Cities, '/api/v1/cities/')
+        api.add_resource(CityHistory, '/api/v1/cities/<string:city_name>/history/')
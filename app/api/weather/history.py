@@ -0,0 +1,83 @@
+from flask_restful import Resource, reqparse
+from flask import request as flask_request
+from peewee import fn
+
+from app.api.serializers import make_api_response, serializer
+from app.http_cache import conditional
+from app.weather.models import City, WeatherObservation
+from app.weather.history import (
+    RESOLUTIONS,
+    aggregate_observations,
+    get_observations,
+    get_rollups
+)
+
+# /api/v1/cities/<city_name>/history/?start=&end=&resolution=
+# GET = city weather history 200
+
+ROLLUP_FIELDS = (
+    'timestamp',
+    'samples',
+    'temperature_min',
+    'temperature_max',
+    'temperature_avg',
+    'wind_speed_min',
+    'wind_speed_max',
+    'wind_speed_avg'
+)
+OBSERVATION_FIELDS = ('timestamp', 'temperature', 'wind_speed', 'sky', 'latitude', 'longitude')
+
+
+def history_version(resource, city_name):
+    """Latest observation of city behind history response"""
+    latest = (
+        WeatherObservation
+        .select(fn.MAX(WeatherObservation.id))
+        .join(City)
+        .where(City.name == city_name.capitalize())
+        .scalar()
+    )
+    return city_name.capitalize(), sorted(flask_request.args.items()), latest, serializer.negotiate()
+
+
+class CityHistory(Resource):
+    """API for city weather history"""
+    def __init__(self):
+        self.regparse = reqparse.RequestParser()
+        self.regparse.add_argument('start', type=int, required=False, location='args')
+        self.regparse.add_argument('end', type=int, required=False, location='args')
+        self.regparse.add_argument('resolution', type=str, default='hour', location='args')
+        self.regparse.add_argument('bucket', type=int, required=False, location='args')
+
+    @conditional(history_version)
+    def get(self, city_name):
+        """HTTP method GET"""
+        request = self.regparse.parse_args()
+        city_id = City.select(City.id).where(City.name == city_name.capitalize()).scalar()
+        if city_id is None:
+            response = {'message': f'city {city_name.capitalize()} not found.'}
+            return make_api_response(response, 404)
+
+        if request.bucket:
+            observations = get_observations(city_id, request.start, request.end)
+            rows = aggregate_observations(observations, request.bucket)
+            fields = ROLLUP_FIELDS
+            resolution = f'{request.bucket}s'
+        elif request.resolution == 'raw':
+            rows = get_observations(city_id, request.start, request.end)
+            fields = OBSERVATION_FIELDS
+            resolution = request.resolution
+        elif request.resolution in RESOLUTIONS:
+            rows = get_rollups(city_id, request.resolution, request.start, request.end)
+            fields = ROLLUP_FIELDS
+            resolution = request.resolution
+        else:
+            response = {'message': f'resolution must be one of raw, {", ".join(RESOLUTIONS)}.'}
+            return make_api_response(response, 400)
+
+        response = {
+            'city': city_name.capitalize(),
+            'resolution': resolution,
+            'history': [dict(zip(fields, row)) for row in rows]
+        }
+        return make_api_response(response)
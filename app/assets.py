@@ -0,0 +1,144 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import mimetypes
+from typing import Dict, Iterable, Optional
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MANIFEST = 'manifest.json'
+PRECOMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ico')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def fingerprinted_name(filename: str, digest: str) -> str:
+    root, extension = os.path.splitext(filename)
+    return f'{root}.{digest}{extension}'
+
+
+def precompress(path: str, data: bytes, gzip_level: int = 9, brotli_quality: int = 11):
+    """Write .gz and .br variants next to path when they are smaller, returns written encodings"""
+    variants = {'gzip': gzip.compress(data, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=brotli_quality)
+    encodings = []
+    for encoding, compressed in sorted(variants.items()):
+        if len(compressed) < len(data):
+            with open(path + SUFFIXES[encoding], 'wb') as file:
+                file.write(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_assets(source: str, target: str, exclude: Iterable[str] = ()) -> Dict[str, Dict]:
+    """Copy static files to target under content hashed names with precompressed variants.
+
+    Files are built in temporary folder inside target and moved in when all of them are written,
+    manifest mapping original filename to built file and its encodings is replaced last. Files of
+    earlier builds are kept for pages and workers still using previous manifest.
+    """
+    exclude = tuple(path.strip('/') + '/' for path in exclude)
+    os.makedirs(target, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.build-', dir=target)
+    try:
+        manifest = {}
+        for root, _, filenames in os.walk(source):
+            for name in sorted(filenames):
+                filename = os.path.relpath(os.path.join(root, name), source).replace(os.sep, '/')
+                if filename.startswith(exclude):
+                    continue
+                with open(os.path.join(source, filename), 'rb') as file:
+                    data = file.read()
+                built = fingerprinted_name(filename, fingerprint(data))
+                path = os.path.join(staging, built)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as file:
+                    file.write(data)
+                encodings = []
+                if os.path.splitext(filename)[1].lower() in PRECOMPRESSED_EXTENSIONS:
+                    encodings = precompress(path, data)
+                manifest[filename] = {'path': built, 'encodings': encodings}
+        with open(os.path.join(staging, MANIFEST), 'w') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+
+        for root, _, filenames in os.walk(staging):
+            folder = os.path.join(target, os.path.relpath(root, staging))
+            os.makedirs(folder, exist_ok=True)
+            for name in filenames:
+                if root != staging or name != MANIFEST:
+                    os.replace(os.path.join(root, name), os.path.join(folder, name))
+        os.replace(os.path.join(staging, MANIFEST), os.path.join(target, MANIFEST))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return manifest
+
+
+class AssetManifest:
+    """Built assets of static folder, empty until assets are built"""
+
+    def __init__(self):
+        self.folder = None
+        self.files: Dict[str, Dict] = {}
+        self.built: Dict[str, Dict] = {}
+
+    def load(self, folder: Optional[str]) -> int:
+        self.folder = folder
+        self.files = {}
+        if folder and os.path.exists(os.path.join(folder, MANIFEST)):
+            with open(os.path.join(folder, MANIFEST)) as file:
+                self.files = json.load(file)
+        self.built = {
+            asset['path']: dict(asset, mimetype=mimetypes.guess_type(filename)[0])
+            for filename, asset in self.files.items()
+        }
+        return len(self.files)
+
+    def url_for(self, endpoint: str, **values):
+        """url_for of templates, static files are linked to their built versions"""
+        if endpoint == 'static' and values.get('filename') in self.files:
+            values['filename'] = self.files[values['filename']]['path']
+            endpoint = 'assets'
+        return url_for(endpoint, **values)
+
+
+asset_manifest = AssetManifest()
+
+
+def send_asset(filename):
+    """Built asset, precompressed when client accepts it, cached for good as name changes with content"""
+    asset = asset_manifest.built.get(filename)
+    if asset is None:
+        abort(404)
+    encoding = request.accept_encodings.best_match(asset['encodings']) if asset['encodings'] else None
+    response = send_from_directory(
+        asset_manifest.folder, filename + SUFFIXES.get(encoding, ''), mimetype=asset['mimetype'], max_age=None
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset['encodings']:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    asset_manifest.load(app.config['ASSETS_FOLDER'])
+    app.add_url_rule(f'{app.config["ASSETS_URL_PATH"]}/<path:filename>', 'assets', send_asset)
+    if asset_manifest.files:
+        app.jinja_env.globals['url_for'] = asset_manifest.url_for
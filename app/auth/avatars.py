@@ -0,0 +1,188 @@
+import io
+import os
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.storage import media_storage
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_SIZE = 16
+CHUNK_SIZE = 64 * 1024
+
+
+class AvatarError(ValueError):
+    """Uploaded avatar is rejected"""
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Detect image type from first bytes of file"""
+    for signature, image_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_type
+    return None
+
+
+def get_thumbnail_name(filename: str, size: int):
+    """Name of thumbnail of stored avatar"""
+    name, extension = os.path.splitext(filename)
+    return f'{name}_{size}{extension}'
+
+
+def save_avatar_stream(stream: BinaryIO, storage, allowed_types, max_size: int):
+    """Copy uploaded stream into storage under content hash name.
+
+    Type is checked on the first bytes and size while copying, so rejected uploads never
+    reach storage. Identical images are stored once. Returns stored filename.
+    """
+    header = stream.read(SNIFF_SIZE)
+    image_type = sniff_image_type(header)
+    if image_type not in allowed_types:
+        raise AvatarError('is not allowed image type')
+
+    digest = hashlib.sha256(header)
+    size = len(header)
+    descriptor, path_to_temp = tempfile.mkstemp(suffix='.part')
+    try:
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            temp_file.write(header)
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_size:
+                    raise AvatarError(f'is larger than {max_size // 1024} KB')
+                digest.update(chunk)
+                temp_file.write(chunk)
+
+        filename = f'{digest.hexdigest()}.{image_type}'
+        if not storage.exists(filename):
+            storage.save_file(filename, path_to_temp, f'image/{image_type}')
+    finally:
+        if os.path.exists(path_to_temp):
+            os.remove(path_to_temp)
+    return filename
+
+
+class LimitedFile:
+    """File of uploaded form part which refuses to grow past limit, caps bodies without Content-Length"""
+
+    def __init__(self, file, limit: int):
+        self.file = file
+        self.limit = limit
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestEntityTooLarge()
+        return self.file.write(data)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class UploadLimitRequest(Request):
+    """Request whose avatar upload is limited to avatar size before its body is read.
+
+    Form is parsed by csrf check before view runs, so limit is applied by request itself.
+    """
+
+    @property
+    def upload_limit(self) -> Optional[int]:
+        if self.endpoint != 'auth.upload_avatar':
+            return None
+        return current_app.config['AVATAR_MAX_SIZE'] + current_app.config['AVATAR_FORM_OVERHEAD']
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        return self.upload_limit or super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        limit = self.upload_limit
+        return stream if limit is None else LimitedFile(stream, limit)
+
+
+def make_thumbnails(storage, filename: str, sizes):
+    """Resize stored avatar into square thumbnails, skipped without Pillow"""
+    if Image is None:
+        return []
+    created = []
+    with Image.open(io.BytesIO(storage.read(filename))) as image:
+        image_format = image.format
+        for size in sizes:
+            thumbnail_name = get_thumbnail_name(filename, size)
+            if storage.exists(thumbnail_name):
+                continue
+            thumbnail = image.copy()
+            if image_format == 'JPEG' and thumbnail.mode != 'RGB':
+                thumbnail = thumbnail.convert('RGB')
+            thumbnail.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format=image_format)
+            storage.save_bytes(thumbnail_name, buffer.getvalue(), Image.MIME[image_format])
+            created.append(thumbnail_name)
+    return created
+
+
+class ThumbnailWorker:
+    """Pool of threads resizing avatars outside of request"""
+
+    def __init__(self):
+        self.executor = None
+
+    def configure(self, workers: int):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+
+    def submit(self, storage, filename: str, sizes):
+        return self.executor.submit(make_thumbnails, storage, filename, list(sizes))
+
+
+thumbnail_worker = ThumbnailWorker()
+
+
+def get_avatar_url(avatar: str, size: int, storage):
+    """Url of avatar resized to size when a thumbnail is ready"""
+    filename = storage.name_from_url(avatar)
+    if filename is not None:
+        thumbnail = get_thumbnail_name(filename, size)
+        if storage.exists(thumbnail):
+            return storage.url(thumbnail)
+        return avatar
+    if 'gravatar.com/avatar/' in avatar:
+        return avatar.split('&s=')[0] + f'&s={size}'
+    return avatar
+
+
+def init_app(app):
+    app.request_class = UploadLimitRequest
+    thumbnail_worker.configure(app.config['AVATAR_THUMBNAIL_WORKERS'])
+    if Image is None:
+        logger.warning('Pillow is not installed, avatars are served without pre-sized thumbnails')
+
+    @app.template_global()
+    def avatar_url(avatar: str, kind: str = 'profile'):
+        sizes: Dict[str, int] = app.config['AVATAR_SIZES']
+        return get_avatar_url(avatar, sizes[kind], media_storage)
@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, HiddenField
 from wtforms.validators import DataRequired, Length, Email, Regexp, EqualTo
-from wtforms import ValidationError
+from peewee import fn
 from app.auth.models import User
 
 
@@ -45,10 +45,25 @@ class RegisterForm(FlaskForm):
         validators=[DataRequired()])
     submit = SubmitField('Register')
 
-    def validate_email(self, field):
-        if User.select().where(User.email == field.data).first():
-            raise ValidationError('Email already registered.')
+    def validate(self, extra_validators=None):
+        """Field validators, then one indexed query for taken email and username"""
+        if not super().validate(extra_validators):
+            return False
+        email = self.email.data.lower()
+        username = self.username.data.lower()
+        taken = (
+            User
+            .select(User.email, User.name)
+            .where((User.email == email) | (fn.LOWER(User.name) == username))
+            .limit(2)
+            .tuples()
+        )
+        for taken_email, taken_name in taken:
+            self.add_taken_errors(taken_email, taken_name)
+        return not (self.email.errors or self.username.errors)
 
-    def validate_username(self, field):
-        if User.select().where(User.name == field.data).first():
-            raise ValidationError('Username already in use.')
+    def add_taken_errors(self, email: str, name: str):
+        if email == self.email.data.lower() and 'Email already registered.' not in self.email.errors:
+            self.email.errors.append('Email already registered.')
+        if name.lower() == self.username.data.lower() and 'Username already in use.' not in self.username.errors:
+            self.username.errors.append('Username already in use.')
@@ -1,9 +1,9 @@
 import datetime
-from peewee import CharField, ForeignKeyField, TextField, DateTimeField
-from werkzeug.security import generate_password_hash, check_password_hash
+from peewee import CharField, ForeignKeyField, TextField, DateTimeField, fn
 from flask_login import UserMixin
 
 from app.base_model import BaseModel
+from app.auth.passwords import password_hasher
 
 
 class Role(BaseModel):
@@ -29,10 +29,28 @@ class User(BaseModel, UserMixin):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
+    def needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
+    def rehash_password(self, password):
+        """Upgrade outdated hash of verified password, returns whether hash changed"""
+        password_hash = password_hasher.rehash(self.password_hash, password)
+        if password_hash is not None:
+            self.password_hash = password_hash
+        return password_hash is not None
 
+    @classmethod
+    def create_table(cls, safe=True, **options):
+        """Create table with its full text search index"""
+        from app.auth.search import create_search_index
+
+        super().create_table(safe, **options)
+        create_search_index(cls._meta.database)
+
+
+User.add_index(User.index(fn.LOWER(User.name), unique=True, name='user_name_lower'))
@@ -0,0 +1,108 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+DEFAULT_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Hashing pool and its queue are full"""
+
+
+def normalize_method(method: str):
+    """Method as written into hashes, pbkdf2 hashes carry hash name and iterations"""
+    parts = method.split(':')
+    if parts[0] != 'pbkdf2':
+        return method
+    hash_name = parts[1] if len(parts) > 1 else 'sha256'
+    iterations = parts[2] if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+    return f'pbkdf2:{hash_name}:{iterations}'
+
+
+class PasswordHasher:
+    """Password hashing with configured cost in bounded pool of threads.
+
+    hashlib releases GIL while hashing, so pool threads run in parallel with request threads.
+    Calls beyond pool size and queue limit are rejected instead of waiting.
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.salt_length = 16
+        self.executor = None
+        self.slots = None
+
+    def configure(self, method: str, salt_length: int = 16, workers: int = 0, queue_limit: int = 0):
+        """Workers 0 hashes on calling thread"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        if workers:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+            self.slots = threading.BoundedSemaphore(workers + queue_limit)
+        else:
+            self.executor = None
+            self.slots = None
+
+    def run(self, func: Callable, *args):
+        """Result of func computed in pool"""
+        if self.executor is None:
+            return func(*args)
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHasherBusy('too many password checks in progress')
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    def hash(self, password: str) -> str:
+        return self.run(generate_password_hash, password, self.method, self.salt_length)
+
+    def hash_now(self, password: str) -> str:
+        """Hash on calling thread, bulk work must not take pool slots of requests"""
+        return generate_password_hash(password, self.method, self.salt_length)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self.run(check_password_hash, password_hash, password)
+
+    def rehash(self, password_hash: str, password: str) -> Optional[str]:
+        """Hash of verified password with configured parameters, None when stored hash is current.
+
+        Rehash is optional, when pool is busy old hash is kept and rehash is tried on next login.
+        """
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            return self.hash(password)
+        except PasswordHasherBusy:
+            logger.warning('password hashing pool is busy, rehash is left for next login')
+            return None
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Stored hash was made with other method or salt length than configured"""
+        if password_hash.count('$') < 2:
+            return True
+        method, salt, _ = password_hash.split('$', 2)
+        return method != self.method or len(salt) != self.salt_length
+
+
+password_hasher = PasswordHasher()
+
+
+def init_app(app):
+    password_hasher.configure(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_SALT_LENGTH'],
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_QUEUE']
+    )
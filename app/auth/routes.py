@@ -1,15 +1,24 @@
-import os
-import imghdr
 import datetime
-from time import time
 from flask import render_template, flash, redirect, url_for, request, current_app, abort
 from flask_login import login_required, logout_user, login_user, current_user
 from werkzeug.utils import secure_filename
+from peewee import IntegrityError
 
 from app.auth import auth
 from app.auth.forms import LoginForm, RegisterForm
 from app.auth.models import User, Profile
+from app.auth.passwords import PasswordHasherBusy
+from app.auth.throttle import allow_attempt
 from app.auth.utils import get_avatar, check_permissions
+from app.auth.avatars import save_avatar_stream, thumbnail_worker, AvatarError
+from app.storage import media_storage
+from app.versions import bump_version, USERS_LIST
+
+
+def retry_later(template: str, form, message: str, status: int, retry_after: int):
+    """Form page asking to retry when attempts are throttled or password hashing is saturated"""
+    flash(message)
+    return render_template(template, form=form), status, {'Retry-After': str(retry_after)}
 
 
 @auth.route('/login', methods=['GET', 'POST'])
@@ -26,9 +35,17 @@ def login():
         flash('You are already logged in.')
         return redirect(url_for('main.index'))
 
+    if request.method == 'POST' and not allow_attempt('login'):
+        return retry_later('auth/login.html', form, 'Too many login attempts, please try again later.', 429, 60)
+
     if form.validate_on_submit():
         user = User.select().where(User.email == form.email.data).first()
-        if user is not None and user.verify_password(form.password.data):
+        try:
+            verified = user is not None and user.verify_password(form.password.data)
+        except PasswordHasherBusy:
+            return retry_later('auth/login.html', form, 'Server is busy, please try again in a moment.', 503, 1)
+        if verified:
+            user.rehash_password(form.password.data)
             login_user(user, form.remember_me.data)
             user.last_visit = datetime.datetime.now()
             user.save()
@@ -49,17 +66,28 @@ def login():
 def register():
     """Register login"""
     form = RegisterForm()
+    if request.method == 'POST' and not allow_attempt('register'):
+        return retry_later('auth/register.html', form, 'Too many registration attempts, please try again later.', 429, 60)
     if form.validate_on_submit():
-        profile = Profile(avatar=get_avatar(form.email.data.lower()))
-        profile.save()
-        user = User(
-            email=form.email.data.lower(),
-            name=form.username.data,
-            password=form.password.data,
-            role=1,
-            profile=profile.id
-        )
-        user.save()
+        try:
+            user = User(
+                email=form.email.data.lower(),
+                name=form.username.data,
+                password=form.password.data,
+                role=1
+            )
+        except PasswordHasherBusy:
+            return retry_later('auth/register.html', form, 'Server is busy, please try again in a moment.', 503, 1)
+        try:
+            with current_app.config['db'].atomic():
+                profile = Profile.create(avatar=get_avatar(user.email))
+                user.profile = profile.id
+                user.save()
+        except IntegrityError as error:
+            message = str(error)
+            form.add_taken_errors(user.email if 'email' in message else '', user.name if 'name' in message else '')
+            return render_template('auth/register.html', form=form)
+        bump_version(USERS_LIST)
 
         flash('You can now login.')
         return redirect(url_for('auth.login'))
@@ -108,24 +136,28 @@ def show_profile(user_id):
 def upload_avatar(user_id):
     if request.method == 'POST':
         user = User.select().where(User.id == user_id).first()
-        filename = request.files['avatar'].filename
-        if filename:
-            filename = f'{time()}_{secure_filename(filename)}'
-            path_to_file = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            request.files['avatar'].save(path_to_file)
-            image_type = imghdr.what(path_to_file)
-
-            if image_type not in current_app.config['ALLOWED_EXTENSIONS']:
-                os.remove(path_to_file)
-                flash(f'{filename} is not allowed image type')
+        avatar = request.files['avatar']
+        if avatar.filename:
+            try:
+                filename = save_avatar_stream(
+                    avatar.stream,
+                    media_storage,
+                    current_app.config['ALLOWED_EXTENSIONS'],
+                    current_app.config['AVATAR_MAX_SIZE']
+                )
+            except AvatarError as error:
+                flash(f'{secure_filename(avatar.filename)} {error}')
                 return redirect(url_for('auth.show_profile', user_id=user.id))
 
-            url_to_avatar = current_app.config['UPLOAD_URL'] + filename
+            thumbnail_worker.submit(media_storage, filename, current_app.config['AVATAR_SIZES'].values())
+
+            url_to_avatar = media_storage.url(filename)
             profile = Profile.select().where(Profile.id == user.profile.id).first()
             profile.avatar = url_to_avatar
             profile.save()
+            bump_version(USERS_LIST)
 
-            flash(f'{filename} uploaded')
+            flash(f'{secure_filename(avatar.filename)} uploaded')
             return redirect(url_for('auth.show_profile', user_id=user.id))
 
     flash('Nothing to upload')
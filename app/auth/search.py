@@ -0,0 +1,67 @@
+import re
+from typing import Optional
+
+from playhouse.sqlite_ext import FTS5Model, RowIDField, SearchField
+
+from app.base_model import database_proxy
+from app.auth.models import Role, User
+
+
+TOKEN = re.compile(r'\w+')
+NAME_WEIGHT, EMAIL_WEIGHT = 10.0, 5.0
+TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user BEGIN '
+    'INSERT INTO user_search (rowid, name, email) VALUES (new.id, new.name, new.email); END',
+    'CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user BEGIN '
+    "INSERT INTO user_search (user_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); END",
+    'CREATE TRIGGER IF NOT EXISTS user_search_update AFTER UPDATE OF name, email ON user '
+    'WHEN old.name IS NOT new.name OR old.email IS NOT new.email BEGIN '
+    "INSERT INTO user_search (user_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+    'INSERT INTO user_search (rowid, name, email) VALUES (new.id, new.name, new.email); END',
+)
+
+
+class UserSearch(FTS5Model):
+    """Full text index of user names and emails, content is read from user table"""
+    rowid = RowIDField()
+    name = SearchField()
+    email = SearchField()
+
+    class Meta:
+        database = database_proxy
+        table_name = 'user_search'
+        options = {'content': 'user', 'content_rowid': 'id', 'prefix': '2 3', 'tokenize': 'unicode61'}
+
+
+def create_search_index(db, rebuild: bool = False):
+    """Create index with triggers keeping it in sync with user table, rebuild indexes existing users"""
+    UserSearch.create_table(safe=True)
+    for trigger in TRIGGERS:
+        db.execute_sql(trigger)
+    if rebuild:
+        UserSearch.rebuild()
+
+
+def make_match_query(text: str) -> Optional[str]:
+    """Prefix match of every word of text, None when text has no words"""
+    tokens = TOKEN.findall(text)
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_users(text: str, limit: int = 50):
+    """Users matching all words of text by name or email prefix, best ranked first"""
+    match = make_match_query(text)
+    if match is None:
+        return User.select().where(False)
+    return (
+        User
+        .select(User, Role)
+        .join(Role)
+        .switch(User)
+        .join(UserSearch, on=(UserSearch.rowid == User.id))
+        .where(UserSearch.match(match))
+        .order_by(UserSearch.bm25(NAME_WEIGHT, EMAIL_WEIGHT), User.id)
+        .limit(limit)
+    )
@@ -0,0 +1,151 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import request
+
+
+class MemoryBackend:
+    """Sliding window counters kept as (window, current, previous) per key, least recently used evicted"""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self.counters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key: str, window: int, expires_at: float) -> Tuple[int, int]:
+        """Count attempt in window, returns attempts in current and previous window"""
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None or counter[0] < window - 1:
+                current, previous = 1, 0
+            elif counter[0] == window - 1:
+                current, previous = 1, counter[1]
+            else:
+                current, previous = counter[1] + 1, counter[2]
+            self.counters[key] = (window, current, previous)
+            self.counters.move_to_end(key)
+            while len(self.counters) > self.maxsize:
+                self.counters.popitem(last=False)
+            return current, previous
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+class SqliteBackend:
+    """Sliding window counters shared by workers through sqlite file"""
+
+    prune_every = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.hits = 0
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, window INTEGER NOT NULL, '
+            'current INTEGER NOT NULL, previous INTEGER NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+        return connection
+
+    def hit(self, key: str, window: int, expires_at: float) -> Tuple[int, int]:
+        self.hits += 1
+        if self.hits % self.prune_every == 0:
+            self.connection.execute('DELETE FROM throttle WHERE expires_at < ?', (time.time(),))
+        return self.connection.execute(
+            'INSERT INTO throttle (key, window, current, previous, expires_at) VALUES (?, ?, 1, 0, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'previous = CASE WHEN window = excluded.window THEN previous '
+            'WHEN window = excluded.window - 1 THEN current ELSE 0 END, '
+            'current = CASE WHEN window = excluded.window THEN current + 1 ELSE 1 END, '
+            'window = excluded.window, expires_at = excluded.expires_at '
+            'RETURNING current, previous',
+            (key, window, expires_at)
+        ).fetchone()
+
+    def clear(self):
+        self.connection.execute('DELETE FROM throttle')
+
+
+class Throttle:
+    """Attempts of actions limited per client address and per email in sliding windows.
+
+    Limits are {action: {scope: (attempts, seconds)}}, scope is 'ip' or 'email'. Count of sliding
+    window is estimated from counts of current and previous fixed window.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.limits: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self.enabled = True
+        self.allowed = {}
+        self.rejected = {}
+
+    def configure(self, enabled: bool, limits: Dict, maxsize: int = 100000, shared_path: Optional[str] = None):
+        self.enabled = enabled
+        self.limits = limits
+        self.backend = SqliteBackend(shared_path) if shared_path else MemoryBackend(maxsize)
+        self.allowed = {}
+        self.rejected = {}
+
+    def estimate(self, key: str, seconds: int, now: float):
+        window, elapsed = divmod(now, seconds)
+        current, previous = self.backend.hit(key, int(window), (window + 2) * seconds)
+        return current + previous * (seconds - elapsed) / seconds
+
+    def allow(self, action: str, values: Dict[str, Optional[str]], now: Optional[float] = None) -> bool:
+        """Count attempt of action by scope values, False when any scope is over its limit"""
+        if not self.enabled:
+            return True
+        now = time.time() if now is None else now
+        allowed = True
+        for scope, (attempts, seconds) in self.limits.get(action, {}).items():
+            value = values.get(scope)
+            if not value:
+                continue
+            if self.estimate(f'{action}:{scope}:{value}', seconds, now) > attempts:
+                allowed = False
+                self.rejected[action, scope] = self.rejected.get((action, scope), 0) + 1
+        if allowed:
+            self.allowed[action] = self.allowed.get(action, 0) + 1
+        return allowed
+
+    def counters(self) -> Dict[Tuple, int]:
+        """Attempts by action and result, rejections also by scope"""
+        counters = {(action, 'allowed', ''): count for action, count in self.allowed.items()}
+        counters.update({(action, 'rejected', scope): count for (action, scope), count in self.rejected.items()})
+        return counters
+
+    def clear(self):
+        self.backend.clear()
+
+
+throttle = Throttle()
+
+
+def allow_attempt(action: str) -> bool:
+    """Count attempt of current request, email is read from submitted form"""
+    return throttle.allow(action, {
+        'ip': request.remote_addr,
+        'email': request.form.get('email', '').strip().lower(),
+    })
+
+
+def init_app(app):
+    throttle.configure(
+        app.config['THROTTLE_ENABLED'],
+        app.config['THROTTLE_LIMITS'],
+        app.config['THROTTLE_SIZE'],
+        app.config['THROTTLE_SHARED_PATH']
+    )
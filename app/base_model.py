@@ -1,4 +1,34 @@
+import time
+
 from peewee import *
+from peewee import SENTINEL
+
+
+class InstrumentedSqliteDatabase(SqliteDatabase):
+    """Sqlite database reporting every executed query to listeners.
+
+    Listener is called with sql, params, start time and duration in seconds,
+    also when query fails.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_listeners = []
+
+    def add_query_listener(self, listener):
+        if listener not in self.query_listeners:
+            self.query_listeners.append(listener)
+
+    def execute_sql(self, sql, params=None, commit=SENTINEL):
+        if not self.query_listeners:
+            return super().execute_sql(sql, params, commit)
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            duration = time.perf_counter() - start
+            for listener in self.query_listeners:
+                listener(sql, params, start, duration)
 
 
 database_proxy = DatabaseProxy()
@@ -7,4 +37,3 @@ database_proxy = DatabaseProxy()
 class BaseModel(Model):
     class Meta:
         database = database_proxy
-
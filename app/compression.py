@@ -0,0 +1,93 @@
+import gzip
+from typing import Iterable
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/x-ndjson',
+    'application/msgpack',
+    'image/svg+xml',
+)
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class Compressor:
+    """Compression of dynamic responses negotiated by Accept-Encoding.
+
+    Brotli is preferred when brotli package is installed and client accepts it. Streamed
+    and file responses are left alone, static files are precompressed by asset build.
+    """
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self, enabled: bool = True, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5,
+                  mimetypes: Iterable[str] = COMPRESSIBLE_MIMETYPES):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.levels = {'gzip': gzip_level}
+        if brotli is not None:
+            self.levels = {'br': brotli_quality, 'gzip': gzip_level}
+        self.mimetypes = frozenset(mimetypes)
+
+    def choose_encoding(self):
+        """Best encoding accepted by client, server preference breaks ties"""
+        return request.accept_encodings.best_match(list(self.levels))
+
+    def should_compress(self, response) -> bool:
+        return (
+            self.enabled
+            and 200 <= response.status_code < 300
+            and response.status_code != 204
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in self.mimetypes
+            and (response.content_length or 0) >= self.min_size
+        )
+
+    def compress_response(self, response):
+        """Compress body of response in place, etag becomes weak as body depends on encoding"""
+        if not self.should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+        response.set_data(compress(response.get_data(), encoding, self.levels[encoding]))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = Compressor()
+
+
+def init_app(app):
+    compressor.configure(
+        app.config['COMPRESSION_ENABLED'],
+        app.config['COMPRESSION_MIN_SIZE'],
+        app.config['COMPRESSION_GZIP_LEVEL'],
+        app.config['COMPRESSION_BROTLI_QUALITY'],
+    )
+    app.after_request(compressor.compress_response)
@@ -1,7 +1,7 @@
 import os
 from dotenv import load_dotenv
 
-from definitions import PATH_TO_ENV_FILE
+from definitions import PATH_TO_ENV_FILE, PATH_TO_ROOT
 
 load_dotenv(PATH_TO_ENV_FILE)
 
@@ -10,9 +10,89 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', os.urandom(32))
     DB_NAME = os.getenv('DATABASE')
     WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
+    WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5/weather')
     UPLOAD_FOLDER = os.path.join('app', 'static', 'img', 'profile')
     UPLOAD_URL = '/static/img/profile/'
     ALLOWED_EXTENSIONS = {'png', 'jpeg', 'gif'}
+    AVATAR_MAX_SIZE = int(os.getenv('AVATAR_MAX_SIZE', 2 * 1024 * 1024))
+    AVATAR_FORM_OVERHEAD = 64 * 1024
+    AVATAR_SIZES = {'profile': 100, 'navbar': 20}
+    AVATAR_THUMBNAIL_WORKERS = int(os.getenv('AVATAR_THUMBNAIL_WORKERS', 2))
+    MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'local')
+    MEDIA_S3_BUCKET = os.getenv('MEDIA_S3_BUCKET')
+    MEDIA_S3_PREFIX = os.getenv('MEDIA_S3_PREFIX', 'media/')
+    MEDIA_S3_REGION = os.getenv('MEDIA_S3_REGION')
+    MEDIA_S3_ENDPOINT_URL = os.getenv('MEDIA_S3_ENDPOINT_URL')
+    MEDIA_PUBLIC_URL = os.getenv('MEDIA_PUBLIC_URL')
+    MEDIA_URL_EXPIRES = int(os.getenv('MEDIA_URL_EXPIRES', 3600))
+    MEDIA_MULTIPART_THRESHOLD = int(os.getenv('MEDIA_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    MEDIA_PROXY_ENABLED = True
+    MEDIA_PROXY_FOLDER = os.getenv('MEDIA_PROXY_FOLDER', os.path.join(PATH_TO_ROOT, 'media_cache'))
+    MEDIA_PROXY_MAX_BYTES = int(os.getenv('MEDIA_PROXY_MAX_BYTES', 50 * 1024 * 1024))
+    MEDIA_PROXY_MAX_AGE = int(os.getenv('MEDIA_PROXY_MAX_AGE', 30 * 24 * 60 * 60))
+    MEDIA_PROXY_FIXTURES = os.getenv('MEDIA_PROXY_FIXTURES')
+    FLAG_SPRITE_FOLDER = os.getenv('FLAG_SPRITE_FOLDER', os.path.join(PATH_TO_ROOT, 'sprites'))
+    METRICS_ENABLED = True
+    METRICS_SHARED_PATH = os.getenv('METRICS_SHARED')
+    METRICS_PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', 5))
+    SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 0.1))
+    SLOW_QUERY_EXPLAIN = True
+    SLOW_QUERY_LOG_SIZE = 100
+    SLOW_QUERY_LOG_PARAMS = os.getenv('SLOW_QUERY_LOG_PARAMS', '0') == '1'
+    PROFILER_MAX_SECONDS = 60
+    PROFILER_INTERVAL = 0.005
+    PROFILE_HEADER = 'X-Profile'
+    PROFILE_LIMIT = 50
+    TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(PATH_TO_ROOT, 'traces', 'traces.jsonl'))
+    TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', 0.1))
+    TRACING_MAX_BYTES = 10 * 1024 * 1024
+    TRACING_BACKUP_COUNT = 5
+    API_JSON_BACKEND = os.getenv('API_JSON_BACKEND', 'auto')
+    API_MSGPACK_ENABLED = True
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+    ASSETS_FOLDER = os.getenv('ASSETS_FOLDER', os.path.join(PATH_TO_ROOT, 'build', 'static'))
+    ASSETS_URL_PATH = '/assets'
+    ASSETS_EXCLUDE = ('img/profile',)
+    WEATHER_STORE_PATH = os.getenv('WEATHER_STORE', os.path.join(PATH_TO_ROOT, 'weather_responses.db'))
+    WEATHER_STORE_RETENTION = int(os.getenv('WEATHER_STORE_RETENTION', 30 * 24 * 3600))
+    WEATHER_STORE_COMPACT_INTERVAL = int(os.getenv('WEATHER_STORE_COMPACT_INTERVAL', 24 * 3600))
+    WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 600))
+    WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', 100000))
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 1000))
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 300))
+    FRAGMENT_CACHE_SHARED_PATH = os.getenv('FRAGMENT_CACHE_SHARED')
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+    USER_SEARCH_LIMIT = 50
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+    IMPORT_UPLOAD_FOLDER = os.getenv('IMPORT_UPLOAD_FOLDER', os.path.join(PATH_TO_ROOT, 'uploads', 'imports'))
+    JOBS_PATH = os.getenv('JOBS_DB', os.path.join(PATH_TO_ROOT, 'jobs.db'))
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 1))
+    JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1.0))
+    JOBS_STALE_AFTER = int(os.getenv('JOBS_STALE_AFTER', 600))
+    # Throttle keys on client address, behind reverse proxy set PROXY_FIX_X_FOR to number of proxies
+    # in front of application, otherwise all clients share address of proxy and one can lock out all
+    THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', '1') == '1'
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
+    PROXY_FIX_X_PROTO = int(os.getenv('PROXY_FIX_X_PROTO', 0))
+    THROTTLE_LIMITS = {
+        'login': {'ip': (30, 60), 'email': (10, 300)},
+        'register': {'ip': (10, 3600), 'email': (5, 3600)},
+    }
+    THROTTLE_SIZE = int(os.getenv('THROTTLE_SIZE', 100000))
+    THROTTLE_SHARED_PATH = os.getenv('THROTTLE_SHARED')
+    WSGI_BIND = os.getenv('WSGI_BIND', '127.0.0.1:8000')
+    WSGI_WORKERS = int(os.getenv('WSGI_WORKERS', os.cpu_count() or 1))
+    WSGI_THREADS = int(os.getenv('WSGI_THREADS', 4))
+    WSGI_BACKLOG = int(os.getenv('WSGI_BACKLOG', 1024))
+    WSGI_KEEPALIVE = int(os.getenv('WSGI_KEEPALIVE', 5))
+    WSGI_GRACEFUL_TIMEOUT = int(os.getenv('WSGI_GRACEFUL_TIMEOUT', 30))
 
     @staticmethod
     def init_app(app):
@@ -23,14 +103,28 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 
+class ProductionConfig(Config):
+    DEBUG = False
+
+
 class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = True
     WTF_CSRF_SECRET_KEY = os.urandom(32)
+    WEATHER_STORE_PATH = ':memory:'
+    WEATHER_CACHE_TTL = 0
+    MEDIA_PROXY_ENABLED = False
+    FLAG_SPRITE_FOLDER = None
+    TRACING_FILE = None
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    JOBS_PATH = ':memory:'
+    JOBS_WORKERS = 0
+    ASSETS_FOLDER = None
 
 
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
+    'production': ProductionConfig,
     'default': DevelopmentConfig,
 }
@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+def make_key(key):
+    """Cache key from string or sequence of key parts"""
+    if isinstance(key, (list, tuple)):
+        return ':'.join(map(str, key))
+    return str(key)
+
+
+class MemoryBackend:
+    """Bounded LRU store of rendered fragments in process memory"""
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self.fragments = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.fragments.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.fragments[key]
+                return None
+            self.fragments.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: int):
+        with self.lock:
+            self.fragments[key] = (time.time() + ttl, value)
+            self.fragments.move_to_end(key)
+            while len(self.fragments) > self.maxsize:
+                self.fragments.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.fragments.clear()
+
+
+class SqliteBackend:
+    """Store of rendered fragments shared by workers through sqlite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS fragment (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            'SELECT value FROM fragment WHERE key = ? AND expires_at >= ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: int):
+        now = time.time()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO fragment (key, value, expires_at) VALUES (?, ?, ?)', (key, value, now + ttl)
+        )
+        self.connection.execute('DELETE FROM fragment WHERE expires_at < ?', (now,))
+
+    def clear(self):
+        self.connection.execute('DELETE FROM fragment')
+
+
+class FragmentCache:
+    """Cache of rendered template fragments, memory first then optional shared backend"""
+
+    def __init__(self):
+        self.memory = MemoryBackend()
+        self.shared = None
+        self.default_ttl = 300
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, enabled: bool, maxsize: int, default_ttl: int, shared_path: Optional[str] = None):
+        """Configure cache from application settings"""
+        self.enabled = enabled
+        self.memory = MemoryBackend(maxsize)
+        self.default_ttl = default_ttl
+        self.shared = SqliteBackend(shared_path) if shared_path else None
+
+    def get(self, key) -> Optional[str]:
+        key = make_key(key)
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.memory.set(key, value, self.default_ttl)
+        return value
+
+    def set(self, key, value: str, ttl: Optional[int] = None):
+        key = make_key(key)
+        ttl = self.default_ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    def get_or_render(self, key, render: Callable[[], str], ttl: Optional[int] = None):
+        """Return cached fragment or render and cache it"""
+        if not self.enabled:
+            return render()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = render()
+        self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja tag {% cache key, ttl %}...{% endcache %}, key may be a tuple of key parts"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = nodes.Const(None)
+        if parser.stream.skip_if('comma'):
+            ttl = parser.parse_expression()
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [key, ttl]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+        return Markup(fragment_cache.get_or_render(('fragment', make_key(key)), caller, ttl))
+
+
+def init_app(app):
+    fragment_cache.configure(
+        app.config['FRAGMENT_CACHE_ENABLED'],
+        app.config['FRAGMENT_CACHE_SIZE'],
+        app.config['FRAGMENT_CACHE_TTL'],
+        app.config['FRAGMENT_CACHE_SHARED_PATH']
+    )
+    app.jinja_env.add_extension(FragmentCacheExtension)
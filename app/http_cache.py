@@ -0,0 +1,56 @@
+import hashlib
+from functools import wraps
+from typing import Callable, Union
+
+from flask import current_app, make_response, request, session
+
+from weather.weather_cache import weather_cache
+
+
+def make_etag(parts):
+    """Strong etag from endpoint and data versions"""
+    return hashlib.sha1(repr((request.endpoint, parts)).encode('utf-8')).hexdigest()
+
+
+def conditional(etag_parts: Callable, max_age: Union[int, Callable[[], int]] = 0, private: bool = False):
+    """Answer GET with 304 when If-None-Match matches etag of current data version.
+
+    Tags are compared weakly, compressed responses carry weak variant of the etag.
+
+    etag_parts receives view arguments and returns a hashable description of data the
+    response depends on, or None when it is not known before rendering. In that case it is
+    called again after the view so the next request can be answered with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            parts = etag_parts(*args, **kwargs)
+            if parts is not None and request.if_none_match.contains_weak(make_etag(parts)):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if parts is None:
+                    parts = etag_parts(*args, **kwargs)
+                    if parts is None:
+                        return response
+
+            response.set_etag(make_etag(parts))
+            response.cache_control.max_age = max_age() if callable(max_age) else max_age
+            if private:
+                response.cache_control.private = True
+            else:
+                response.cache_control.public = True
+            return response
+        return wrapper
+    return decorator
+
+
+def weather_max_age():
+    """Seconds weather snapshot stays fresh"""
+    return weather_cache.ttl
+
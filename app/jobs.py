@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from flask import current_app
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    message TEXT,
+    result TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS job_status_id ON job (status, id);
+'''
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+COLUMNS = ('id', 'name', 'status', 'done', 'total', 'message', 'result', 'created_at', 'started_at', 'finished_at')
+HANDLERS: Dict[str, Callable] = {}
+
+
+def job(name: str):
+    """Register function as handler of jobs with name, it is called with job context and job arguments"""
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Handle passed to running job for progress reports"""
+
+    def __init__(self, queue: 'JobQueue', job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None):
+        self.queue.update(self.job_id, done=done, total=total, message=message)
+
+
+class JobQueue:
+    """Jobs persisted in sqlite file and run by worker threads of every serving process.
+
+    Job is claimed by single UPDATE so workers of several processes never run it twice.
+    Running jobs without progress for stale_after seconds are failed as interrupted.
+    Scheduled jobs are queued by workers when interval passed since they were last queued.
+    """
+
+    def __init__(self):
+        self.path = ':memory:'
+        self.workers = 0
+        self.poll_interval = 1.0
+        self.stale_after = 600
+        self.keep = 7 * 24 * 3600
+        self.periodic: Dict[str, float] = {}
+        self.connection = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def configure(self, path: str, workers: int = 1, poll_interval: float = 1.0,
+                  stale_after: int = 600, keep: int = 7 * 24 * 3600):
+        self.stop()
+        self.close()
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.keep = keep
+        self.periodic = {}
+
+    def schedule(self, name: str, interval: float):
+        """Run job with name every interval seconds"""
+        if name not in HANDLERS:
+            raise KeyError(f'unknown job {name}')
+        self.periodic[name] = interval
+
+    def enqueue_due(self) -> List[int]:
+        """Queue scheduled jobs which were not queued within their interval"""
+        now = time.time()
+        queued = []
+        for name, interval in self.periodic.items():
+            last = self.execute('SELECT MAX(created_at) FROM job WHERE name = ?', (name,))[0][0]
+            if last is None or last < now - interval:
+                queued.append(self.enqueue(name, unique=True))
+        return queued
+
+    def connect(self):
+        """Connection of current process, reopened after fork"""
+        if self.connection is None or self.pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+            self.pid = os.getpid()
+            self.threads = []
+        return self.connection
+
+    def execute(self, sql: str, params=()):
+        with self.lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def close(self):
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+
+    def enqueue(self, name: str, args: Optional[Dict] = None, unique: bool = False) -> int:
+        """Queue job and return its id, unique returns id of queued or running job with same name instead"""
+        if name not in HANDLERS:
+            raise KeyError(f'unknown job {name}')
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = None
+                if unique:
+                    row = connection.execute(
+                        'SELECT id FROM job WHERE name = ? AND status IN (?, ?) ORDER BY id LIMIT 1',
+                        (name, QUEUED, RUNNING)
+                    ).fetchone()
+                if row is None:
+                    row = connection.execute(
+                        'INSERT INTO job (name, args, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?) '
+                        'RETURNING id',
+                        (name, json.dumps(args or {}), QUEUED, now, now)
+                    ).fetchone()
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        self.wakeup.set()
+        return row[0]
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        """Public state of job, None when it does not exist"""
+        rows = self.execute(f'SELECT {", ".join(COLUMNS)} FROM job WHERE id = ?', (job_id,))
+        return self.to_dict(rows[0]) if rows else None
+
+    def active(self, name: Optional[str] = None) -> List[Dict]:
+        """Queued and running jobs, oldest first"""
+        sql = f'SELECT {", ".join(COLUMNS)} FROM job WHERE status IN (?, ?)'
+        params = [QUEUED, RUNNING]
+        if name is not None:
+            sql += ' AND name = ?'
+            params.append(name)
+        return [self.to_dict(row) for row in self.execute(sql + ' ORDER BY id', params)]
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        rows = self.execute(f'SELECT {", ".join(COLUMNS)} FROM job ORDER BY id DESC LIMIT ?', (limit,))
+        return [self.to_dict(row) for row in rows]
+
+    @staticmethod
+    def to_dict(row) -> Dict:
+        state = dict(zip(COLUMNS, row))
+        state['result'] = json.loads(state['result']) if state['result'] else None
+        return state
+
+    def update(self, job_id: int, done: int, total: Optional[int] = None, message: Optional[str] = None):
+        self.execute(
+            'UPDATE job SET done = ?, total = COALESCE(?, total), message = COALESCE(?, message), updated_at = ? '
+            'WHERE id = ?',
+            (done, total, message, time.time(), job_id)
+        )
+
+    def finish(self, job_id: int, status: str, message: Optional[str] = None, result=None):
+        now = time.time()
+        self.execute(
+            'UPDATE job SET status = ?, message = COALESCE(?, message), result = ?, updated_at = ?, finished_at = ? '
+            'WHERE id = ?',
+            (status, message, json.dumps(result) if result is not None else None, now, now, job_id)
+        )
+
+    def claim(self):
+        """Mark oldest queued job as running by this worker, returns (id, name, args) or None"""
+        now = time.time()
+        self.execute(
+            "UPDATE job SET status = ?, message = 'interrupted', updated_at = ?, finished_at = ? "
+            'WHERE status = ? AND updated_at < ?',
+            (FAILED, now, now, RUNNING, now - self.stale_after)
+        )
+        self.execute('DELETE FROM job WHERE status IN (?, ?) AND finished_at < ?', (DONE, FAILED, now - self.keep))
+        rows = self.execute(
+            'UPDATE job SET status = ?, worker = ?, started_at = ?, updated_at = ? '
+            'WHERE id = (SELECT id FROM job WHERE status = ? ORDER BY id LIMIT 1) '
+            'RETURNING id, name, args',
+            (RUNNING, f'{os.getpid()}:{threading.get_ident()}', now, now, QUEUED)
+        )
+        if not rows:
+            return None
+        job_id, name, args = rows[0]
+        return job_id, name, json.loads(args)
+
+    def run(self, job_id: int, name: str, args: Dict):
+        """Run claimed job in application context and store its result"""
+        handler = HANDLERS.get(name)
+        if handler is None:
+            self.finish(job_id, FAILED, f'unknown job {name}')
+            return
+        try:
+            result = handler(JobContext(self, job_id), **args)
+        except Exception as error:
+            logger.exception('job %s %s failed', job_id, name)
+            self.finish(job_id, FAILED, f'{type(error).__name__}: {error}')
+            return
+        message = result.pop('message', None) if isinstance(result, dict) else None
+        self.finish(job_id, DONE, message, result)
+
+    def run_pending(self) -> int:
+        """Run queued jobs in current thread until queue is empty, returns number of run jobs"""
+        count = 0
+        while True:
+            claimed = self.claim()
+            if claimed is None:
+                return count
+            self.run(*claimed)
+            count += 1
+
+    def work(self, app):
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                self.enqueue_due()
+                claimed = self.claim()
+                if claimed is not None:
+                    with app.app_context():
+                        self.run(*claimed)
+                    continue
+            except Exception:
+                logger.exception('job worker failed')
+            self.wakeup.wait(self.poll_interval)
+
+    def ensure_started(self, app):
+        """Start worker threads of current process once"""
+        if self.workers <= 0 or (self.threads and self.pid == os.getpid()):
+            return
+        with self.lock:
+            self.connect()
+            if self.threads:
+                return
+            self.stopping.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self.work, args=(app,), name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+job_queue = JobQueue()
+
+
+@job('seed_database')
+def seed_database(context: JobContext, batch_size: int = 10):
+    """Replace users, profiles and roles with generated test data, committed in batches"""
+    from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+    from app.versions import bump_version, USERS_LIST
+
+    db = current_app.config['db']
+    total = len(USERS)
+    create_db(
+        db, USERS, PROFILES, ROLES, delete=True, batch_size=batch_size,
+        progress=lambda done: context.progress(done, total)
+    )
+    bump_version(USERS_LIST)
+    return {'message': 'Database filled with test data', 'users': total}
+
+
+@job('reload_countries')
+def reload_countries(context: JobContext, path: Optional[str] = None):
+    """Insert new and update changed countries from countries json file.
+
+    Cached city rows show country names and flags, so cities list version is bumped with countries version.
+    """
+    from app.versions import bump_version, CITIES_LIST, COUNTRIES
+    from app.weather.countries import country_table
+    from app.weather.models import Country
+    from weather.country_codes import read_codes_data_from_json, FILENAME
+    from definitions import PATH_TO_ROOT
+
+    countries = read_codes_data_from_json(path or os.path.join(PATH_TO_ROOT, 'weather', FILENAME))
+    db = current_app.config['db']
+    with db.atomic():
+        for done, country in enumerate(countries, 1):
+            (Country
+             .insert(code=country['code'], name=country['name'],
+                     flag=f'https://www.countryflagicons.com/FLAT/32/{country["code"]}.png')
+             .on_conflict(conflict_target=[Country.code], preserve=[Country.name, Country.flag])
+             .execute())
+            if done % 50 == 0:
+                context.progress(done, len(countries))
+        bump_version(CITIES_LIST, COUNTRIES)
+    country_table.clear()
+    return {'message': f'{len(countries)} countries loaded', 'countries': len(countries)}
+
+
+@job('import_table')
+def import_table(context: JobContext, table: str, path: str, file_format: str, chunk_size: int = 1000):
+    """Import uploaded file into table, file is removed when job ends"""
+    from app.transfer import TABLES, import_rows
+
+    try:
+        with open(path, encoding='utf-8', newline='') as file:
+            report = import_rows(
+                current_app.config['db'], TABLES[table], file, file_format, chunk_size,
+                progress=lambda report: context.progress(report.inserted + report.failed)
+            )
+    finally:
+        os.remove(path)
+    return dict(report.to_json(), message=f'{table}: {report.inserted} rows imported, {report.failed} failed')
+
+
+@job('compact_weather_store')
+def compact_weather_store(context: JobContext, retention: Optional[int] = None, vacuum: bool = False):
+    """Delete stored weather responses older than retention seconds, latest response of every city is kept"""
+    from weather.response_store import response_store
+
+    if not response_store.is_initialized:
+        return {'message': 'weather response store is disabled', 'deleted': 0}
+    retention = current_app.config['WEATHER_STORE_RETENTION'] if retention is None else retention
+    deleted = response_store.compact(time.time() - retention, vacuum)
+    return {'message': f'{deleted} weather responses deleted', 'deleted': deleted}
+
+
+def init_app(app):
+    job_queue.configure(
+        app.config['JOBS_PATH'],
+        app.config['JOBS_WORKERS'],
+        app.config['JOBS_POLL_INTERVAL'],
+        app.config['JOBS_STALE_AFTER'],
+    )
+    if app.config['WEATHER_STORE_PATH'] and app.config['WEATHER_STORE_RETENTION']:
+        job_queue.schedule('compact_weather_store', app.config['WEATHER_STORE_COMPACT_INTERVAL'])
+    app.before_request(lambda: job_queue.ensure_started(app))
@@ -1,14 +1,19 @@
-from flask import render_template, redirect, url_for, flash, request, current_app
+from flask import render_template, redirect, url_for, flash, request, current_app, jsonify, abort
 from datetime import datetime
 from flask_paginate import Pagination, get_page_parameter
 from flask_login import login_required, current_user
 
 from app.main import main
 from app.main.forms import NameForm, GenerateDataForm
-from app.auth.models import User
+from app.auth.models import User, Role
+from app.auth.search import search_users
 from app.main.utils import parse_range_from_paginator
 from app.auth.utils import check_permissions
-from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+from app.jobs import FAILED, job_queue
+from app.versions import bump_version, get_version, USERS_LIST
+
+PUBLIC_JOBS = ('seed_database',)
+PUBLIC_JOB_FIELDS = ('id', 'status', 'done', 'total', 'message')
 
 
 @main.route('/', methods=['POST', 'GET'])
@@ -17,34 +22,76 @@ def index():
     form = GenerateDataForm()
 
     if form.validate_on_submit():
-        db = current_app.config['db']
-        create_db(db, USERS, PROFILES, ROLES, delete=True)
-        flash('Database filled with test data')
+        job_queue.enqueue('seed_database', unique=True)
+        flash('Test data is generated in background')
+        return redirect(url_for('main.index'))
 
+    active = job_queue.active('seed_database')
     return render_template(
         'index.html',
         title='Home page',
         current_time=datetime.utcnow(),
-        form=form
+        form=form,
+        seed_job=active[0] if active else None
     )
 
 
+@main.route('/job/<int:job_id>')
+def show_job(job_id):
+    """Status and progress of job started from public pages as json, other jobs are shown to admins only"""
+    job = job_queue.get(job_id)
+    if job is None or job['name'] not in PUBLIC_JOBS:
+        abort(404)
+    if job['status'] == FAILED:
+        job['message'] = None
+    return jsonify({field: job[field] for field in PUBLIC_JOB_FIELDS})
+
+
 @main.route('/email/show')
 def show_emails():
     """Show user information"""
-    page = request.args.get(get_page_parameter(), type=int, default=1)
+    query = request.args.get('q', '').strip()
+    if query:
+        return render_template(
+            'main/show_emails.html',
+            title='Show users',
+            users=search_users(query, current_app.config['USER_SEARCH_LIMIT']),
+            query=query,
+            pagination=None,
+            users_fragment_key=('users_search', get_version(USERS_LIST), query)
+        )
 
-    users = User.select()
-    pagination = Pagination(page=page, total=users.count(), record_name='users')
+    page = request.args.get(get_page_parameter(), type=int, default=1)
+    pagination = Pagination(page=page, total=User.select().count(), record_name='users')
     start, stop = parse_range_from_paginator(pagination.info)
+    users = (
+        User
+        .select(User, Role)
+        .join(Role)
+        .order_by(User.id)
+        .offset(start)
+        .limit(stop - start)
+    )
     return render_template(
         'main/show_emails.html',
         title='Show users',
-        users=users[start:stop],
+        users=users,
         pagination=pagination,
+        users_fragment_key=('users', get_version(USERS_LIST), start, stop)
     )
 
 
+@main.route('/email/search')
+def search_emails():
+    """Users matching query by name or email prefix as json, best matches first"""
+    limit = min(request.args.get('limit', 20, type=int), current_app.config['USER_SEARCH_LIMIT'])
+    users = search_users(request.args.get('q', ''), max(limit, 1))
+    return jsonify([
+        {'id': user.id, 'name': user.name, 'email': user.email, 'role': user.role.name}
+        for user in users
+    ])
+
+
 @main.route('/email/edit/<int:user_id>')
 @login_required
 def edit_email(user_id):
@@ -92,6 +139,7 @@ def update_email():
 
         try:
             user.save()
+            bump_version(USERS_LIST)
             flash(f'{user_name} updated')
         except Exception:
             flash('Email already added into database')
@@ -119,6 +167,7 @@ def delete_emails():
             user = User.get(User.id == selector)
             message += f'{user.email} '
             user.delete_instance()
+        bump_version(USERS_LIST)
 
         flash(message)
         return redirect(url_for('main.show_emails'))
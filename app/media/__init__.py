@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+media = Blueprint('media', __name__, url_prefix='/media')
+
+from app.media import routes
@@ -0,0 +1,15 @@
+from flask import abort, redirect
+
+from app.media import media
+from app.storage import media_storage
+
+
+@media.route('/<path:name>')
+def show_media(name):
+    """Redirect to url media bytes are downloaded from"""
+    if '..' in name.split('/') or not media_storage.exists(name):
+        abort(404)
+    response = redirect(media_storage.download_url(name))
+    response.cache_control.private = True
+    response.cache_control.max_age = 300
+    return response
@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import bisect
+import sqlite3
+import weakref
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Response, g, has_request_context, request
+
+from app.auth.throttle import throttle
+from app.fragment_cache import fragment_cache
+from weather import getting_weather
+from weather.weather_cache import weather_cache
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple, extra: str = ''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(value)
+
+
+class Metric:
+    """Metric aggregated in per-thread shards, updates take no lock.
+
+    Shards of finished threads are folded into base totals when shards are added or collected.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.worker: Optional[str] = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all values, forked worker counts from zero instead of from values of master"""
+        with self.lock:
+            self.local = threading.local()
+            self.shards: List[Tuple[weakref.ref, Dict]] = []
+            self.base: Dict = {}
+
+    def shard(self) -> Dict:
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.prune()
+                self.shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def prune(self):
+        """Merge shards of finished threads into base, called with lock held"""
+        alive = []
+        for thread_ref, shard in self.shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, shard))
+            else:
+                self.merge(self.base, shard)
+        self.shards = alive
+
+    def merge(self, totals: Dict, shard: Dict):
+        raise NotImplementedError
+
+    def snapshots(self) -> List[Dict]:
+        with self.lock:
+            self.prune()
+            shards = [self.base] + [shard for _, shard in self.shards]
+            return [dict(shard) for shard in shards]
+
+    def values(self) -> Dict:
+        totals = {}
+        for shard in self.snapshots():
+            self.merge(totals, shard)
+        return totals
+
+    def format_labels(self, values: Tuple, extra: str = ''):
+        if self.worker is None:
+            return format_labels(self.labels, values, extra)
+        return format_labels(('worker',) + self.labels, (self.worker,) + values, extra)
+
+    def render(self, values: Optional[Dict] = None) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self.shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def merge(self, totals: Dict[Tuple, float], shard: Dict[Tuple, float]):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def render(self, values: Optional[Dict] = None):
+        lines = super().render()
+        for labels, value in sorted((self.values() if values is None else values).items()):
+            lines.append(f'{self.name}{self.format_labels(labels)} {format_value(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        shard = self.shard()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def merge(self, totals: Dict[Tuple, List], shard: Dict[Tuple, List]):
+        """Sum bucket counts into new lists, lists of totals may be shared with earlier snapshots"""
+        for labels, counts in shard.items():
+            total = totals.get(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            totals[labels] = [value + count for value, count in zip(total, list(counts))]
+
+    def render(self, values: Optional[Dict] = None):
+        lines = super().render()
+        for labels, counts in sorted((self.values() if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_label = f'le="{format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{self.format_labels(labels, bucket_label)} {cumulative}')
+            lines.append(f'{self.name}_sum{self.format_labels(labels)} {format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{self.format_labels(labels)} {cumulative}')
+        return lines
+
+
+class CallbackCounter(Counter):
+    """Counter read from existing object when metrics are collected, counted from last reset"""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str], collect: Callable[[], Dict[Tuple, float]]):
+        self.collect = collect
+        super().__init__(name, documentation, labels)
+
+    def reset(self):
+        super().reset()
+        self.offset = self.collect()
+
+    def values(self) -> Dict[Tuple, float]:
+        return {labels: value - self.offset.get(labels, 0) for labels, value in self.collect().items()}
+
+
+class SharedValues:
+    """Metric values of all workers kept in sqlite file, so scrape of any worker shows totals of all.
+
+    Each worker writes its own totals under its id after requests, at most once per publish interval,
+    so values of other workers lag by up to that interval. Values of exited workers are folded into
+    RETIRED rows to keep table from growing with worker restarts.
+    """
+
+    RETIRED = 'retired'
+
+    def __init__(self, path: str, worker: str):
+        self.path = path
+        self.worker = worker
+        self.local = threading.local()
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS metric (worker TEXT NOT NULL, name TEXT NOT NULL, labels TEXT NOT NULL, '
+            'value TEXT NOT NULL, PRIMARY KEY (worker, name, labels))'
+        )
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+        return connection
+
+    def read(self, metric: Metric, worker: Optional[str] = None) -> Dict:
+        """Values of metric summed over all workers, or of one worker"""
+        sql, params = 'SELECT labels, value FROM metric WHERE name = ?', [metric.name]
+        if worker is not None:
+            sql += ' AND worker = ?'
+            params.append(worker)
+        totals = {}
+        for labels, value in self.connection.execute(sql, params):
+            metric.merge(totals, {tuple(json.loads(labels)): json.loads(value)})
+        return totals
+
+    def write(self, metric: Metric, worker: str, values: Dict):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO metric (worker, name, labels, value) VALUES (?, ?, ?, ?)',
+            [(worker, metric.name, json.dumps(labels), json.dumps(value)) for labels, value in values.items()]
+        )
+
+    def transaction(self, func: Callable):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            func()
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def publish(self, metrics: Iterable[Metric]):
+        """Replace values of this worker"""
+        values = [(metric, metric.values()) for metric in metrics]
+        self.transaction(lambda: [self.write(metric, self.worker, metric_values) for metric, metric_values in values])
+
+    def retire(self, metrics: Iterable[Metric]):
+        """Fold values of this worker into retired totals and drop its rows"""
+        def fold():
+            for metric in metrics:
+                totals = self.read(metric, self.RETIRED)
+                metric.merge(totals, metric.values())
+                self.write(metric, self.RETIRED, totals)
+            self.connection.execute('DELETE FROM metric WHERE worker = ?', (self.worker,))
+
+        self.transaction(fold)
+
+
+class Registry:
+    """Metrics of process, with shared path set totals of all workers are rendered"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.shared: Optional[SharedValues] = None
+        self.publish_interval = 5.0
+        self.published_at = 0.0
+
+    def configure(self, shared_path: Optional[str] = None, publish_interval: float = 5.0):
+        self.shared = SharedValues(shared_path, str(os.getpid())) if shared_path else None
+        self.publish_interval = publish_interval
+        self.published_at = 0.0
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def fork(self):
+        """Start values of forked worker from zero, without shared path its values are labeled by pid"""
+        worker = f'{os.getpid()}-{os.urandom(4).hex()}'
+        for metric in self.metrics:
+            metric.reset()
+            metric.worker = None if self.shared else str(os.getpid())
+        if self.shared is not None:
+            self.shared = SharedValues(self.shared.path, worker)
+        self.published_at = 0.0
+
+    def publish(self, force: bool = False):
+        """Write values of this worker to shared file, at most once per publish interval"""
+        if self.shared is None:
+            return
+        now = time.monotonic()
+        if force or now - self.published_at >= self.publish_interval:
+            self.published_at = now
+            self.shared.publish(self.metrics)
+
+    def retire(self):
+        if self.shared is not None:
+            self.shared.retire(self.metrics)
+
+    def render(self):
+        self.publish(force=True)
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(self.shared.read(metric) if self.shared else None))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method')
+))
+requests_total = registry.register(Counter(
+    'http_requests_total', 'Requests by endpoint and status.', ('endpoint', 'method', 'status')
+))
+request_queries = registry.register(Histogram(
+    'db_queries_per_request', 'SQL queries executed by one request.', ('endpoint',), QUERY_COUNT_BUCKETS
+))
+request_query_duration = registry.register(Histogram(
+    'db_query_seconds_per_request', 'Time spent in SQL queries by one request.', ('endpoint',)
+))
+query_duration = registry.register(Histogram(
+    'db_query_duration_seconds', 'SQL query latency by statement kind.', ('statement',)
+))
+upstream_duration = registry.register(Histogram(
+    'weather_upstream_duration_seconds', 'Weather api call latency by outcome.', ('outcome',)
+))
+registry.register(CallbackCounter(
+    'cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result'),
+    lambda: {
+        ('weather', 'hit'): weather_cache.hits,
+        ('weather', 'miss'): weather_cache.misses,
+        ('fragment', 'hit'): fragment_cache.hits,
+        ('fragment', 'miss'): fragment_cache.misses,
+    }
+))
+registry.register(CallbackCounter(
+    'auth_throttle_attempts_total', 'Login and registration attempts by result, rejections by scope.',
+    ('action', 'result', 'scope'), throttle.counters
+))
+
+
+def get_endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def get_statement(sql: str):
+    return sql.lstrip()[:6].upper()
+
+
+def on_query(sql: str, params, start: float, duration: float):
+    query_duration.observe(duration, get_statement(sql))
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+        g.metrics_query_time += duration
+
+
+def on_upstream(city: str, start: float, duration: float, status):
+    if status is None:
+        outcome = 'exception'
+    elif status == 200:
+        outcome = 'ok'
+    else:
+        outcome = str(status)
+    upstream_duration.observe(duration, outcome)
+
+
+def start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_query_time = 0.0
+
+
+def finish_request(response):
+    if 'metrics_start' not in g:
+        return response
+    endpoint = get_endpoint()
+    request_duration.observe(time.perf_counter() - g.metrics_start, endpoint, request.method)
+    requests_total.inc(endpoint, request.method, str(response.status_code))
+    request_queries.observe(g.metrics_queries, endpoint)
+    request_query_duration.observe(g.metrics_query_time, endpoint)
+    registry.publish()
+    return response
+
+
+def show_metrics():
+    """Metrics in Prometheus text format"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry.configure(app.config['METRICS_SHARED_PATH'], app.config['METRICS_PUBLISH_INTERVAL'])
+    app.config['db'].add_query_listener(on_query)
+    if on_upstream not in getting_weather.upstream_listeners:
+        getting_weather.upstream_listeners.append(on_upstream)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.add_url_rule('/metrics', 'metrics', show_metrics)
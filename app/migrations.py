@@ -0,0 +1,62 @@
+import datetime
+from typing import Callable, List, Tuple
+
+from peewee import CharField, DateTimeField
+
+from app.base_model import BaseModel
+
+
+MIGRATIONS: List[Tuple[str, Callable]] = []
+
+
+class Migration(BaseModel):
+    name = CharField(max_length=100, unique=True)
+    applied_at = DateTimeField(default=datetime.datetime.now)
+
+
+def migration(name: str):
+    """Register schema change of existing databases, applied in order of registration"""
+    def decorator(func: Callable):
+        MIGRATIONS.append((name, func))
+        return func
+    return decorator
+
+
+def get_pending(db) -> List[str]:
+    db.create_tables([Migration])
+    applied = {name for name, in Migration.select(Migration.name).tuples()}
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def migrate(db) -> List[str]:
+    """Apply pending migrations each in own transaction, returns applied names"""
+    pending = get_pending(db)
+    for name, func in MIGRATIONS:
+        if name not in pending:
+            continue
+        with db.atomic():
+            func(db)
+            Migration.create(name=name)
+    return pending
+
+
+@migration('0001_user_name_lower_index')
+def add_user_name_lower_index(db):
+    """Unique case-insensitive user names, fails listing names which already differ only by case"""
+    if not db.table_exists('user'):
+        return
+    duplicates = db.execute_sql(
+        'SELECT LOWER(name) FROM user GROUP BY LOWER(name) HAVING COUNT(*) > 1 LIMIT 10'
+    ).fetchall()
+    if duplicates:
+        raise ValueError(f'user names differ only by case: {", ".join(name for name, in duplicates)}')
+    db.execute_sql('CREATE UNIQUE INDEX IF NOT EXISTS user_name_lower ON user (LOWER(name))')
+
+
+@migration('0002_user_search')
+def add_user_search(db):
+    """Full text search index over names and emails of existing users"""
+    from app.auth.search import create_search_index
+
+    if db.table_exists('user'):
+        create_search_index(db, rebuild=True)
@@ -0,0 +1,127 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+from app.auth.utils import check_permissions
+
+
+SORT_KEYS = {sort_key.value for sort_key in pstats.SortKey}
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiling session is running"""
+
+
+def format_frame(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def get_stack(frame):
+    """Frames from outermost to innermost"""
+    stack = []
+    while frame is not None:
+        stack.append(format_frame(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return ';'.join(stack)
+
+
+class SamplingProfiler:
+    """Samples stacks of all threads at interval, one session at a time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = 0.005, threads: Optional[set] = None) -> Counter:
+        """Collapsed stacks with sample counts, threads limits sampling to thread ids"""
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy('profiler is already running')
+        try:
+            own_thread = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread or (threads is not None and thread_id not in threads):
+                        continue
+                    stacks[get_stack(frame)] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self.lock.release()
+
+
+sampling_profiler = SamplingProfiler()
+
+
+def format_collapsed(stacks: Counter):
+    """Flamegraph compatible collapsed stacks, one 'frame;frame count' line per stack"""
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def memory_diff(seconds: float, limit: int = 25, frames: int = 1):
+    """Top allocation sites grown over seconds"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    statistics = after.compare_to(before, 'traceback' if frames > 1 else 'lineno')
+    lines = [f'Top {limit} allocation sites by growth over {seconds:g} s']
+    for statistic in statistics[:limit]:
+        lines.append(str(statistic))
+        if frames > 1:
+            lines.extend(f'    {line}' for line in statistic.traceback.format())
+    return '\n'.join(lines) + '\n'
+
+
+def start_request_profile():
+    """Profile this request when admin sends profiling header"""
+    if not request.headers.get(current_app.config['PROFILE_HEADER']):
+        return
+    if not current_user.is_authenticated or not check_permissions(current_user.id):
+        return
+    g.profile = cProfile.Profile()
+    g.profile_start = time.perf_counter()
+    g.profile.enable()
+
+
+def finish_request_profile(response):
+    """Replace body of profiled request with its profile"""
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    duration = time.perf_counter() - g.profile_start
+    sort_key = request.headers[current_app.config['PROFILE_HEADER']]
+    output = io.StringIO()
+    stats = pstats.Stats(profile, stream=output)
+    stats.sort_stats(sort_key if sort_key in SORT_KEYS else 'cumulative')
+    stats.print_stats(current_app.config['PROFILE_LIMIT'])
+    response.direct_passthrough = False
+    response.set_data(output.getvalue())
+    response.content_type = 'text/plain; charset=utf-8'
+    response.headers['X-Profile-Duration'] = f'{duration * 1000:.1f}ms'
+    response.headers.pop('ETag', None)
+    return response
+
+
+def init_app(app):
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
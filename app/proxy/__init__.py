@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+proxy = Blueprint('proxy', __name__, url_prefix='/proxy')
+
+from app.proxy import routes
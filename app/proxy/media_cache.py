@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import hashlib
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import requests
+from flask import current_app, url_for
+
+
+class Source(NamedTuple):
+    name_pattern: str
+    upstream_url: Callable[[str], str]
+    url_pattern: str
+    url_to_name: Callable[[re.Match], str]
+
+
+SOURCES: Dict[str, Source] = {
+    'gravatar': Source(
+        r'[0-9a-f]{32}_[0-9]{1,4}',
+        lambda name: 'https://www.gravatar.com/avatar/{}?d=identicon&s={}'.format(*name.split('_')),
+        r'^https?://www\.gravatar\.com/avatar/([0-9a-f]{32})\?d=identicon&s=([0-9]{1,4})$',
+        lambda match: f'{match[1]}_{match[2]}'
+    ),
+    'flags': Source(
+        r'[A-Z]{2}\.png',
+        lambda name: f'https://www.countryflagicons.com/FLAT/32/{name}',
+        r'^https?://www\.countryflagicons\.com/FLAT/32/([A-Z]{2}\.png)$',
+        lambda match: match[1]
+    ),
+    'icons': Source(
+        r'[0-9]{2}[dn]\.png',
+        lambda name: f'http://openweathermap.org/img/w/{name}',
+        r'^https?://openweathermap\.org/img/w/([0-9]{2}[dn]\.png)$',
+        lambda match: match[1]
+    ),
+}
+PART_MAX_AGE = 3600
+
+WEATHER_ICONS = [
+    f'{code}{time_of_day}.png'
+    for code in ('01', '02', '03', '04', '09', '10', '11', '13', '50')
+    for time_of_day in ('d', 'n')
+]
+
+
+class CachedMedia(NamedTuple):
+    path: str
+    content_type: str
+    etag: str
+
+
+def match_source(url: str) -> Optional[Tuple[str, str]]:
+    """Source and name of external media url known to proxy"""
+    for source, description in SOURCES.items():
+        match = re.match(description.url_pattern, url)
+        if match:
+            return source, description.url_to_name(match)
+    return None
+
+
+def is_valid_name(source: str, name: str):
+    return source in SOURCES and re.fullmatch(SOURCES[source].name_pattern, name) is not None
+
+
+class HttpFetcher:
+    """Fetch media from upstream host"""
+
+    def __init__(self, timeout: float = 5):
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self, source: str, name: str) -> Optional[Tuple[bytes, str]]:
+        response = self.session.get(SOURCES[source].upstream_url(name), timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return response.content, response.headers.get('Content-Type', 'application/octet-stream')
+
+
+class FixtureFetcher:
+    """Fetch media from local folder laid out as <source>/<name>, used offline and in tests"""
+
+    def __init__(self, folder: str, content_type: str = 'image/png'):
+        self.folder = folder
+        self.content_type = content_type
+
+    def fetch(self, source: str, name: str) -> Optional[Tuple[bytes, str]]:
+        path = os.path.join(self.folder, source, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            return file.read(), self.content_type
+
+
+class MediaCache:
+    """Bounded on-disk cache of external media with content type and etag"""
+
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 0
+        self.fetcher = None
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def configure(self, folder: str, max_bytes: int, fetcher):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self._load_index()
+
+    def _load_index(self):
+        """Index files cached by previous runs, oldest first.
+
+        Temporary files are left out, the ones older than PART_MAX_AGE were left by interrupted writes
+        and are removed, younger ones may still be written by other worker.
+        """
+        if not os.path.isdir(self.folder):
+            return
+        files = []
+        now = time.time()
+        for source in SOURCES:
+            folder = os.path.join(self.folder, source)
+            if not os.path.isdir(folder):
+                continue
+            for filename in os.listdir(folder):
+                if filename.endswith('.meta'):
+                    continue
+                path = os.path.join(folder, filename)
+                stat = os.stat(path)
+                if filename.endswith('.part'):
+                    if now - stat.st_mtime > PART_MAX_AGE:
+                        os.remove(path)
+                    continue
+                files.append((stat.st_mtime, (source, filename), stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def path(self, source: str, name: str):
+        return os.path.join(self.folder, source, name)
+
+    def get(self, source: str, name: str) -> Optional[CachedMedia]:
+        """Cached media or None"""
+        path = self.path(source, name)
+        try:
+            with open(path + '.meta') as meta_file:
+                meta = json.load(meta_file)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            if (source, name) in self.entries:
+                self.entries.move_to_end((source, name))
+        return CachedMedia(path, meta['content_type'], meta['etag'])
+
+    def put(self, source: str, name: str, body: bytes, content_type: str) -> CachedMedia:
+        path = self.path(source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        etag = hashlib.sha1(body).hexdigest()
+        self._write(path, body)
+        self._write(path + '.meta', json.dumps({'content_type': content_type, 'etag': etag}).encode('utf-8'))
+
+        with self.lock:
+            self.total_bytes += len(body) - self.entries.pop((source, name), 0)
+            self.entries[(source, name)] = len(body)
+            self._evict(keep=(source, name))
+        return CachedMedia(path, content_type, etag)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        """Write file through unique temporary file, concurrent writers of same item never share it"""
+        descriptor, path_to_temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+            os.chmod(path_to_temp, 0o644)
+            os.replace(path_to_temp, path)
+        except BaseException:
+            os.remove(path_to_temp)
+            raise
+
+    def _evict(self, keep):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = next(iter(self.entries.items()))
+            if key == keep:
+                self.entries.move_to_end(key)
+                continue
+            del self.entries[key]
+            self.total_bytes -= size
+            for path in (self.path(*key), self.path(*key) + '.meta'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def get_or_fetch(self, source: str, name: str) -> Optional[CachedMedia]:
+        """Cached media, fetched from upstream on first request"""
+        cached = self.get(source, name)
+        if cached is not None:
+            return cached
+        try:
+            fetched = self.fetcher.fetch(source, name)
+        except requests.RequestException:
+            return None
+        if fetched is None:
+            return None
+        return self.put(source, name, *fetched)
+
+    def prewarm(self, items, workers: int = 8):
+        """Fetch many (source, name) items in parallel, return number of cached items"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda item: self.get_or_fetch(*item), items)
+            return sum(1 for result in results if result is not None)
+
+
+media_cache = MediaCache()
+
+
+def proxied_url(url: str):
+    """Local proxy url of known external media url"""
+    if not url or not current_app.config['MEDIA_PROXY_ENABLED']:
+        return url
+    matched = match_source(url)
+    if matched is None:
+        return url
+    source, name = matched
+    return url_for('proxy.show_media', source=source, name=name)
+
+
+def init_app(app):
+    if app.config['MEDIA_PROXY_FIXTURES']:
+        fetcher = FixtureFetcher(app.config['MEDIA_PROXY_FIXTURES'])
+    else:
+        fetcher = HttpFetcher()
+    media_cache.configure(app.config['MEDIA_PROXY_FOLDER'], app.config['MEDIA_PROXY_MAX_BYTES'], fetcher)
+    app.add_template_global(proxied_url, 'proxied')
@@ -0,0 +1,62 @@
+import click
+from flask import abort, current_app, redirect, send_file, send_from_directory
+
+from app.proxy import proxy
+from app.proxy.media_cache import SOURCES, WEATHER_ICONS, media_cache, is_valid_name
+from app.proxy.sprites import build_flag_sprite, flag_sprite
+
+SPRITE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@proxy.route('/<string:source>/<string:name>')
+def show_media(source, name):
+    """Serve external media from local cache"""
+    if not is_valid_name(source, name):
+        abort(404)
+    cached = media_cache.get_or_fetch(source, name)
+    if cached is None:
+        return redirect(SOURCES[source].upstream_url(name))
+    return send_file(
+        cached.path,
+        mimetype=cached.content_type,
+        etag=cached.etag,
+        max_age=current_app.config['MEDIA_PROXY_MAX_AGE'],
+        conditional=True
+    )
+
+
+@proxy.route('/sprites/<string:name>')
+def show_sprite(name):
+    """Serve fingerprinted sprite files, their content never changes under one name"""
+    if not flag_sprite.folder:
+        abort(404)
+    response = send_from_directory(flag_sprite.folder, name, max_age=SPRITE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@proxy.cli.command('prewarm')
+@click.option('--workers', default=8, help='Parallel downloads.')
+def prewarm(workers):
+    """Fetch all country flags and weather icons into media cache"""
+    from app.weather.models import Country
+
+    items = [('flags', f'{code}.png') for code, in Country.select(Country.code).tuples()]
+    items += [('icons', icon) for icon in WEATHER_ICONS]
+    cached = media_cache.prewarm(items, workers)
+    click.echo(f'{cached} of {len(items)} media cached')
+
+
+@proxy.cli.command('sprite')
+def sprite():
+    """Build country flags sprite from flags of Country table"""
+    from app.weather.models import Country
+
+    codes = [code for code, in Country.select(Country.code).tuples()]
+    try:
+        manifest = build_flag_sprite(codes, current_app.config['FLAG_SPRITE_FOLDER'])
+    except RuntimeError as error:
+        raise click.ClickException(f'{error}, install packages of requirements.txt')
+    flag_sprite.load()
+    click.echo(f'{len(manifest["codes"])} of {len(codes)} flags in {manifest["image"]}')
@@ -0,0 +1,124 @@
+import io
+import os
+import json
+import math
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+from app.proxy.media_cache import media_cache, proxied_url
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+MANIFEST = 'manifest.json'
+FLAG_SIZE = 32
+
+
+def fingerprint(data: bytes):
+    """Short content hash used in sprite file names"""
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def build_flag_sprite(codes: Iterable[str], folder: str, flag_size: int = FLAG_SIZE) -> Dict:
+    """Join cached country flags into one image with css map of their positions.
+
+    Both files are named by content hash, so they can be cached by clients forever.
+    Flags missing in media cache and upstream are left out. Returns written manifest.
+    """
+    if Image is None:
+        raise RuntimeError('Pillow is required to build flag sprite')
+
+    flags = []
+    for code in sorted(set(codes)):
+        cached = media_cache.get_or_fetch('flags', f'{code}.png')
+        if cached is not None:
+            flags.append((code, cached.path))
+
+    columns = max(1, math.ceil(math.sqrt(len(flags))))
+    rows = max(1, math.ceil(len(flags) / columns))
+    sprite = Image.new('RGBA', (columns * flag_size, rows * flag_size), (0, 0, 0, 0))
+    positions = {}
+    for index, (code, path) in enumerate(flags):
+        x, y = index % columns * flag_size, index // columns * flag_size
+        try:
+            with Image.open(path) as flag:
+                flag = flag.convert('RGBA')
+                flag.thumbnail((flag_size, flag_size))
+                sprite.paste(flag, (x, y))
+        except OSError:
+            continue
+        positions[code] = (x, y)
+
+    buffer = io.BytesIO()
+    sprite.save(buffer, format='PNG', optimize=True)
+    image_data = buffer.getvalue()
+    image_name = f'flags.{fingerprint(image_data)}.png'
+
+    css = [
+        f'.flag{{display:inline-block;width:{flag_size}px;height:{flag_size}px;'
+        f'background:url({image_name}) no-repeat;}}'
+    ]
+    css += [f'.flag-{code}{{background-position:-{x}px -{y}px;}}' for code, (x, y) in positions.items()]
+    css_data = '\n'.join(css).encode('utf-8')
+    css_name = f'flags.{fingerprint(css_data)}.css'
+
+    os.makedirs(folder, exist_ok=True)
+    for name, data in ((image_name, image_data), (css_name, css_data)):
+        with open(os.path.join(folder, name), 'wb') as file:
+            file.write(data)
+    manifest = {'css': css_name, 'image': image_name, 'codes': sorted(positions)}
+    with open(os.path.join(folder, MANIFEST + '.part'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(os.path.join(folder, MANIFEST + '.part'), os.path.join(folder, MANIFEST))
+    return manifest
+
+
+class FlagSprite:
+    """Last built flag sprite rendered by templates"""
+
+    def __init__(self):
+        self.folder = None
+        self.css = None
+        self.codes = frozenset()
+
+    def configure(self, folder: Optional[str]):
+        self.folder = folder
+        self.load()
+
+    def load(self):
+        """Read manifest of built sprite, sprite is off until it is built"""
+        self.css, self.codes = None, frozenset()
+        if not self.folder:
+            return
+        try:
+            with open(os.path.join(self.folder, MANIFEST)) as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return
+        self.css, self.codes = manifest['css'], frozenset(manifest['codes'])
+
+    def css_url(self):
+        if self.css is None:
+            return None
+        return url_for('proxy.show_sprite', name=self.css)
+
+    def render(self, country):
+        """Flag of country as sprite class, plain image when sprite has no such flag"""
+        if country.code in self.codes:
+            return Markup(f'<span class="flag flag-{escape(country.code)}" title="{escape(country.name)}"></span>')
+        return Markup(f'<img src="{escape(proxied_url(country.flag))}">')
+
+
+flag_sprite = FlagSprite()
+
+
+def init_app(app):
+    flag_sprite.configure(app.config['FLAG_SPRITE_FOLDER'])
+    app.add_template_global(flag_sprite.render, 'flag')
+    app.add_template_global(flag_sprite.css_url, 'flag_sprite_css')
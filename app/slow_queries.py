@@ -0,0 +1,145 @@
+import re
+import math
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from flask import has_request_context, request
+
+
+logger = logging.getLogger('app.slow_queries')
+
+IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+VALUES_LIST = re.compile(r'(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+', re.IGNORECASE)
+
+
+def get_query_shape(sql: str):
+    """Sql with parameter lists folded, identical for queries differing only in number of values"""
+    shape = IN_LIST.sub('(?, ...)', sql)
+    return VALUES_LIST.sub(r'\1, ...', shape)
+
+
+def describe_params(params: tuple):
+    """Number and types of parameters, their values may be passwords or personal data"""
+    if not params:
+        return 'no params'
+    return f'{len(params)} params: ' + ', '.join(type(param).__name__ for param in params)
+
+
+class SlowQuery(NamedTuple):
+    sql: str
+    params: str
+    duration: float
+    endpoint: Optional[str]
+    timestamp: datetime
+
+
+class QueryShape:
+    """Slow queries of one shape"""
+
+    def __init__(self, shape: str, samples: int):
+        self.shape = shape
+        self.count = 0
+        self.total = 0.0
+        self.durations = deque(maxlen=samples)
+        self.endpoints = {}
+        self.plan: Optional[List[str]] = None
+
+    def add(self, query: SlowQuery):
+        self.count += 1
+        self.total += query.duration
+        self.durations.append(query.duration)
+        self.endpoints[query.endpoint] = self.endpoints.get(query.endpoint, 0) + 1
+
+    @property
+    def p95(self):
+        durations = sorted(self.durations)
+        return durations[max(0, math.ceil(len(durations) * 0.95) - 1)]
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+
+class SlowQueryLog:
+    """Queries slower than threshold with their plans grouped by shape"""
+
+    def __init__(self):
+        self.db = None
+        self.threshold = 0.1
+        self.explain = False
+        self.log_params = False
+        self.recent = deque(maxlen=100)
+        self.shapes: Dict[str, QueryShape] = {}
+        self.samples = 1000
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def configure(self, db, threshold: float, explain: bool = False, size: int = 100, samples: int = 1000,
+                  log_params: bool = False):
+        self.db = db
+        self.threshold = threshold
+        self.explain = explain
+        self.log_params = log_params
+        self.recent = deque(maxlen=size)
+        self.samples = samples
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.recent.clear()
+            self.shapes = {}
+
+    def on_query(self, sql: str, params, start: float, duration: float):
+        if duration < self.threshold or getattr(self.local, 'explaining', False):
+            return
+        endpoint = request.endpoint if has_request_context() else None
+        params = tuple(params or ())
+        shown_params = repr(params) if self.log_params else describe_params(params)
+        query = SlowQuery(sql, shown_params, duration, endpoint, datetime.utcnow())
+        shape = get_query_shape(sql)
+        with self.lock:
+            self.recent.append(query)
+            query_shape = self.shapes.get(shape)
+            if query_shape is None:
+                query_shape = self.shapes[shape] = QueryShape(shape, self.samples)
+            query_shape.add(query)
+            needs_plan = self.explain and query_shape.plan is None
+        logger.warning('slow query %.1f ms on %s: %s [%s]', duration * 1000, endpoint, sql, query.params)
+        if needs_plan:
+            query_shape.plan = self.explain_query(sql, params)
+
+    def explain_query(self, sql: str, params) -> List[str]:
+        """Sqlite query plan of statement, empty when it can not be explained"""
+        self.local.explaining = True
+        try:
+            cursor = self.db.execute_sql(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        except Exception:
+            return []
+        finally:
+            self.local.explaining = False
+
+    def report(self) -> List[QueryShape]:
+        """Shapes, most time consuming first"""
+        with self.lock:
+            shapes = list(self.shapes.values())
+        return sorted(shapes, key=lambda query_shape: query_shape.total, reverse=True)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def init_app(app):
+    if app.config['SLOW_QUERY_THRESHOLD'] is None:
+        return
+    slow_query_log.configure(
+        app.config['db'],
+        app.config['SLOW_QUERY_THRESHOLD'],
+        app.config['SLOW_QUERY_EXPLAIN'],
+        app.config['SLOW_QUERY_LOG_SIZE'],
+        log_params=app.config['SLOW_QUERY_LOG_PARAMS'],
+    )
+    app.config['db'].add_query_listener(slow_query_log.on_query)
@@ -0,0 +1,28 @@
+function showJob(element, job) {
+    let bar = element.querySelector('.progress-bar');
+    let text = element.querySelector('.job-message');
+    let percent = job.total ? Math.round(100 * job.done / job.total) : (job.status === 'done' ? 100 : 0);
+    bar.style.width = percent + '%';
+    bar.innerText = job.total ? job.done + ' / ' + job.total : job.status;
+    text.innerText = job.message || job.status;
+    if (job.status === 'done') {
+        bar.className = 'progress-bar progress-bar-success';
+    } else if (job.status === 'failed') {
+        bar.className = 'progress-bar progress-bar-danger';
+    }
+}
+
+function watchJob(element) {
+    fetch(element.dataset.jobUrl)
+        .then(response => response.json())
+        .then(job => {
+            showJob(element, job);
+            if (job.status === 'queued' || job.status === 'running') {
+                setTimeout(() => watchJob(element), 1000);
+            }
+        });
+}
+
+for (let element of document.querySelectorAll('.job-progress')) {
+    watchJob(element);
+}
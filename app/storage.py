@@ -0,0 +1,191 @@
+import io
+import os
+import shutil
+import time
+import mimetypes
+from typing import Optional
+
+from flask import url_for
+
+
+def guess_content_type(name: str):
+    """Content type from file name"""
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class LocalStorage:
+    """Media files in local folder served as static files"""
+
+    def __init__(self, folder: str, base_url: str):
+        self.folder = folder
+        self.base_url = base_url
+
+    def path(self, name: str):
+        return os.path.join(self.folder, name)
+
+    def exists(self, name: str):
+        return os.path.exists(self.path(name))
+
+    def save_file(self, name: str, path_to_file: str, content_type: Optional[str] = None):
+        """Move local file into storage"""
+        os.makedirs(self.folder, exist_ok=True)
+        shutil.move(path_to_file, self.path(name))
+
+    def save_bytes(self, name: str, data: bytes, content_type: Optional[str] = None):
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.path(name) + '.part', 'wb') as file:
+            file.write(data)
+        os.replace(self.path(name) + '.part', self.path(name))
+
+    def read(self, name: str) -> bytes:
+        with open(self.path(name), 'rb') as file:
+            return file.read()
+
+    def delete(self, name: str):
+        if self.exists(name):
+            os.remove(self.path(name))
+
+    def url(self, name: str):
+        """Stable url stored in database"""
+        return self.base_url + name
+
+    def download_url(self, name: str):
+        """Url client downloads bytes from"""
+        return self.url(name)
+
+    def name_from_url(self, url: str) -> Optional[str]:
+        """Stored name of url created by this storage"""
+        if url.startswith(self.base_url):
+            return url[len(self.base_url):]
+        return None
+
+
+class S3Storage:
+    """Media files in S3 compatible bucket, clients download them by pre-signed urls"""
+
+    def __init__(self, client, bucket: str, prefix: str = '', public_url: Optional[str] = None,
+                 url_expires: int = 3600, multipart_threshold: int = 8 * 1024 * 1024):
+        from boto3.s3.transfer import TransferConfig
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url
+        self.url_expires = url_expires
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold
+        )
+        self.known = set()
+        self.missing = {}
+
+    def key(self, name: str):
+        return self.prefix + name
+
+    def exists(self, name: str):
+        """Check object, found objects and recent misses are remembered"""
+        if name in self.known:
+            return True
+        if self.missing.get(name, 0) > time.time():
+            return False
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except self.client.exceptions.ClientError:
+            self.missing[name] = time.time() + 60
+            return False
+        self.known.add(name)
+        return True
+
+    def save_file(self, name: str, path_to_file: str, content_type: Optional[str] = None):
+        """Upload local file, large files are uploaded in parts"""
+        self.client.upload_file(
+            path_to_file,
+            self.bucket,
+            self.key(name),
+            ExtraArgs={'ContentType': content_type or guess_content_type(name)},
+            Config=self.transfer_config
+        )
+        os.remove(path_to_file)
+        self.known.add(name)
+        self.missing.pop(name, None)
+
+    def save_bytes(self, name: str, data: bytes, content_type: Optional[str] = None):
+        self.client.upload_fileobj(
+            io.BytesIO(data),
+            self.bucket,
+            self.key(name),
+            ExtraArgs={'ContentType': content_type or guess_content_type(name)},
+            Config=self.transfer_config
+        )
+        self.known.add(name)
+        self.missing.pop(name, None)
+
+    def read(self, name: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(name))['Body'].read()
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+        self.known.discard(name)
+
+    def url(self, name: str):
+        """Stable url stored in database"""
+        if self.public_url:
+            return self.public_url + self.key(name)
+        return url_for('media.show_media', name=name)
+
+    def download_url(self, name: str):
+        """Url client downloads bytes from"""
+        if self.public_url:
+            return self.url(name)
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self.key(name)},
+            ExpiresIn=self.url_expires
+        )
+
+    def name_from_url(self, url: str) -> Optional[str]:
+        """Stored name of url created by this storage"""
+        prefix = self.public_url + self.prefix if self.public_url else '/media/'
+        if url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+
+class MediaStorage:
+    """Storage configured for application"""
+
+    def __init__(self):
+        self.backend = None
+
+    def __getattr__(self, name):
+        if self.backend is None:
+            raise RuntimeError('Media storage is not configured')
+        return getattr(self.backend, name)
+
+
+media_storage = MediaStorage()
+
+
+def create_storage(config):
+    """Create storage backend from application config"""
+    if config['MEDIA_STORAGE'] == 's3':
+        import boto3
+
+        client = boto3.client(
+            's3',
+            endpoint_url=config['MEDIA_S3_ENDPOINT_URL'],
+            region_name=config['MEDIA_S3_REGION']
+        )
+        return S3Storage(
+            client,
+            config['MEDIA_S3_BUCKET'],
+            prefix=config['MEDIA_S3_PREFIX'],
+            public_url=config['MEDIA_PUBLIC_URL'],
+            url_expires=config['MEDIA_URL_EXPIRES'],
+            multipart_threshold=config['MEDIA_MULTIPART_THRESHOLD']
+        )
+    return LocalStorage(config['UPLOAD_FOLDER'], config['UPLOAD_URL'])
+
+
+def init_app(app):
+    media_storage.backend = create_storage(app.config)
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+from flask import g, has_request_context, request
+
+
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def new_id(size: int):
+    return os.urandom(size).hex()
+
+
+def format_attribute(key: str, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Span:
+    """Timed operation inside trace, used as context manager for nested operations"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, trace, name: str, kind: int, parent_id: Optional[str], start: float, attributes: Dict):
+        self.trace = trace
+        self.span_id = new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = None
+        self.attributes = attributes
+        self.error = False
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.trace.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.perf_counter()
+        self.error = self.error or exc_type is not None
+        self.trace.stack.pop()
+        self.trace.spans.append(self)
+        return False
+
+    def to_json(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.trace.to_unix_nano(self.start)),
+            'endTimeUnixNano': str(self.trace.to_unix_nano(self.end)),
+            'attributes': [format_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': STATUS_ERROR if self.error else STATUS_OK},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class NoopSpan:
+    """Span of unsampled or missing trace"""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Trace:
+    """Spans of one request"""
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self.stack: List[Span] = []
+        self.unix_nano = time.time_ns()
+        self.perf = time.perf_counter()
+
+    def to_unix_nano(self, perf: float):
+        return self.unix_nano + int((perf - self.perf) * 1e9)
+
+    @property
+    def current_id(self):
+        return self.stack[-1].span_id if self.stack else self.parent_id
+
+
+class FileExporter:
+    """Traces as OTLP JSON lines in size rotated files"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 service_name: str = 'flask_weather'):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.handler = self.open(path)
+        self.resource = {'attributes': [format_attribute('service.name', service_name)]}
+
+    def open(self, path: str):
+        return RotatingFileHandler(
+            path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8', delay=True
+        )
+
+    def reopen_for_process(self):
+        """Write to file of current process from now on.
+
+        Forked workers must not share handler of master, rotation by one worker would cut off others.
+        """
+        self.handler.close()
+        root, extension = os.path.splitext(self.path)
+        self.handler = self.open(f'{root}.{os.getpid()}{extension}')
+
+    def export(self, spans: List[Span]):
+        line = json.dumps({'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_json() for span in spans]}],
+        }]}, separators=(',', ':'))
+        self.handler.handle(logging.makeLogRecord({'msg': line}))
+
+    def close(self):
+        self.handler.close()
+
+
+class Tracer:
+    """Request traces with child spans of queries and weather lookups"""
+
+    def __init__(self):
+        self.exporter = None
+        self.sample_rate = 0.0
+
+    def configure(self, exporter: Optional[FileExporter], sample_rate: float):
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.close()
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def current(self) -> Optional[Trace]:
+        """Sampled trace of current request"""
+        if self.exporter is None or not has_request_context():
+            return None
+        trace = g.get('trace')
+        if trace is None or not trace.sampled:
+            return None
+        return trace
+
+    def span(self, name: str, kind: int = INTERNAL, **attributes):
+        """Child span of innermost open span, no-op outside of sampled trace"""
+        trace = self.current()
+        if trace is None:
+            return NOOP_SPAN
+        return Span(trace, name, kind, trace.current_id, time.perf_counter(), attributes)
+
+    def record_span(self, name: str, start: float, duration: float, kind: int = INTERNAL,
+                    error: bool = False, **attributes):
+        """Add finished span timed by caller"""
+        trace = self.current()
+        if trace is None:
+            return
+        span = Span(trace, name, kind, trace.current_id, start, attributes)
+        span.end = start + duration
+        span.error = error
+        trace.spans.append(span)
+
+    def start_request(self):
+        matched = TRACEPARENT.match(request.headers.get('traceparent', ''))
+        if matched:
+            trace_id, parent_id, flags = matched.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = new_id(16), None
+            sampled = random.random() < self.sample_rate
+        trace = g.trace = Trace(trace_id, parent_id, sampled)
+        span = Span(trace, f'{request.method} {request.endpoint}', SERVER, parent_id, trace.perf, {
+            'http.method': request.method,
+            'http.target': request.path,
+        })
+        if request.url_rule is not None:
+            span.set_attribute('http.route', request.url_rule.rule)
+        span.__enter__()
+
+    def finish_request(self, response):
+        trace = g.get('trace')
+        if trace is None:
+            return response
+        request_span = trace.stack[0]
+        response.headers['traceparent'] = f'00-{trace.trace_id}-{request_span.span_id}-{"01" if trace.sampled else "00"}'
+        response.headers['X-Trace-Id'] = trace.trace_id
+        request_span.set_attribute('http.status_code', response.status_code)
+        request_span.error = response.status_code >= 500
+        while trace.stack:
+            trace.stack[-1].__exit__(None, None, None)
+        if trace.sampled and self.exporter is not None:
+            self.exporter.export(trace.spans)
+        return response
+
+    def on_query(self, sql: str, params, start: float, duration: float):
+        self.record_span('db.query', start, duration, CLIENT, **{'db.system': 'sqlite', 'db.statement': sql})
+
+    def on_upstream(self, city: str, start: float, duration: float, status):
+        self.record_span(
+            'weather.upstream', start, duration, CLIENT, error=status != 200,
+            **{'http.status_code': status or 0, 'weather.city': city}
+        )
+
+
+tracer = Tracer()
+
+
+def init_app(app):
+    from weather import getting_weather
+
+    if not app.config['TRACING_FILE']:
+        tracer.configure(None, 0.0)
+        return
+    exporter = FileExporter(app.config['TRACING_FILE'], app.config['TRACING_MAX_BYTES'], app.config['TRACING_BACKUP_COUNT'])
+    tracer.configure(exporter, app.config['TRACING_SAMPLE_RATE'])
+    app.config['db'].add_query_listener(tracer.on_query)
+    if tracer.on_upstream not in getting_weather.upstream_listeners:
+        getting_weather.upstream_listeners.append(tracer.on_upstream)
+    app.before_request(tracer.start_request)
+    app.after_request(tracer.finish_request)
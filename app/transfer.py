@@ -0,0 +1,204 @@
+import io
+import csv
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from peewee import DatabaseError, DateTimeField, chunked
+
+from app.auth.models import Profile, User
+from app.weather.models import UserCity
+from app.versions import bump_version, user_cities_list, USERS_LIST
+
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+BUFFER_ROWS = 1000
+MAX_REPORTED_ERRORS = 1000
+SQLITE_MAX_VARIABLES = 32766
+
+
+class Table(NamedTuple):
+    model: type
+    columns: Tuple[str, ...]
+    version_keys: Callable[[Dict], Iterable[str]]
+
+
+TABLES = {
+    'profiles': Table(Profile, ('id', 'avatar', 'info'), lambda row: (USERS_LIST,)),
+    'users': Table(
+        User, ('id', 'name', 'email', 'password_hash', 'last_visit', 'role_id', 'profile_id'),
+        lambda row: (USERS_LIST,)
+    ),
+    'user_cities': Table(UserCity, ('id', 'city_id', 'user_id'), lambda row: (user_cities_list(row['user_id']),)),
+}
+
+
+class RowError(NamedTuple):
+    line: int
+    message: str
+
+
+class ImportReport:
+    """Result of import, errors beyond limit are only counted"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[RowError] = []
+
+    def add_error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, message))
+
+    def to_json(self):
+        return {
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': [error._asdict() for error in sorted(self.errors)],
+        }
+
+
+def get_format(filename: str, default: str = 'ndjson'):
+    """File format from extension of filename"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+
+def get_fields(table: Table):
+    fields = {field.column_name: field for field in table.model._meta.sorted_fields}
+    return [fields[column] for column in table.columns]
+
+
+def format_value(value):
+    return '' if value is None else str(value)
+
+
+def export_rows(table: Table, file_format: str) -> Iterator[str]:
+    """Rows in id order as csv or ndjson chunks, read with server side cursor in constant memory"""
+    fields = get_fields(table)
+    query = table.model.select(*fields).order_by(table.model.id).tuples()
+    buffer = io.StringIO()
+    writer = None
+    if file_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(table.columns)
+    for count, row in enumerate(query.iterator(), 1):
+        if writer is not None:
+            writer.writerow([format_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(table.columns, map(serialize_value, row))), separators=(',', ':')))
+            buffer.write('\n')
+        if count % BUFFER_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def serialize_value(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def read_rows(file: TextIO, file_format: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """(line, row, error) of every record of file, error when record can not be parsed"""
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            yield line, None, f'invalid json: {error}'
+            continue
+        if not isinstance(row, dict):
+            yield line, None, 'record is not an object'
+            continue
+        yield line, row, None
+
+
+def convert_row(fields, row: Dict) -> Dict:
+    """Row with values adapted to fields, raises ValueError on missing or invalid values
+
+    Every column is set so rows of one chunk share columns of multi row insert,
+    missing id is NULL which sqlite replaces with next rowid.
+    """
+    converted = {}
+    for field in fields:
+        value = row.get(field.column_name)
+        if value is None or value == '':
+            if field.default is not None:
+                converted[field.column_name] = field.default() if callable(field.default) else field.default
+            elif field.null or field.column_name == 'id':
+                converted[field.column_name] = None
+            else:
+                raise ValueError(f'{field.column_name} is required')
+            continue
+        try:
+            adapted = field.adapt(value)
+        except (TypeError, ValueError):
+            adapted = None
+        if adapted is None or isinstance(field, DateTimeField) and isinstance(adapted, str):
+            raise ValueError(f'{field.column_name} has invalid value {value!r}')
+        converted[field.column_name] = adapted
+    return converted
+
+
+def insert_chunk(db, table: Table, chunk: List[Tuple[int, Dict]], report: ImportReport):
+    """Insert chunk in one transaction, row by row with savepoints when chunk is rejected"""
+    rows = [row for _, row in chunk]
+    try:
+        with db.atomic():
+            for batch in chunked(rows, SQLITE_MAX_VARIABLES // len(table.columns)):
+                table.model.insert_many(batch).execute()
+            bump_version(*{key for row in rows for key in table.version_keys(row)})
+        report.inserted += len(rows)
+        return
+    except DatabaseError:
+        pass
+    with db.atomic():
+        inserted = []
+        for line, row in chunk:
+            try:
+                with db.atomic():
+                    table.model.insert(row).execute()
+                inserted.append(row)
+            except DatabaseError as error:
+                report.add_error(line, str(error))
+        bump_version(*{key for row in inserted for key in table.version_keys(row)})
+    report.inserted += len(inserted)
+
+
+def import_rows(db, table: Table, file: TextIO, file_format: str, chunk_size: int = 1000,
+                progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Insert records of file in transactions of chunk_size rows, invalid rows are reported and skipped
+
+    progress is called with report after every committed chunk.
+    """
+    fields = get_fields(table)
+    report = ImportReport()
+    chunk = []
+    for line, row, error in read_rows(file, file_format):
+        if error is None:
+            try:
+                row = convert_row(fields, row)
+            except ValueError as conversion_error:
+                error = str(conversion_error)
+        if error is not None:
+            report.add_error(line, error)
+            continue
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            insert_chunk(db, table, chunk, report)
+            chunk = []
+            if progress is not None:
+                progress(report)
+    if chunk:
+        insert_chunk(db, table, chunk, report)
+    return report
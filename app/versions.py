@@ -0,0 +1,37 @@
+from peewee import CharField, IntegerField
+
+from app.base_model import BaseModel
+
+
+CITIES_LIST = 'cities'
+COUNTRIES = 'countries'
+USERS_LIST = 'users'
+
+
+def user_cities_list(user_id: int):
+    """Version key of cities list of user"""
+    return f'user_cities:{user_id}'
+
+
+class DataVersion(BaseModel):
+    key = CharField(max_length=100, unique=True, index=True)
+    version = IntegerField(default=0)
+
+
+def get_version(key: str):
+    """Get current version of data behind key"""
+    return DataVersion.select(DataVersion.version).where(DataVersion.key == key).scalar() or 0
+
+
+def bump_version(*keys: str):
+    """Mark data behind keys as changed"""
+    for key in keys:
+        (
+            DataVersion
+            .insert(key=key, version=1)
+            .on_conflict(
+                conflict_target=[DataVersion.key],
+                update={DataVersion.version: DataVersion.version + 1}
+            )
+            .execute()
+        )
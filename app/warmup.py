@@ -0,0 +1,29 @@
+from typing import Dict
+
+from jinja2 import TemplateError
+
+from app.weather.countries import country_table
+from weather.weather_cache import weather_cache
+
+
+def compile_templates(app):
+    """Compile every template into environment cache, returns number of compiled templates"""
+    compiled = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError:
+            continue
+        compiled += 1
+    return compiled
+
+
+def warm_up(app) -> Dict[str, int]:
+    """Load read-only data and templates before serving, returns loaded counts"""
+    with app.app_context():
+        countries = country_table.load()
+    return {
+        'countries': countries,
+        'templates': compile_templates(app),
+        'weather': len(weather_cache),
+    }
@@ -0,0 +1,53 @@
+from typing import Dict, Optional
+
+from peewee import OperationalError
+
+from app.versions import COUNTRIES, get_version
+from app.weather.models import Country
+
+
+class CountryTable:
+    """Countries by code held in process memory.
+
+    Table is only written when countries are reloaded, which bumps COUNTRIES version, so every
+    process drops its copy once it sees newer version.
+    """
+
+    def __init__(self):
+        self.countries: Dict[str, Country] = {}
+        self.version = None
+
+    def load(self):
+        """Read whole table, returns number of countries"""
+        try:
+            self.version = get_version(COUNTRIES)
+            self.countries = {country.code: country for country in Country.select()}
+        except OperationalError:
+            self.clear()
+        return len(self.countries)
+
+    def clear(self):
+        self.countries = {}
+        self.version = None
+
+    def check_version(self):
+        """Forget countries read before last reload of countries table"""
+        try:
+            version = get_version(COUNTRIES)
+        except OperationalError:
+            return
+        if version != self.version:
+            self.countries = {}
+            self.version = version
+
+    def get(self, code: str) -> Optional[Country]:
+        self.check_version()
+        country = self.countries.get(code)
+        if country is None:
+            country = Country.select().where(Country.code == code).first()
+            if country is not None:
+                self.countries[code] = country
+        return country
+
+
+country_table = CountryTable()
@@ -0,0 +1,212 @@
+import time
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from peewee import EXCLUDED, DatabaseError, IntegrityError, fn
+
+from app.base_model import database_proxy
+from app.weather.models import City, WeatherObservation, WeatherRollup
+from weather.weather_record import WeatherRecord
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_numpy():
+    """Numpy is imported by first aggregation, most workers never need it"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+RESOLUTIONS = {
+    'hour': 60 * 60,
+    'day': 24 * 60 * 60,
+}
+
+
+def get_bucket(timestamp: int, resolution: str):
+    """Get start of rollup bucket for timestamp"""
+    size = RESOLUTIONS[resolution]
+    return timestamp - timestamp % size
+
+
+def parse_observation(record: WeatherRecord):
+    """Pick observation fields from weather record"""
+    return {
+        'timestamp': record.timestamp or int(time.time()),
+        'temperature': record.temperature,
+        'wind_speed': record.wind_speed,
+        'sky': record.sky,
+        'latitude': record.latitude,
+        'longitude': record.longitude,
+    }
+
+
+def update_rollups(city_id: int, observation: Dict):
+    """Fold one observation into hourly and daily rollups"""
+    temperature = observation['temperature']
+    wind_speed = observation['wind_speed']
+    for resolution in RESOLUTIONS:
+        (
+            WeatherRollup
+            .insert(
+                city=city_id,
+                resolution=resolution,
+                bucket=get_bucket(observation['timestamp'], resolution),
+                samples=1,
+                temperature_min=temperature,
+                temperature_max=temperature,
+                temperature_sum=temperature,
+                wind_speed_min=wind_speed,
+                wind_speed_max=wind_speed,
+                wind_speed_sum=wind_speed,
+            )
+            .on_conflict(
+                conflict_target=[WeatherRollup.city, WeatherRollup.resolution, WeatherRollup.bucket],
+                update={
+                    WeatherRollup.samples: WeatherRollup.samples + 1,
+                    WeatherRollup.temperature_min: fn.MIN(WeatherRollup.temperature_min, EXCLUDED.temperature_min),
+                    WeatherRollup.temperature_max: fn.MAX(WeatherRollup.temperature_max, EXCLUDED.temperature_max),
+                    WeatherRollup.temperature_sum: WeatherRollup.temperature_sum + EXCLUDED.temperature_sum,
+                    WeatherRollup.wind_speed_min: fn.MIN(WeatherRollup.wind_speed_min, EXCLUDED.wind_speed_min),
+                    WeatherRollup.wind_speed_max: fn.MAX(WeatherRollup.wind_speed_max, EXCLUDED.wind_speed_max),
+                    WeatherRollup.wind_speed_sum: WeatherRollup.wind_speed_sum + EXCLUDED.wind_speed_sum,
+                }
+            )
+            .execute()
+        )
+
+
+def record_observation(city_name: str, record: WeatherRecord):
+    """Write observation of monitored city and update its rollups.
+
+    Returns False for unknown city or when history can not be written, weather lookup goes on.
+    """
+    try:
+        city_id = (
+            City
+            .select(City.id)
+            .where(City.name == city_name.capitalize())
+            .scalar()
+        )
+        if city_id is None:
+            return False
+
+        observation = parse_observation(record)
+        with database_proxy.atomic():
+            WeatherObservation.insert(city=city_id, **observation).execute()
+            update_rollups(city_id, observation)
+    except IntegrityError:
+        # upstream returns the same measurement until the station reports again
+        pass
+    except DatabaseError:
+        logger.exception('weather history of %s not recorded', city_name)
+        return False
+    return True
+
+
+def get_observations(city_id: int, start: Optional[int] = None, end: Optional[int] = None):
+    """Get raw observations of city in [start, end) as tuples"""
+    query = (
+        WeatherObservation
+        .select(
+            WeatherObservation.timestamp,
+            WeatherObservation.temperature,
+            WeatherObservation.wind_speed,
+            WeatherObservation.sky,
+            WeatherObservation.latitude,
+            WeatherObservation.longitude
+        )
+        .where(WeatherObservation.city == city_id)
+        .order_by(WeatherObservation.timestamp)
+    )
+    if start is not None:
+        query = query.where(WeatherObservation.timestamp >= start)
+    if end is not None:
+        query = query.where(WeatherObservation.timestamp < end)
+    return list(query.tuples())
+
+
+def get_rollups(city_id: int, resolution: str, start: Optional[int] = None, end: Optional[int] = None):
+    """Get precomputed rollups of city in [start, end)"""
+    query = (
+        WeatherRollup
+        .select(
+            WeatherRollup.bucket,
+            WeatherRollup.samples,
+            WeatherRollup.temperature_min,
+            WeatherRollup.temperature_max,
+            WeatherRollup.temperature_sum / WeatherRollup.samples,
+            WeatherRollup.wind_speed_min,
+            WeatherRollup.wind_speed_max,
+            WeatherRollup.wind_speed_sum / WeatherRollup.samples
+        )
+        .where(WeatherRollup.city == city_id, WeatherRollup.resolution == resolution)
+        .order_by(WeatherRollup.bucket)
+    )
+    if start is not None:
+        query = query.where(WeatherRollup.bucket >= get_bucket(start, resolution))
+    if end is not None:
+        query = query.where(WeatherRollup.bucket < end)
+    return list(query.tuples())
+
+
+def aggregate_observations(observations: Sequence[Tuple], bucket_size: int) -> List[Tuple]:
+    """Aggregate raw observations into buckets of bucket_size seconds.
+
+    Returns tuples in the same layout as get_rollups.
+    """
+    if not observations:
+        return []
+    numpy = load_numpy()
+    if numpy is None:
+        return _aggregate_python(observations, bucket_size)
+
+    timestamps = numpy.fromiter((row[0] for row in observations), dtype=numpy.int64, count=len(observations))
+    temperature = numpy.fromiter((row[1] for row in observations), dtype=numpy.float64, count=len(observations))
+    wind_speed = numpy.fromiter((row[2] for row in observations), dtype=numpy.float64, count=len(observations))
+
+    buckets = timestamps - timestamps % bucket_size
+    order = numpy.argsort(buckets, kind='stable')
+    buckets, temperature, wind_speed = buckets[order], temperature[order], wind_speed[order]
+    starts, indexes, samples = numpy.unique(buckets, return_index=True, return_counts=True)
+
+    columns = (
+        samples,
+        numpy.minimum.reduceat(temperature, indexes),
+        numpy.maximum.reduceat(temperature, indexes),
+        numpy.add.reduceat(temperature, indexes) / samples,
+        numpy.minimum.reduceat(wind_speed, indexes),
+        numpy.maximum.reduceat(wind_speed, indexes),
+        numpy.add.reduceat(wind_speed, indexes) / samples,
+    )
+    return [
+        (int(start), int(count), *map(float, values))
+        for start, count, *values in zip(starts, *columns)
+    ]
+
+
+def _aggregate_python(observations: Sequence[Tuple], bucket_size: int) -> List[Tuple]:
+    """Pure python fallback of aggregate_observations"""
+    buckets = {}
+    for timestamp, temperature, wind_speed, *_ in observations:
+        bucket = buckets.setdefault(timestamp - timestamp % bucket_size, [])
+        bucket.append((temperature, wind_speed))
+    aggregated = []
+    for start in sorted(buckets):
+        temperature, wind_speed = zip(*buckets[start])
+        samples = len(temperature)
+        aggregated.append((
+            start,
+            samples,
+            min(temperature),
+            max(temperature),
+            sum(temperature) / samples,
+            min(wind_speed),
+            max(wind_speed),
+            sum(wind_speed) / samples,
+        ))
+    return aggregated
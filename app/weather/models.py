@@ -1,4 +1,4 @@
-from peewee import CharField, ForeignKeyField
+from peewee import CharField, ForeignKeyField, IntegerField, FloatField
 from app.base_model import BaseModel
 from app.auth.models import User
 
@@ -17,3 +17,44 @@ class City(BaseModel):
 class UserCity(BaseModel):
     city = ForeignKeyField(City, backref='city_user')
     user = ForeignKeyField(User, backref='city_user')
+
+
+class WeatherObservation(BaseModel):
+    city = ForeignKeyField(City, backref='observations', on_delete='CASCADE')
+    timestamp = IntegerField()
+    temperature = FloatField()
+    wind_speed = FloatField()
+    sky = CharField(max_length=100)
+    latitude = FloatField()
+    longitude = FloatField()
+
+    class Meta:
+        indexes = (
+            (('city', 'timestamp'), True),
+        )
+
+
+class WeatherRollup(BaseModel):
+    city = ForeignKeyField(City, backref='rollups', on_delete='CASCADE')
+    resolution = CharField(max_length=4)
+    bucket = IntegerField()
+    samples = IntegerField(default=0)
+    temperature_min = FloatField()
+    temperature_max = FloatField()
+    temperature_sum = FloatField()
+    wind_speed_min = FloatField()
+    wind_speed_max = FloatField()
+    wind_speed_sum = FloatField()
+
+    class Meta:
+        indexes = (
+            (('city', 'resolution', 'bucket'), True),
+        )
+
+    @property
+    def temperature_avg(self):
+        return self.temperature_sum / self.samples
+
+    @property
+    def wind_speed_avg(self):
+        return self.wind_speed_sum / self.samples
@@ -13,6 +13,11 @@ from app.weather import weather
 from app.weather.forms import CityForm
 from weather.getting_weather import main as getting_weather
 from app.weather.models import Country, City, User, UserCity
+from app.weather.countries import country_table
+from app.proxy.sprites import flag_sprite
+from app.http_cache import conditional, weather_max_age
+from app.versions import bump_version, get_version, user_cities_list, CITIES_LIST, USERS_LIST
+from weather.weather_cache import weather_cache
 
 
 @weather.route('/', methods=['GET', 'POST'])
@@ -27,11 +32,11 @@ def index():
         api_key = current_app.config['WEATHER_API_KEY']
         city_name = form.city_name.data
         city_weather = getting_weather(city_name, api_key)
-        if 'error' in city_weather:
+        if isinstance(city_weather, dict):
             flash(city_weather['error'])
             return redirect(url_for('weather.index'))
-        country = Country.select().where(Country.code == city_weather['country']).first()
-        city_weather['country'] = country.name
+        country = country_table.get(city_weather.country)
+        city_weather = city_weather._replace(country=country.name)
 
     return render_template(
         'weather/get_weather.html',
@@ -47,28 +52,51 @@ def index():
 @login_required
 def show_city():
     """Show cities added into database"""
+    country_name = request.args.get('country_name')
     user_cities = (
         UserCity
-        .select(City)
-        .join(User)
-        .switch(UserCity)
+        .select(UserCity, City, Country)
         .join(City)
+        .join(Country)
         .where(UserCity.user == current_user.id)
         .order_by(City.name)
     )
-    country_name = request.args.get('country_name')
     if country_name:
-        user_cities = [city for city in user_cities if city.city.country.name == country_name]
-
+        user_cities = user_cities.where(Country.name == country_name)
+
+    cities_fragment_key = (
+        'user_cities',
+        current_user.id,
+        get_version(user_cities_list(current_user.id)),
+        get_version(CITIES_LIST),
+        country_name,
+        flag_sprite.css
+    )
     return render_template(
         'weather/show_cities_weather.html',
         title='Show cities weather',
-        cities=user_cities
+        cities=user_cities,
+        cities_fragment_key=cities_fragment_key
+    )
+
+
+def city_detail_version(city_name):
+    """Data versions behind city detail page, None until weather of city is cached"""
+    city_weather = weather_cache.get(city_name)
+    if city_weather is None:
+        return None
+    return (
+        current_user.id,
+        get_version(user_cities_list(current_user.id)),
+        get_version(USERS_LIST),
+        city_name.capitalize(),
+        city_weather.timestamp
     )
 
 
 @weather.route('/show/city/<string:city_name>')
 @login_required
+@conditional(city_detail_version, max_age=weather_max_age, private=True)
 def show_city_detail(city_name):
     """Show detail about city added into database"""
     api_key = current_app.config['WEATHER_API_KEY']
@@ -88,10 +116,11 @@ def show_city_detail(city_name):
         abort(404)
 
     city_weather = getting_weather(user_city.city.name, api_key)
-    if 'error' in city_weather:
+    if isinstance(city_weather, dict):
         flash(city_weather['error'])
         return redirect(url_for('weather.index'))
 
+    city_weather = city_weather.to_dict()
     city_weather['country'] = user_city.city.country.name
     city_weather['name'] = user_city.city.name
     city_weather['flag_url'] = user_city.city.country.flag
@@ -117,6 +146,7 @@ def add_city():
                 country=country
             )
             city_instance.save()
+            bump_version(CITIES_LIST)
 
         user_city = UserCity.select().where(UserCity.user == current_user, UserCity.city == city_instance).first()
         if user_city:
@@ -125,6 +155,7 @@ def add_city():
 
         user_city = UserCity(user=current_user, city=city_instance)
         user_city.save()
+        bump_version(user_cities_list(current_user.id))
 
         flash(f'City: {city} added to list of user {current_user.name}')
 
@@ -148,6 +179,7 @@ def delete_cities():
             .delete()
             .where(UserCity.user == current_user.id, UserCity.city.in_(selectors)).execute()
         )
+        bump_version(user_cities_list(current_user.id))
 
         cities_to_delete = City.select().where(City.id.in_(selectors)).order_by(City.name)
         for city in cities_to_delete:
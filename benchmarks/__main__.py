@@ -0,0 +1,57 @@
+"""Benchmarks of application hot paths.
+
+    python -m benchmarks run [-k name] [--quick] [--repeat N] [-o results.json]
+    python -m benchmarks compare baseline.json results.json [--threshold 0.1]
+
+Compare exits with status 1 when any benchmark is slower than baseline by more than threshold.
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from definitions import PATH_TO_ROOT
+from benchmarks import suite
+from benchmarks.runner import compare, format_comparison, load_results, run, save_results
+
+
+PATH_TO_RESULTS = os.path.join(PATH_TO_ROOT, 'benchmarks', 'results')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Application benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and save results as json')
+    run_parser.add_argument('-k', dest='names', action='append', help='run benchmarks containing name')
+    run_parser.add_argument('--quick', action='store_true', help='skip slow benchmarks')
+    run_parser.add_argument('--repeat', type=int, help='override repeat count')
+    run_parser.add_argument('-o', '--output', help='path to results file')
+
+    compare_parser = commands.add_parser('compare', help='compare results with baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 is 10%%')
+    compare_parser.add_argument('--metric', default='median', choices=['min', 'median', 'mean', 'p95'])
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        results = run(args.names, args.quick, args.repeat)
+        output = args.output or os.path.join(PATH_TO_RESULTS, f'{datetime.now():%Y%m%d-%H%M%S}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        save_results(results, output)
+        print(f'Results saved to {output}')
+        return 0
+
+    comparisons = compare(load_results(args.baseline), load_results(args.current), args.threshold, args.metric)
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    regressions = [comparison for comparison in comparisons if comparison.regression]
+    if regressions:
+        print(f'{len(regressions)} regression(s) above {args.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Load generator running user journeys against a running application.
+
+    python -m benchmarks.load --url http://127.0.0.1:5000 --users 20 --duration 60 --credentials credentials.json
+
+Users log in with accounts from credentials.json written by seeding of main page. Start application
+with WEATHER_API_URL pointing to benchmarks.stub_server to keep upstream out of measurements, and with
+THROTTLE_ENABLED=0 as virtual users log in from one address far faster than login throttle allows.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import requests
+
+from definitions import PATH_TO_ROOT
+from benchmarks.runner import percentile
+
+
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+COUNTRY_ID = re.compile(r'name="country" value="(\d+)"')
+CITIES = ['Paris', 'Tokyo', 'Madrid', 'Ottawa', 'Toronto', 'Chicago', 'Washington', 'Barcelona']
+
+
+class Recorder:
+    """Latencies and failures of journey steps shared by all virtual users"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.failures = Counter()
+        self.statuses = defaultdict(Counter)
+
+    def record(self, step: str, latency: float, status: Optional[int], ok: bool):
+        with self.lock:
+            self.latencies[step].append(latency)
+            self.statuses[step][status] += 1
+            if not ok:
+                self.failures[step] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        """Throughput and latency percentiles per step, milliseconds"""
+        steps = {}
+        with self.lock:
+            for step, latencies in sorted(self.latencies.items()):
+                steps[step] = {
+                    'requests': len(latencies),
+                    'failures': self.failures[step],
+                    'rps': len(latencies) / elapsed,
+                    'p50': percentile(latencies, 50) * 1000,
+                    'p90': percentile(latencies, 90) * 1000,
+                    'p99': percentile(latencies, 99) * 1000,
+                    'max': max(latencies) * 1000,
+                    'statuses': {str(status): count for status, count in self.statuses[step].items()},
+                }
+            total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            'elapsed': elapsed,
+            'requests': total,
+            'failures': sum(self.failures.values()),
+            'rps': total / elapsed if elapsed else 0.0,
+            'steps': steps,
+        }
+
+
+class VirtualUser:
+    """One client session with kept alive connections"""
+
+    def __init__(self, base_url: str, credentials: Dict[str, str], recorder: Recorder, timeout: float = 30):
+        self.base_url = base_url.rstrip('/')
+        self.credentials = credentials
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.random = random.Random()
+
+    def request(self, step: str, method: str, path: str, expected=(200, 201, 204, 302), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, allow_redirects=False, timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException:
+            self.recorder.record(step, time.perf_counter() - start, None, False)
+            return None
+        self.recorder.record(step, time.perf_counter() - start, response.status_code, response.status_code in expected)
+        return response
+
+    def csrf_token(self, response) -> Optional[str]:
+        matched = CSRF_TOKEN.search(response.text) if response is not None else None
+        return matched.group(1) if matched else None
+
+    def login(self):
+        page = self.request('login_form', 'GET', '/auth/login')
+        response = self.request('login', 'POST', '/auth/login', data={
+            'csrf_token': self.csrf_token(page),
+            'email': self.credentials['email'],
+            'password': self.credentials['password'],
+        })
+        return response is not None and response.status_code == 302
+
+    def browse(self, cities: List[str]):
+        """Look up weather, add city and watch own cities"""
+        if not self.login():
+            return
+        city = self.random.choice(cities)
+        page = self.request('weather_form', 'GET', '/weather/')
+        found = self.request('get_weather', 'POST', '/weather/', data={
+            'csrf_token': self.csrf_token(page), 'city_name': city
+        })
+        country = COUNTRY_ID.search(found.text) if found is not None else None
+        if country is not None:
+            self.request('add_city', 'POST', '/weather/add/city', data={
+                'csrf_token': self.csrf_token(found), 'city': city, 'country': country.group(1)
+            })
+        self.request('show_city', 'GET', '/weather/show/city')
+        self.request('show_city_detail', 'GET', f'/weather/show/city/{city}')
+        self.request('logout', 'GET', '/auth/logout')
+
+    def api(self, cities: List[str], destructive: bool = False):
+        """Create, read and update cities with API"""
+        city = self.random.choice(cities)
+        self.request('api_post', 'POST', '/api/v1/cities/', json={'name': city}, expected=(200, 201))
+        listed = self.request('api_get', 'GET', '/api/v1/cities/')
+        if listed is not None and listed.status_code == 200 and listed.json():
+            existing = self.random.choice(listed.json())
+            self.request('api_put', 'PUT', '/api/v1/cities/', json={'id': existing['id'], 'name': existing['name']})
+        if destructive:
+            self.request('api_delete', 'DELETE', '/api/v1/cities/')
+
+
+def run_load(base_url: str, accounts: List[Dict[str, str]], users: int = 10, duration: float = 30,
+             journeys=('browse', 'api'), cities: Optional[List[str]] = None, destructive: bool = False) -> Dict:
+    """Run journeys with concurrent virtual users for duration seconds, return report"""
+    recorder = Recorder()
+    cities = cities or CITIES
+    deadline = time.monotonic() + duration
+
+    def run_user(index: int):
+        user = VirtualUser(base_url, accounts[index % len(accounts)], recorder)
+        while time.monotonic() < deadline:
+            journey = user.random.choice(journeys)
+            if journey == 'browse':
+                user.browse(cities)
+            else:
+                user.api(cities, destructive)
+
+    threads = [threading.Thread(target=run_user, args=(index,), daemon=True) for index in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - start)
+
+
+def format_report(report: Dict):
+    lines = [f'{"step":<20}{"requests":>10}{"failed":>8}{"rps":>9}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}']
+    for step, stats in report['steps'].items():
+        lines.append(
+            f'{step:<20}{stats["requests"]:>10}{stats["failures"]:>8}{stats["rps"]:>9.1f}'
+            f'{stats["p50"]:>10.1f}{stats["p90"]:>10.1f}{stats["p99"]:>10.1f}'
+        )
+    lines.append(f'{report["requests"]} requests, {report["failures"]} failed, {report["rps"]:.1f} rps '
+                 f'in {report["elapsed"]:.1f} s')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load', description='Load test of application')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--journeys', default='browse,api')
+    parser.add_argument('--credentials', default=f'{PATH_TO_ROOT}/credentials.json')
+    parser.add_argument('--destructive', action='store_true', help='include API DELETE of all cities')
+    parser.add_argument('-o', '--output', help='save report as json')
+    args = parser.parse_args(argv)
+
+    with open(args.credentials) as credentials_file:
+        accounts = json.load(credentials_file)
+    report = run_load(args.url, accounts, args.users, args.duration, args.journeys.split(','),
+                      destructive=args.destructive)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import gc
+import json
+import time
+import platform
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class Benchmark(NamedTuple):
+    name: str
+    factory: Callable
+    repeat: int
+    slow: bool
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+    change: float
+    regression: bool
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, repeat: int = 20, slow: bool = False):
+    """Register benchmark.
+
+    Factory is a generator: code before yield prepares data, yielded callable is timed,
+    code after yield cleans up.
+    """
+    def decorator(factory):
+        BENCHMARKS[name] = Benchmark(name, factory, repeat, slow)
+        return factory
+    return decorator
+
+
+def percentile(values: List[float], percent: float):
+    """Nearest rank percentile of values"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def measure(func: Callable, repeat: int, warmup: int = 1):
+    """Time repeated calls of func, seconds"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'p95': percentile(timings, 95),
+    }
+
+
+def run(names: Optional[List[str]] = None, quick: bool = False, repeat: Optional[int] = None, report=print):
+    """Run registered benchmarks, return results ready to be saved"""
+    results = {}
+    for benchmark_item in BENCHMARKS.values():
+        if names and not any(name in benchmark_item.name for name in names):
+            continue
+        if quick and benchmark_item.slow:
+            continue
+        steps = benchmark_item.factory()
+        func = next(steps)
+        try:
+            results[benchmark_item.name] = measure(func, repeat or benchmark_item.repeat)
+        finally:
+            steps.close()
+        report(format_result(benchmark_item.name, results[benchmark_item.name]))
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def save_results(results: Dict, path: str):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=4)
+
+
+def load_results(path: str) -> Dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.1, metric: str = 'median') -> List[Comparison]:
+    """Compare benchmarks present in both results, slower by more than threshold is regression"""
+    comparisons = []
+    for name, stats in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name][metric], stats[metric]
+        change = (after - before) / before if before else 0.0
+        comparisons.append(Comparison(name, before, after, change, change > threshold))
+    return comparisons
+
+
+def format_result(name: str, stats: Dict):
+    return (
+        f'{name:<40} median {stats["median"] * 1000:>10.3f} ms'
+        f'  p95 {stats["p95"] * 1000:>10.3f} ms  x{stats["repeat"]}'
+    )
+
+
+def format_comparison(comparison: Comparison):
+    mark = 'REGRESSION' if comparison.regression else ''
+    return (
+        f'{comparison.name:<40} {comparison.baseline * 1000:>10.3f} ms -> '
+        f'{comparison.current * 1000:>10.3f} ms {comparison.change:>+8.1%} {mark}'
+    )
@@ -0,0 +1,67 @@
+"""Startup time of application worker measured with python -X importtime.
+
+    python -m benchmarks.startup [--top 20] [--runs 3]
+"""
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, NamedTuple
+
+from definitions import PATH_TO_ROOT
+
+
+STARTUP_CODE = (
+    'import time\n'
+    'start = time.perf_counter()\n'
+    'from app import create_app\n'
+    "create_app('testing')\n"
+    'print(time.perf_counter() - start)\n'
+)
+STARTUP_BUDGET = 2.0
+LAZY_MODULES = ('numpy', 'datapackage', 'generate_data', 'web', 'boto3', 'benchmarks')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Startup(NamedTuple):
+    seconds: float
+    imports: Dict[str, float]
+
+
+def measure_startup(code: str = STARTUP_CODE) -> Startup:
+    """Run code in fresh interpreter, return its startup seconds and cumulative import seconds of modules"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PATH_TO_ROOT, capture_output=True, text=True, check=True
+    )
+    imports = {}
+    for line in process.stderr.splitlines():
+        matched = IMPORT_LINE.match(line)
+        if matched is None:
+            continue
+        _, cumulative, _, name = matched.groups()
+        imports[name] = int(cumulative) / 1e6
+    return Startup(float(process.stdout.strip().splitlines()[-1]), imports)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description='Worker startup time')
+    parser.add_argument('--top', type=int, default=20, help='slowest imports to show')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    runs = [measure_startup() for _ in range(args.runs)]
+    seconds = statistics.median(run.seconds for run in runs)
+    slowest = sorted(runs[-1].imports.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, cumulative in slowest:
+        print(f'{cumulative * 1000:>10.1f} ms  {name}')
+    loaded = [name for name in runs[-1].imports if name.split('.')[0] in LAZY_MODULES]
+    print(f'create_app in {seconds * 1000:.1f} ms, budget {STARTUP_BUDGET * 1000:.0f} ms')
+    if loaded:
+        print(f'loaded at startup, expected lazily: {", ".join(loaded)}')
+    return 0 if seconds <= STARTUP_BUDGET and not loaded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Local stand-in of OpenWeatherMap /data/2.5/weather endpoint.
+
+Replays fixtures from weather/data with configurable latency, error rate and throttling:
+
+    python -m benchmarks.stub_server --port 8081 --latency lognormal:40:0.5 --error-rate 0.01 --rate-limit 50
+
+and point the application at it with WEATHER_API_URL=http://127.0.0.1:8081/data/2.5/weather
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from weather.data import read_fixtures
+
+
+WEATHER_PATH = '/data/2.5/weather'
+NOT_FOUND = {'cod': '404', 'message': 'city not found'}
+SERVER_ERROR = {'cod': '500', 'message': 'internal error'}
+THROTTLED = {
+    'cod': 429,
+    'message': 'Your account is temporary blocked due to exceeding of requests limitation of your subscription type.'
+}
+
+
+class Latency:
+    """Response delay distribution in milliseconds.
+
+    Spec is 'fixed:MS', 'uniform:LOW:HIGH', 'normal:MEAN:STDDEV' or 'lognormal:MEDIAN:SIGMA'.
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+    def __init__(self, spec: str = 'fixed:0', seed: Optional[int] = None):
+        kind, *params = spec.split(':')
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown latency distribution {kind}')
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        """Delay in seconds"""
+        if self.kind == 'fixed':
+            delay = self.params[0]
+        elif self.kind == 'uniform':
+            delay = self.random.uniform(*self.params)
+        elif self.kind == 'normal':
+            delay = self.random.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            delay = median * self.random.lognormvariate(0, sigma)
+        return max(delay, 0) / 1000
+
+
+class RateLimiter:
+    """Token bucket allowing rate requests per second with burst"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class StubWeatherApi:
+    """Fixture responses keyed by lower case city name"""
+
+    def __init__(self, fixtures: Dict[str, dict], latency: Latency, error_rate: float = 0.0,
+                 rate_limit: Optional[RateLimiter] = None, seed: Optional[int] = None):
+        self.responses = {payload['name'].lower(): json.dumps(payload).encode('utf-8') for payload in fixtures.values()}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def respond(self, city: str):
+        """Status code and body for city"""
+        if self.rate_limit is not None and not self.rate_limit.allow():
+            return self.count(429), json.dumps(THROTTLED).encode('utf-8')
+        time.sleep(self.latency.sample())
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            return self.count(500), json.dumps(SERVER_ERROR).encode('utf-8')
+        body = self.responses.get(city.strip().lower())
+        if body is None:
+            return self.count(404), json.dumps(NOT_FOUND).encode('utf-8')
+        return self.count(200), body
+
+    def count(self, status: int):
+        with self.lock:
+            self.stats[status] += 1
+        return status
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api: StubWeatherApi = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != WEATHER_PATH:
+            status, body = 404, json.dumps(NOT_FOUND).encode('utf-8')
+        else:
+            city = parse_qs(url.query).get('q', [''])[0]
+            status, body = self.api.respond(city)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(api: StubWeatherApi, host: str = '127.0.0.1', port: int = 0):
+    """Threaded http server for api, port 0 picks free port"""
+    handler = type('BoundStubHandler', (StubHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(api: StubWeatherApi, host: str = '127.0.0.1', port: int = 0):
+    """Serve api in background thread, return server and weather url"""
+    server = create_server(api, host, port)
+    thread = threading.Thread(target=server.serve_forever, name='stub-weather-api', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}{WEATHER_PATH}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stub_server', description='Stub weather api')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', default='fixed:0', help='fixed:MS, uniform:LOW:HIGH, normal:MEAN:SD, lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 500 responses')
+    parser.add_argument('--rate-limit', type=float, help='requests per second before 429')
+    parser.add_argument('--burst', type=int, help='requests allowed at once before 429')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    rate_limit = RateLimiter(args.rate_limit, args.burst) if args.rate_limit else None
+    api = StubWeatherApi(read_fixtures(), Latency(args.latency, args.seed), args.error_rate, rate_limit, args.seed)
+    server = create_server(api, args.host, args.port)
+    print(f'Serving {len(api.responses)} cities at http://{args.host}:{args.port}{WEATHER_PATH}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(dict(api.stats))
+
+
+if __name__ == '__main__':
+    main()
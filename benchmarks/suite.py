@@ -0,0 +1,230 @@
+import os
+import json
+import itertools
+from pathlib import Path
+from contextlib import contextmanager
+
+from peewee import SqliteDatabase
+
+import weather
+from app import create_app
+from app.base_model import database_proxy
+from app.fragment_cache import fragment_cache
+from benchmarks.runner import benchmark
+from weather.data import read_fixtures
+from weather.weather_cache import weather_cache
+from weather.country_codes import read_codes_data_from_json, FILENAME as COUNTRIES_FILENAME
+
+
+PATH_TO_COUNTRIES_JSON = os.path.join(Path(weather.__file__).parent, COUNTRIES_FILENAME)
+BATCH_SIZE = 500
+
+
+class StubResponse:
+    """Upstream response replayed from fixture"""
+
+    def __init__(self, payload):
+        self.status_code = 200
+        self.content = json.dumps(payload).encode('utf-8')
+
+
+class StubRequests:
+    """Stand-in for requests module answering from weather fixtures"""
+
+    def __init__(self):
+        self.responses = [StubResponse(payload) for payload in read_fixtures().values()]
+        self.cycle = itertools.cycle(self.responses)
+
+    def get(self, url, *args, **kwargs):
+        return next(self.cycle)
+
+
+@contextmanager
+def benchmark_app():
+    """Testing application with in memory database and pushed request context"""
+    app = create_app('testing')
+    app.config['WTF_CSRF_ENABLED'] = False
+    ctx = app.test_request_context()
+    ctx.push()
+    try:
+        yield app
+    finally:
+        ctx.pop()
+
+
+def seed_countries(db):
+    from weather.fill_country_db import convert_data_from_json_to_db
+
+    convert_data_from_json_to_db(read_codes_data_from_json(PATH_TO_COUNTRIES_JSON), db)
+
+
+def seed_cities(db, count: int):
+    """Insert count cities spread over all countries, return their ids"""
+    from app.weather.models import City, Country
+
+    seed_countries(db)
+    country_ids = [country_id for country_id, in Country.select(Country.id).tuples()]
+    rows = ({'name': f'City {index}', 'country': country_ids[index % len(country_ids)]} for index in range(count))
+    with db.atomic():
+        for batch in iter(lambda: list(itertools.islice(rows, BATCH_SIZE)), []):
+            City.insert_many(batch).execute()
+    return [city_id for city_id, in City.select(City.id).tuples()]
+
+
+def seed_users(db, count: int = 1):
+    """Fill users tables with generated users, return them"""
+    from app.auth.models import User
+    from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+    create_db(db, USERS[:count], PROFILES[:count], ROLES)
+    return list(User.select())
+
+
+@benchmark('parse_weather_data', repeat=10000)
+def parse_weather_data_benchmark():
+    from weather.getting_weather import parse_weather_data
+
+    payload = read_fixtures()['paris_fr']
+    yield lambda: parse_weather_data(payload)
+
+
+def getting_weather_steps(cache_ttl: int):
+    import weather.getting_weather as getting_weather
+    from app.weather.models import City, Country
+
+    with benchmark_app() as app:
+        seed_countries(app.config['db'])
+        fixtures = read_fixtures().values()
+        for payload in fixtures:
+            country = Country.get(Country.code == payload['sys']['country'])
+            City.create(name=payload['name'], country=country)
+        upstream, getting_weather.requests = getting_weather.requests, StubRequests()
+        weather_cache.configure(cache_ttl, app.config['WEATHER_CACHE_SIZE'])
+        cities = itertools.cycle([payload['name'] for payload in fixtures])
+        try:
+            yield lambda: getting_weather.main(next(cities), app.config['WEATHER_API_KEY'])
+        finally:
+            getting_weather.requests = upstream
+            weather_cache.configure(0, app.config['WEATHER_CACHE_SIZE'])
+
+
+@benchmark('getting_weather_main', repeat=500)
+def getting_weather_main_benchmark():
+    yield from getting_weather_steps(cache_ttl=0)
+
+
+@benchmark('getting_weather_main_cached', repeat=5000)
+def getting_weather_main_cached_benchmark():
+    yield from getting_weather_steps(cache_ttl=600)
+
+
+def cities_api_steps(count: int):
+    with benchmark_app() as app:
+        seed_cities(app.config['db'], count)
+        client = app.test_client()
+
+        def get_cities():
+            response = client.get('/api/v1/cities/')
+            assert response.status_code == 200
+            return response
+
+        yield get_cities
+
+
+def serialize_cities_steps(count: int):
+    """Cities listing body as built by cities endpoint, without request handling"""
+    from app.api.serializers import serializer
+    from app.api.weather.cities import CITY_FIELDS
+    from app.weather.models import City
+
+    with benchmark_app() as app:
+        seed_cities(app.config['db'], count)
+
+        def serialize_cities():
+            rows = City.select(City.id, City.name, City.country).tuples()
+            return serializer.dumps([dict(zip(CITY_FIELDS, row)) for row in rows.iterator()])
+
+        yield serialize_cities
+
+
+@benchmark('cities_api_get_1k', repeat=20)
+def cities_api_get_1k_benchmark():
+    yield from cities_api_steps(1000)
+
+
+@benchmark('cities_api_get_100k', repeat=3, slow=True)
+def cities_api_get_100k_benchmark():
+    yield from cities_api_steps(100000)
+
+
+@benchmark('serialize_cities_1k', repeat=20)
+def serialize_cities_1k_benchmark():
+    yield from serialize_cities_steps(1000)
+
+
+@benchmark('serialize_cities_100k', repeat=3, slow=True)
+def serialize_cities_100k_benchmark():
+    yield from serialize_cities_steps(100000)
+
+
+@benchmark('show_city_1k_user_cities', repeat=20)
+def show_city_benchmark():
+    from app.weather.models import UserCity
+
+    with benchmark_app() as app:
+        db = app.config['db']
+        user = seed_users(db)[0]
+        city_ids = seed_cities(db, 1000)
+        with db.atomic():
+            UserCity.insert_many([{'city': city_id, 'user': user.id} for city_id in city_ids]).execute()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+        def show_city():
+            fragment_cache.clear()
+            response = client.get('/weather/show/city')
+            assert response.status_code == 200
+            return response
+
+        yield show_city
+
+
+@benchmark('load_user', repeat=2000)
+def load_user_benchmark():
+    from app.auth.utils import load_user
+
+    with benchmark_app() as app:
+        user = seed_users(app.config['db'])[0]
+        yield lambda: load_user(str(user.id))
+
+
+@benchmark('create_db', repeat=3, slow=True)
+def create_db_benchmark():
+    from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+    with benchmark_app():
+        def seed():
+            db = SqliteDatabase(':memory:')
+            database_proxy.initialize(db)
+            create_db(db, USERS, PROFILES, ROLES)
+
+        yield seed
+
+
+@benchmark('convert_data_from_json_to_db', repeat=20)
+def convert_data_benchmark():
+    from weather.fill_country_db import convert_data_from_json_to_db
+
+    countries = read_codes_data_from_json(PATH_TO_COUNTRIES_JSON)
+    with benchmark_app() as app:
+        db = app.config['db']
+        yield lambda: convert_data_from_json_to_db(countries, db)
+
+
+@benchmark('create_app_startup', repeat=3, slow=True)
+def create_app_startup_benchmark():
+    from benchmarks.startup import measure_startup
+
+    yield measure_startup
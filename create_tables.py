@@ -1,12 +1,12 @@
 from peewee import SqliteDatabase
 
 from app.base_model import database_proxy
-from app.weather.models import Country
+from app.weather.models import Country, City, UserCity, WeatherObservation, WeatherRollup
 
 
 db = SqliteDatabase('user.db')
 database_proxy.initialize(db)
-db.create_tables([Country])
+db.create_tables([Country, City, UserCity, WeatherObservation, WeatherRollup])
 
 
 # import hashlib
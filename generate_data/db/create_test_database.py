@@ -2,6 +2,7 @@ import json
 from typing import List, Dict
 
 from app.auth.models import User, Profile, Role
+from app.auth.passwords import password_hasher
 from app.weather.models import UserCity
 from generate_data.main import main as generate_users_profiles
 from generate_data.data.user_data import ROLES
@@ -38,12 +39,12 @@ def write_profile_to_db(profile):
     return profile_instance.id
 
 
-def write_user_to_db(user, profile_id, role_id):
-    """Write profile to db"""
+def write_user_to_db(user, profile_id, role_id, password_hash):
+    """Write user with hashed password to db"""
     user_instance = User(
         name=user.full_name,
         email=user.email,
-        password=user.password,
+        password_hash=password_hash,
         role=role_id,
         profile=profile_id
     )
@@ -70,22 +71,33 @@ def write_users_credentials_to_json(users: List[Dict[str, str]], json_file: str
         json.dump(users, file, indent=4)
 
 
-def create_db(db, users, profiles, roles, delete=False):
-    """Fill database with test data"""
-    if delete:
-        clear_db()
+def create_db(db, users, profiles, roles, delete=False, progress=None, batch_size=None):
+    """Fill database with test data, progress is called with number of written users.
 
-    db.create_tables([User, Profile, Role])
-    roles = write_roles_to_db(roles)
+    Passwords are hashed before anything is written, users are committed in transactions of
+    batch_size users, all at once when it is not given.
+    """
+    password_hashes = [password_hasher.hash_now(user.password) for user in users]
+    with db.atomic():
+        if delete:
+            clear_db()
+        db.create_tables([User, Profile, Role])
+        roles = write_roles_to_db(roles)
 
     if delete:
         users_prepared_to_json = prepare_user_credentials(users)
         write_users_credentials_to_json(users_prepared_to_json)
 
-    for user, profile in zip(users, profiles):
-        profile_id = write_profile_to_db(profile)
-        role_id = roles[user.role]
-        write_user_to_db(user, profile_id, role_id)
+    rows = list(zip(users, profiles, password_hashes))
+    batch_size = batch_size or max(len(rows), 1)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        with db.atomic():
+            for user, profile, password_hash in batch:
+                profile_id = write_profile_to_db(profile)
+                write_user_to_db(user, profile_id, roles[user.role], password_hash)
+        if progress is not None:
+            progress(start + len(batch))
 
 
 USERS, PROFILES = generate_users_profiles()
@@ -0,0 +1,279 @@
+"""Production server with preforked workers sharing one listening socket.
+
+    python server.py --config production --bind 127.0.0.1:8000 --workers 4 --threads 4
+
+Master loads application once, warms its caches, freezes collected objects and forks workers which
+share loaded modules, compiled templates and country table copy-on-write. Worker counts default to
+WSGI_* settings of config. Signals to master: HUP loads application again and replaces workers
+gracefully, TERM and INT stop gracefully, QUIT stops at once. With METRICS_SHARED set to sqlite
+file workers publish metrics there and /metrics of any worker shows totals of all, otherwise metrics
+of each worker are labeled by its pid.
+"""
+import gc
+import os
+import sys
+import time
+import random
+import signal
+import socket
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+logger = logging.getLogger('server')
+
+
+def parse_bind(bind: str):
+    host, _, port = bind.rpartition(':')
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+def create_socket(bind: str, backlog: int):
+    """Listening socket inherited by all workers"""
+    host, port = parse_bind(bind)
+    sock = socket.create_server((host, port), family=socket.AF_INET6 if ':' in host else socket.AF_INET,
+                                backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app(config_name: str):
+    """Application with warmed caches and no open database connections, ready to fork"""
+    from app import create_app
+    from app.jobs import job_queue
+    from app.warmup import warm_up
+    from weather.response_store import response_store
+
+    app = create_app(config_name)
+    loaded = warm_up(app)
+    app.config['db'].close()
+    response_store.close()
+    job_queue.close()
+    logger.info('loaded %s application: %s', config_name, ', '.join(f'{count} {name}' for name, count in loaded.items()))
+    return app
+
+
+def after_fork(app):
+    """Open per process resources which must not be shared with master"""
+    from app.metrics import registry
+    from app.tracing import tracer
+    from weather.response_store import response_store
+
+    random.seed()
+    registry.fork()
+    if app.config['WEATHER_STORE_PATH']:
+        response_store.initialize(app.config['WEATHER_STORE_PATH'])
+    if tracer.exporter is not None:
+        tracer.exporter.reopen_for_process()
+
+
+class RequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+
+class WorkerServer(BaseWSGIServer):
+    """Server of one worker, accepts connections only while it has free threads"""
+
+    multithread = True
+    multiprocess = True
+    timeout = 1.0
+
+    def __init__(self, app, sock, threads: int, keepalive: int):
+        handler = type('KeepAliveRequestHandler', (RequestHandler,), {'timeout': keepalive})
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=handler, fd=sock.fileno())
+        self.socket.setblocking(False)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='worker')
+        self.slots = threading.BoundedSemaphore(threads)
+        self.stopping = False
+        self.dispatched = False
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+        self.dispatched = True
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def serve(self, master_pid: int):
+        """Serve until stopped or orphaned, then finish requests in progress"""
+        while not self.stopping and os.getppid() == master_pid:
+            if not self.slots.acquire(timeout=self.timeout):
+                continue
+            self.dispatched = False
+            try:
+                self.handle_request()
+            finally:
+                if not self.dispatched:
+                    self.slots.release()
+        self.executor.shutdown(wait=True)
+        self.server_close()
+
+
+def run_worker(app, sock, threads: int, keepalive: int, master_pid: int):
+    from app.jobs import job_queue
+    from app.metrics import registry
+
+    server = WorkerServer(app, sock, threads, keepalive)
+
+    def stop(signum, frame):
+        server.stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGQUIT, signal.SIG_DFL)
+    gc.enable()
+    after_fork(app)
+    server.serve(master_pid)
+    job_queue.stop()
+    registry.retire()
+
+
+class Master:
+    """Forks and supervises workers, replaces them on reload"""
+
+    def __init__(self, config_name: str, sock, workers: int, threads: int, keepalive: int, graceful_timeout: int):
+        self.config_name = config_name
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.keepalive = keepalive
+        self.graceful_timeout = graceful_timeout
+        self.app = None
+        self.generation = 0
+        self.children: Dict[int, int] = {}
+        self.retiring: Dict[int, float] = {}
+        self.signals = []
+        self.stopping = False
+        self.pid = os.getpid()
+
+    def load(self):
+        gc.disable()
+        self.app = load_app(self.config_name)
+        gc.collect()
+        gc.freeze()
+        self.generation += 1
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.app, self.sock, self.threads, self.keepalive, self.pid)
+            except BaseException:
+                logger.exception('worker %s failed', os.getpid())
+                status = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        self.children[pid] = self.generation
+
+    def retire(self, pids, signum=signal.SIGTERM):
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            self.children.pop(pid, None)
+            self.retiring.setdefault(pid, deadline)
+            self.kill(pid, signum)
+
+    def kill(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reload(self):
+        """Load application again and start new workers before old ones stop accepting"""
+        old = list(self.children)
+        gc.unfreeze()
+        try:
+            self.load()
+        except Exception:
+            logger.exception('reload failed, keeping current workers')
+            gc.freeze()
+            return
+        for _ in range(self.workers):
+            self.spawn()
+        self.retire(old)
+        logger.info('reloaded, generation %s', self.generation)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.retiring.pop(pid, None)
+            if self.children.pop(pid, None) is not None and not self.stopping:
+                logger.warning('worker %s exited with status %s, starting new one', pid, status)
+                self.spawn()
+
+    def handle_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def run(self):
+        self.load()
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+            signal.signal(signum, self.handle_signal)
+        for _ in range(self.workers):
+            self.spawn()
+        host, port = self.sock.getsockname()[:2]
+        logger.info('listening on http://%s:%s with %s workers of %s threads', host, port, self.workers, self.threads)
+        while self.children or self.retiring:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP and not self.stopping:
+                    self.reload()
+                elif signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+                    self.stopping = True
+                    self.retire(list(self.children) + list(self.retiring),
+                                signal.SIGKILL if signum == signal.SIGQUIT else signal.SIGTERM)
+            self.reap()
+            now = time.monotonic()
+            for pid, deadline in list(self.retiring.items()):
+                if deadline < now:
+                    self.kill(pid, signal.SIGKILL)
+            time.sleep(0.1)
+        self.sock.close()
+        logger.info('stopped')
+
+
+def main(argv=None):
+    from app.config import config
+
+    parser = argparse.ArgumentParser(prog='python server.py', description='Run application with preforked workers')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG', 'production'), choices=sorted(config))
+    parser.add_argument('--bind', help='host:port, port 0 picks free port')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int)
+    args = parser.parse_args(argv)
+    settings = config[args.config]
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    sock = create_socket(args.bind or settings.WSGI_BIND, settings.WSGI_BACKLOG)
+    master = Master(
+        args.config, sock,
+        args.workers or settings.WSGI_WORKERS,
+        args.threads or settings.WSGI_THREADS,
+        settings.WSGI_KEEPALIVE,
+        settings.WSGI_GRACEFUL_TIMEOUT,
+    )
+    master.run()
+
+
+if __name__ == '__main__':
+    main()
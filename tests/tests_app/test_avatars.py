@@ -0,0 +1,168 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.storage import LocalStorage, S3Storage
+from app.auth.avatars import (
+    AvatarError,
+    Image,
+    get_avatar_url,
+    make_thumbnails,
+    save_avatar_stream,
+    sniff_image_type
+)
+
+
+try:
+    import boto3
+    from moto import mock_s3
+except ImportError:
+    mock_s3 = None
+
+
+ALLOWED_TYPES = {'png', 'jpeg', 'gif'}
+UPLOAD_URL = '/static/img/profile/'
+
+
+def make_png(color: str = 'red', size: int = 64):
+    """Create png image bytes"""
+    if Image is None:
+        return b'\x89PNG\r\n\x1a\n' + bytes(size)
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class AvatarsTestCase(unittest.TestCase):
+    """Test avatar upload pipeline"""
+
+    def setUp(self):
+        """Before each test"""
+        self.upload_folder = tempfile.mkdtemp()
+        self.storage = LocalStorage(self.upload_folder, UPLOAD_URL)
+
+    def test_1_sniff_image_type(self):
+        """Image type is detected from file header"""
+        self.assertEqual(sniff_image_type(make_png()), 'png')
+        self.assertEqual(sniff_image_type(b'\xff\xd8\xff\xe0'), 'jpeg')
+        self.assertEqual(sniff_image_type(b'GIF89a...'), 'gif')
+        self.assertIsNone(sniff_image_type(b'<html>'))
+
+    def test_2_rejected_upload_is_not_written(self):
+        """Wrong type and oversized uploads leave upload folder empty"""
+        with self.assertRaises(AvatarError):
+            save_avatar_stream(io.BytesIO(b'#!/bin/sh\nrm -rf /'), self.storage, ALLOWED_TYPES, 1024)
+        with self.assertRaises(AvatarError):
+            save_avatar_stream(io.BytesIO(make_png() + bytes(2048)), self.storage, ALLOWED_TYPES, 1024)
+        self.assertEqual(os.listdir(self.upload_folder), [])
+
+    def test_3_identical_images_stored_once(self):
+        """Identical uploads share one content hash file"""
+        first = save_avatar_stream(io.BytesIO(make_png()), self.storage, ALLOWED_TYPES, 1024 * 1024)
+        second = save_avatar_stream(io.BytesIO(make_png()), self.storage, ALLOWED_TYPES, 1024 * 1024)
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith('.png'))
+        self.assertEqual(os.listdir(self.upload_folder), [first])
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_4_thumbnails_served_when_ready(self):
+        """Avatar url points to pre-sized thumbnail once it is created"""
+        filename = save_avatar_stream(io.BytesIO(make_png(size=300)), self.storage, ALLOWED_TYPES, 1024 * 1024)
+        avatar = self.storage.url(filename)
+        self.assertEqual(get_avatar_url(avatar, 20, self.storage), avatar)
+
+        make_thumbnails(self.storage, filename, [100, 20])
+        url = get_avatar_url(avatar, 20, self.storage)
+        self.assertEqual(url, avatar.replace('.png', '_20.png'))
+        with Image.open(os.path.join(self.upload_folder, url.split('/')[-1])) as thumbnail:
+            self.assertEqual(thumbnail.size, (20, 20))
+
+    def test_5_gravatar_size(self):
+        """Gravatar avatars are requested in needed size"""
+        avatar = 'https://www.gravatar.com/avatar/abc?d=identicon&s=100'
+        self.assertEqual(
+            get_avatar_url(avatar, 20, self.storage),
+            'https://www.gravatar.com/avatar/abc?d=identicon&s=20'
+        )
+
+    def test_6_oversized_upload_rejected_before_buffering(self):
+        """Avatar upload over size limit is rejected with 413, other forms keep default limit"""
+        app = create_app('testing')
+        app.config.update(AVATAR_MAX_SIZE=1024, AVATAR_FORM_OVERHEAD=1024)
+        client = app.test_client()
+        body = io.BytesIO(make_png() + bytes(4096))
+        response = client.post('/auth/profile/upload/avatar/1', data={'avatar': (body, 'avatar.png')})
+        self.assertEqual(response.status_code, 413)
+
+        boundary = 'boundary'
+        payload = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="avatar"; filename="avatar.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n'
+        ).encode() + make_png() + bytes(4096) + f'\r\n--{boundary}--\r\n'.encode()
+        response = client.post(
+            '/auth/profile/upload/avatar/1',
+            input_stream=io.BytesIO(payload),
+            content_type=f'multipart/form-data; boundary={boundary}',
+            environ_overrides={'wsgi.input_terminated': True},
+        )
+        self.assertEqual(response.status_code, 413)
+
+        response = client.post('/auth/login', data={'email': 'x' * 4096, 'password': 'secret'})
+        self.assertNotEqual(response.status_code, 413)
+
+    def test_7_missing_pillow_is_reported(self):
+        """Application warns at startup when thumbnails can not be made"""
+        with mock.patch('app.auth.avatars.Image', None), self.assertLogs('app.auth.avatars', 'WARNING') as logs:
+            create_app('testing')
+        self.assertIn('Pillow is not installed', logs.output[0])
+
+
+@unittest.skipIf(mock_s3 is None, 'moto is not installed')
+class S3StorageTestCase(unittest.TestCase):
+    """Test S3 storage against local stand-in"""
+
+    def setUp(self):
+        """Before each test"""
+        self.mock = mock_s3()
+        self.mock.start()
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket='media')
+        self.storage = S3Storage(
+            self.client, 'media', prefix='avatars/', public_url='https://cdn.example.com/', multipart_threshold=5 * 1024 * 1024
+        )
+
+    def tearDown(self):
+        """After each test"""
+        self.mock.stop()
+
+    def test_1_upload_and_thumbnails(self):
+        """Avatar and thumbnails are stored in bucket with content type"""
+        filename = save_avatar_stream(io.BytesIO(make_png(size=300)), self.storage, ALLOWED_TYPES, 1024 * 1024)
+        stored = self.client.head_object(Bucket='media', Key=f'avatars/{filename}')
+        self.assertEqual(stored['ContentType'], 'image/png')
+        if Image is not None:
+            make_thumbnails(self.storage, filename, [20])
+            avatar = self.storage.url(filename)
+            self.assertEqual(avatar, f'https://cdn.example.com/avatars/{filename}')
+            self.assertEqual(get_avatar_url(avatar, 20, self.storage), avatar.replace('.png', '_20.png'))
+
+    def test_2_multipart_upload_and_presigned_url(self):
+        """Large files are uploaded in parts and downloaded by pre-signed url"""
+        self.storage.public_url = None
+        descriptor, path_to_file = tempfile.mkstemp()
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(os.urandom(11 * 1024 * 1024))
+        self.storage.save_file('large.bin', path_to_file)
+        stored = self.client.head_object(Bucket='media', Key='avatars/large.bin')
+        self.assertTrue(stored['ETag'].strip('"').endswith('-3'))
+        self.assertFalse(os.path.exists(path_to_file))
+        url = self.storage.download_url('large.bin')
+        self.assertIn('avatars/large.bin', url)
+        self.assertIn('Signature', url)
+
+
+if __name__ == "__main__":
+    unittest.main()
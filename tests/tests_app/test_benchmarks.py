@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks import suite
+from benchmarks.runner import compare, load_results, percentile, run, save_results
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    """Test benchmark runner"""
+
+    def test_1_run_and_save(self):
+        """Selected benchmarks are timed and saved as json"""
+        results = run(['parse_weather_data', 'load_user', 'serialize_cities_1k'], repeat=3, report=lambda line: None)
+        self.assertEqual(sorted(results['results']), ['load_user', 'parse_weather_data', 'serialize_cities_1k'])
+        stats = results['results']['load_user']
+        self.assertEqual(stats['repeat'], 3)
+        self.assertLessEqual(stats['min'], stats['median'])
+        self.assertLessEqual(stats['median'], stats['p95'])
+
+        path = os.path.join(tempfile.mkdtemp(), 'results.json')
+        save_results(results, path)
+        self.assertEqual(load_results(path), results)
+
+    def test_2_compare(self):
+        """Slowdowns beyond threshold are reported as regressions"""
+        baseline = {'results': {'fast': {'median': 1.0}, 'slow': {'median': 1.0}, 'removed': {'median': 1.0}}}
+        current = {'results': {'fast': {'median': 0.5}, 'slow': {'median': 1.2}, 'added': {'median': 1.0}}}
+        comparisons = {comparison.name: comparison for comparison in compare(baseline, current, threshold=0.1)}
+        self.assertEqual(sorted(comparisons), ['fast', 'slow'])
+        self.assertFalse(comparisons['fast'].regression)
+        self.assertTrue(comparisons['slow'].regression)
+        self.assertAlmostEqual(comparisons['slow'].change, 0.2)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 95), 5)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.assets import asset_manifest, build_assets
+from app.compression import compressor
+from app.config import TestingConfig
+from app.weather.models import City, Country, UserCity
+
+
+class CompressionTestCase(unittest.TestCase):
+    """Test response compression and built static assets"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.db = self.app.config['db']
+        self.db.create_tables([Country, City, UserCity])
+        country = Country.create(code='FR', name='France', flag='fr.png')
+        City.insert_many([{'name': f'City {number}', 'country': country.id} for number in range(200)]).execute()
+        self.client = self.app.test_client()
+
+    def test_1_dynamic_responses(self):
+        """Large responses are gzipped when accepted, etag stays usable for revalidation"""
+        plain = self.client.get('/api/v1/cities/')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.vary)
+
+        response = self.client.get('/api/v1/cities/', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(response.content_length, plain.content_length / 4)
+        self.assertTrue(response.headers['ETag'].startswith('W/'))
+        response = self.client.get(
+            '/api/v1/cities/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/api/v1/cities/', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        compressor.min_size = plain.content_length + 1
+        response = self.client.get('/api/v1/cities/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_2_built_assets(self):
+        """Static files are served fingerprinted, precompressed and immutable"""
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        manifest = build_assets(self.app.static_folder, folder, exclude=('img/profile',))
+        style = manifest['css/style.css']
+        self.assertRegex(style['path'], r'^css/style\.[0-9a-f]{12}\.css$')
+        self.assertIn('gzip', style['encodings'])
+        self.assertTrue(os.path.exists(os.path.join(folder, style['path'] + '.gz')))
+        self.assertFalse(any(filename.startswith('img/profile/') for filename in manifest))
+
+        with mock.patch.object(TestingConfig, 'ASSETS_FOLDER', folder):
+            app = create_app('testing')
+        self.addCleanup(asset_manifest.load, None)
+        client = app.test_client()
+        url = f'/assets/{style["path"]}'
+        self.assertIn(f'href="{url}"', client.get('/').get_data(as_text=True))
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        with open(os.path.join(self.app.static_folder, 'css', 'style.css'), 'rb') as file:
+            self.assertEqual(gzip.decompress(response.get_data()), file.read())
+        response.close()
+        response = client.get(url)
+        self.assertNotIn('Content-Encoding', response.headers)
+        response.close()
+        self.assertEqual(client.get('/assets/css/style.css').status_code, 404)
+
+    def test_3_rebuild_keeps_previous_files(self):
+        """Rebuild replaces manifest and keeps files of previous build"""
+        source, target = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, target)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write('body { color: black; }' * 100)
+        old = build_assets(source, target)['css/site.css']['path']
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write('body { color: white; }' * 100)
+        new = build_assets(source, target)['css/site.css']['path']
+
+        self.assertNotEqual(old, new)
+        self.assertTrue(os.path.exists(os.path.join(target, old)))
+        self.assertTrue(os.path.exists(os.path.join(target, new + '.gz')))
+        self.assertEqual(asset_manifest.load(target), 1)
+        self.addCleanup(asset_manifest.load, None)
+        self.assertEqual(asset_manifest.files['css/site.css']['path'], new)
+        self.assertEqual(sorted(os.listdir(target)), ['css', 'manifest.json'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from flask import url_for, render_template_string
+from flask_login import login_user, logout_user
+
+from app import create_app
+from app.auth.models import Role, User
+from app.fragment_cache import fragment_cache
+from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    """Test rendered fragment cache"""
+    ctx = None
+    db = None
+    app = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.app.config['WTF_CSRF_ENABLED'] = False
+        cls.db = cls.app.config['db']
+        create_db(cls.db, USERS, PROFILES, ROLES)
+        cls.ctx = cls.app.test_request_context()
+        cls.ctx.push()
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """After all tests"""
+        cls.ctx.pop()
+
+    def test_1_cache_tag(self):
+        """Block inside cache tag is rendered once per key"""
+        template = '{% cache key, 60 %}{{ value }}<br>{% endcache %}'
+        self.assertEqual(render_template_string(template, key=('test', 1), value='first'), 'first<br>')
+        self.assertEqual(render_template_string(template, key=('test', 1), value='second'), 'first<br>')
+        self.assertEqual(render_template_string(template, key=('test', 2), value='<b>'), '&lt;b&gt;<br>')
+
+    def test_2_users_rows_invalidated_by_user_edit(self):
+        """Cached users rows are rendered again after user edit"""
+        admin = Role.select().where(Role.name == 'admin').first().users[0]
+        user = User.select().order_by(User.id).first()
+        hits = fragment_cache.hits
+
+        self.client.get(url_for('main.show_emails'))
+        self.client.get(url_for('main.show_emails'))
+        self.assertEqual(fragment_cache.hits, hits + 1)
+
+        login_user(admin)
+        self.client.post(
+            url_for('main.update_email'),
+            data={'id': user.id, 'name': 'renamed_user', 'email': user.email, 'submit': 'Add'}
+        )
+        logout_user()
+        data = self.client.get(url_for('main.show_emails')).get_data(as_text=True)
+        self.assertIn('<td>renamed_user</td>', data)
+
+
+if __name__ == "__main__":
+    unittest.main()
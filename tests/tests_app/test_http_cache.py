@@ -0,0 +1,87 @@
+import os
+import json
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from flask import url_for
+from flask_login import login_user, logout_user
+
+import weather
+from app import create_app
+from app.auth.models import User
+from app.weather.models import Country, City, UserCity
+from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+from weather.data import read_fixtures
+from weather.weather_cache import weather_cache
+from weather.fill_country_db import main as main_fill_weather, FILENAME as countries_json
+
+
+PATH_TO_COUNTRIES_JSON = os.path.join(Path(weather.__file__).parent, countries_json)
+
+
+class HttpCacheTestCase(unittest.TestCase):
+    """Test conditional responses"""
+    ctx = None
+    db = None
+    app = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.db = cls.app.config['db']
+        cls.cities = read_fixtures()
+        create_db(cls.db, USERS, PROFILES, ROLES)
+        main_fill_weather(PATH_TO_COUNTRIES_JSON, cls.db)
+        cls.user = User.select().first()
+        cls.paris = City.create(name='Paris', country=Country.get(Country.code == 'FR'))
+        UserCity.create(user=cls.user, city=cls.paris)
+        cls.ctx = cls.app.test_request_context()
+        cls.ctx.push()
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """After all tests"""
+        weather_cache.configure(0, weather_cache.maxsize)
+        cls.ctx.pop()
+
+    def test_1_cities_api_not_modified(self):
+        """Cities list is answered with 304 until list changes"""
+        response = self.client.get('/api/v1/cities/')
+        etag = response.headers['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/v1/cities/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+
+        self.client.put('/api/v1/cities/', json={'id': self.paris.id, 'name': 'paris'})
+        response = self.client.get('/api/v1/cities/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    @patch('weather.getting_weather.requests')
+    def test_2_city_detail_not_modified(self, requests_mock):
+        """City detail is answered with 304 while weather snapshot is unchanged"""
+        weather_cache.configure(600, weather_cache.maxsize)
+        request_response_mock = MagicMock()
+        request_response_mock.status_code = 200
+        request_response_mock.content = json.dumps(self.cities['paris_fr']).encode()
+        requests_mock.get.return_value = request_response_mock
+
+        login_user(self.user)
+        url = url_for('weather.show_city_detail', city_name='Paris')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cache_control.max_age, 600)
+        self.assertTrue(response.cache_control.private)
+
+        response = self.client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(requests_mock.get.call_count, 1)
+        logout_user()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+
+from app import create_app
+from app.auth.models import Profile, Role, User
+from app.jobs import DONE, FAILED, RUNNING, job, job_queue
+from app.versions import CITIES_LIST, get_version
+from app.weather.countries import CountryTable
+from app.weather.models import City, Country, UserCity
+from generate_data.db.create_test_database import USERS
+from weather.response_store import response_store
+
+
+@job('test_echo')
+def echo(context, value, fail=False):
+    context.progress(1, 2, 'half')
+    if fail:
+        raise ValueError(value)
+    return {'message': 'echoed', 'value': value}
+
+
+class JobsTestCase(unittest.TestCase):
+    """Test background job queue"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.db = self.app.config['db']
+        self.db.create_tables([Role, Profile, User, Country, City, UserCity])
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        job_queue.stop()
+
+    def test_1_queue(self):
+        """Jobs run once in order, failures and interrupted jobs are recorded"""
+        first = job_queue.enqueue('test_echo', {'value': 1}, unique=True)
+        self.assertEqual(job_queue.enqueue('test_echo', {'value': 2}, unique=True), first)
+        second = job_queue.enqueue('test_echo', {'value': 'bad', 'fail': True})
+        with self.assertRaises(KeyError):
+            job_queue.enqueue('missing')
+
+        self.assertEqual(job_queue.run_pending(), 2)
+        self.assertEqual(job_queue.run_pending(), 0)
+        done, failed = job_queue.get(first), job_queue.get(second)
+        self.assertEqual((done['status'], done['done'], done['total']), (DONE, 1, 2))
+        self.assertEqual((done['message'], done['result']), ('echoed', {'value': 1}))
+        self.assertEqual((failed['status'], failed['message']), (FAILED, 'ValueError: bad'))
+
+        stale = job_queue.enqueue('test_echo', {'value': 3})
+        job_queue.claim()
+        self.assertEqual(job_queue.get(stale)['status'], RUNNING)
+        job_queue.execute('UPDATE job SET updated_at = ? WHERE id = ?', (time.time() - 3600, stale))
+        self.assertIsNone(job_queue.claim())
+        self.assertEqual((job_queue.get(stale)['status'], job_queue.get(stale)['message']), (FAILED, 'interrupted'))
+
+    def test_2_seed_database_in_background(self):
+        """Home page queues seeding and shows its progress, other jobs are not public"""
+        response = self.client.post('/', data={'submit': 'Generate'})
+        self.assertEqual(response.status_code, 302)
+        page = self.client.get('/').get_data(as_text=True)
+        self.assertIn('job-progress', page)
+        job_id = job_queue.active('seed_database')[0]['id']
+
+        with self.app.app_context():
+            job_queue.run_pending()
+        self.assertEqual(User.select().count(), len(USERS))
+        state = self.client.get(f'/job/{job_id}').get_json()
+        self.assertEqual((state['status'], state['done'], state['total']), (DONE, len(USERS), len(USERS)))
+        self.assertEqual(state['message'], 'Database filled with test data')
+        self.assertEqual(sorted(state), ['done', 'id', 'message', 'status', 'total'])
+        self.assertNotIn('job-progress', self.client.get('/').get_data(as_text=True))
+        self.assertEqual(self.client.get('/job/1000').status_code, 404)
+        other_job = job_queue.enqueue('test_echo', {'value': '/uploads/users.csv'})
+        self.assertEqual(self.client.get(f'/job/{other_job}').status_code, 404)
+
+    def test_3_worker_thread(self):
+        """Worker thread started with first request runs queued jobs"""
+        descriptor, path = tempfile.mkstemp(suffix='.db')
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        job_queue.configure(path, workers=1, poll_interval=0.05)
+        self.client.get('/job/1')
+        self.assertEqual(len(job_queue.threads), 1)
+
+        job_id = job_queue.enqueue('test_echo', {'value': 'threaded'})
+        for _ in range(100):
+            if job_queue.get(job_id)['status'] == DONE:
+                break
+            time.sleep(0.05)
+        self.assertEqual(job_queue.get(job_id)['result'], {'value': 'threaded'})
+        self.assertNotEqual(job_queue.execute('SELECT worker FROM job WHERE id = ?', (job_id,))[0][0], None)
+
+    def test_4_reload_countries(self):
+        """Country reload inserts new and updates existing countries"""
+        Country.create(code='FR', name='Old France', flag='fr.png')
+        worker_countries = CountryTable()
+        self.assertEqual(worker_countries.get('FR').name, 'Old France')
+        cities_version = get_version(CITIES_LIST)
+        countries = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        self.addCleanup(os.remove, countries.name)
+        json.dump([{'code': 'FR', 'name': 'France'}, {'code': 'DE', 'name': 'Germany'}], countries)
+        countries.close()
+        job_id = job_queue.enqueue('reload_countries', {'path': countries.name})
+        with self.app.app_context():
+            job_queue.run_pending()
+        self.assertEqual(job_queue.get(job_id)['result'], {'countries': 2})
+        self.assertEqual(dict(Country.select(Country.code, Country.name).tuples()), {'FR': 'France', 'DE': 'Germany'})
+        self.assertEqual(worker_countries.get('FR').name, 'France')
+        self.assertEqual(get_version(CITIES_LIST), cities_version + 1)
+
+    def test_5_weather_store_retention(self):
+        """Compaction of weather store is scheduled and can be run from command line"""
+        now = time.time()
+        for days in (60, 40, 1):
+            response_store.append('Paris', {'dt': days}, fetched_at=now - days * 24 * 3600)
+        response_store.append('Tokyo', {'dt': 90}, fetched_at=now - 90 * 24 * 3600)
+
+        job_id, = job_queue.enqueue_due()
+        self.assertEqual(job_queue.enqueue_due(), [])
+        with self.app.app_context():
+            job_queue.run_pending()
+        self.assertEqual(job_queue.get(job_id)['result'], {'deleted': 2})
+        self.assertEqual(response_store.count(), 2)
+
+        response_store.append('Paris', {'dt': 0}, fetched_at=now)
+        result = self.app.test_cli_runner().invoke(args=['admin', 'compact-weather-store', '--days', '0'])
+        self.assertIn('1 weather responses deleted', result.output)
+        self.assertEqual(response_store.cities(), ['paris', 'tokyo'])
+
+
+if __name__ == "__main__":
+    unittest.main()
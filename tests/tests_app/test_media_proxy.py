@@ -0,0 +1,198 @@
+import io
+import os
+import tempfile
+import time
+import threading
+import unittest
+from unittest import mock
+from collections import namedtuple
+from flask import render_template_string
+
+from app import create_app
+from app.weather import models
+from app.proxy.media_cache import FixtureFetcher, WEATHER_ICONS, media_cache
+from app.proxy.sprites import Image, build_flag_sprite, flag_sprite
+
+Country = namedtuple('Country', 'code name flag')
+
+
+class MediaProxyTestCase(unittest.TestCase):
+    """Test external media proxy"""
+    ctx = None
+    app = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.app.config['MEDIA_PROXY_ENABLED'] = True
+        cls.fixtures = tempfile.mkdtemp()
+        for source, name in (('flags', 'ES.png'), ('flags', 'FR.png'), ('icons', '10d.png')):
+            os.makedirs(os.path.join(cls.fixtures, source), exist_ok=True)
+            with open(os.path.join(cls.fixtures, source, name), 'wb') as file:
+                file.write(name.encode() * 100)
+        cls.ctx = cls.app.test_request_context()
+        cls.ctx.push()
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """After all tests"""
+        cls.ctx.pop()
+
+    def setUp(self):
+        """Before each test"""
+        media_cache.configure(tempfile.mkdtemp(), 1000, FixtureFetcher(self.fixtures))
+
+    def test_1_external_urls_are_proxied(self):
+        """Known external media urls are rewritten to proxy"""
+        template = '{{ proxied(flag) }} {{ proxied(icon) }} {{ proxied(avatar) }} {{ proxied(other) }}'
+        data = render_template_string(
+            template,
+            flag='https://www.countryflagicons.com/FLAT/32/ES.png',
+            icon='http://openweathermap.org/img/w/10d.png',
+            avatar='https://www.gravatar.com/avatar/92d177365fca09cb0e5ab362a1243078?d=identicon&s=20',
+            other='https://example.com/image.png'
+        )
+        self.assertEqual(
+            data,
+            '/proxy/flags/ES.png /proxy/icons/10d.png '
+            '/proxy/gravatar/92d177365fca09cb0e5ab362a1243078_20 https://example.com/image.png'
+        )
+
+    def test_2_serve_cached_media(self):
+        """Media is fetched once and served with long lived cache headers"""
+        response = self.client.get('/proxy/flags/ES.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), b'ES.png' * 100)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(response.cache_control.max_age, self.app.config['MEDIA_PROXY_MAX_AGE'])
+        etag = response.headers['ETag']
+        response.close()
+
+        response = self.client.get('/proxy/flags/ES.png', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/proxy/flags/../../etc').status_code, 404)
+
+    def test_3_unknown_media_redirects_upstream(self):
+        """Media missing in fetcher is redirected to upstream host"""
+        response = self.client.get('/proxy/flags/UA.png')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.location, 'https://www.countryflagicons.com/FLAT/32/UA.png')
+
+    def test_4_cache_is_bounded_and_prewarmed(self):
+        """Least recently used media is evicted above size limit"""
+        cached = media_cache.prewarm([('flags', 'ES.png'), ('flags', 'FR.png'), ('icons', '10d.png')], workers=1)
+        self.assertEqual(cached, 3)
+        self.assertLessEqual(media_cache.total_bytes, 1000)
+        self.assertIsNotNone(media_cache.get('icons', '10d.png'))
+        self.assertIsNone(media_cache.get('flags', 'ES.png'))
+        self.assertIn('10d.png', WEATHER_ICONS)
+
+    def test_5_concurrent_writes_of_same_item(self):
+        """Concurrent writers of same media all succeed and leave no temporary files"""
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def put(number):
+            barrier.wait()
+            try:
+                media_cache.put('flags', 'ES.png', bytes([number]) * 100, 'image/png')
+            except OSError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=put, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIsNotNone(media_cache.get('flags', 'ES.png'))
+        self.assertEqual(media_cache.total_bytes, 100)
+        folder = os.path.dirname(media_cache.path('flags', 'ES.png'))
+        self.assertEqual(sorted(os.listdir(folder)), ['ES.png', 'ES.png.meta'])
+
+    def test_6_sprite_command_without_pillow(self):
+        """Sprite command fails with readable message when Pillow is missing"""
+        self.app.config['db'].create_tables([models.Country])
+        with mock.patch('app.proxy.sprites.Image', None):
+            result = self.app.test_cli_runner().invoke(args=['proxy', 'sprite'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Pillow is required to build flag sprite, install packages of requirements.txt', result.output)
+
+    def test_7_leftover_temporary_files(self):
+        """Index leaves out temporary files of writes, stale ones are removed"""
+        folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(folder, 'flags'))
+        for name, age in (('ES.png', 0), ('abc.part', 2 * 3600), ('def.part', 0)):
+            path = os.path.join(folder, 'flags', name)
+            with open(path, 'wb') as file:
+                file.write(bytes(100))
+            os.utime(path, (time.time() - age, time.time() - age))
+        media_cache.configure(folder, 1000, FixtureFetcher(self.fixtures))
+        self.assertEqual(list(media_cache.entries), [('flags', 'ES.png')])
+        self.assertEqual(media_cache.total_bytes, 100)
+        self.assertEqual(sorted(os.listdir(os.path.join(folder, 'flags'))), ['ES.png', 'def.part'])
+
+
+@unittest.skipIf(Image is None, 'Pillow is not installed')
+class FlagSpriteTestCase(unittest.TestCase):
+    """Test country flags sprite"""
+
+    def setUp(self):
+        """Before each test"""
+        self.app = create_app('testing')
+        self.app.config['FLAG_SPRITE_FOLDER'] = tempfile.mkdtemp()
+        fixtures = tempfile.mkdtemp()
+        os.makedirs(os.path.join(fixtures, 'flags'))
+        for code, color in (('ES', 'red'), ('FR', 'blue'), ('UA', 'yellow')):
+            buffer = io.BytesIO()
+            Image.new('RGB', (32, 32), color).save(buffer, format='PNG')
+            with open(os.path.join(fixtures, 'flags', f'{code}.png'), 'wb') as file:
+                file.write(buffer.getvalue())
+        media_cache.configure(tempfile.mkdtemp(), 1024 * 1024, FixtureFetcher(fixtures))
+        self.ctx = self.app.test_request_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        """After each test"""
+        flag_sprite.configure(None)
+        self.ctx.pop()
+
+    def test_1_build_sprite(self):
+        """Cached flags are joined into one fingerprinted image and css map"""
+        folder = self.app.config['FLAG_SPRITE_FOLDER']
+        manifest = build_flag_sprite(['FR', 'ES', 'UA', 'XX'], folder)
+        self.assertEqual(manifest['codes'], ['ES', 'FR', 'UA'])
+        self.assertRegex(manifest['image'], r'^flags\.[0-9a-f]{12}\.png$')
+        with Image.open(os.path.join(folder, manifest['image'])) as sprite:
+            self.assertEqual(sprite.size, (64, 64))
+            self.assertEqual(sprite.getpixel((32, 0))[:3], (0, 0, 255))
+        with open(os.path.join(folder, manifest['css'])) as css:
+            data = css.read()
+        self.assertIn(manifest['image'], data)
+        self.assertIn('.flag-FR{background-position:-32px -0px;}', data)
+        self.assertEqual(build_flag_sprite(['ES', 'FR', 'UA'], folder), manifest)
+
+    def test_2_render_and_serve_sprite(self):
+        """Flags are rendered as sprite classes, sprite files are cached forever"""
+        spain = Country('ES', 'Spain', 'https://www.countryflagicons.com/FLAT/32/ES.png')
+        self.assertEqual(render_template_string('{{ flag(country) }}', country=spain), f'<img src="{spain.flag}">')
+
+        manifest = build_flag_sprite(['ES'], self.app.config['FLAG_SPRITE_FOLDER'])
+        flag_sprite.configure(self.app.config['FLAG_SPRITE_FOLDER'])
+        self.assertEqual(
+            render_template_string('{{ flag(country) }}', country=spain),
+            '<span class="flag flag-ES" title="Spain"></span>'
+        )
+        self.assertEqual(flag_sprite.css_url(), f'/proxy/sprites/{manifest["css"]}')
+
+        response = self.app.test_client().get(flag_sprite.css_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 365 * 24 * 60 * 60)
+        response.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+from app import create_app
+from app.metrics import Counter, Histogram, Registry
+from app.weather.models import Country, City
+from weather.getting_weather import get_weather
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Test metrics endpoint"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.app.config['db'].create_tables([Country, City])
+        cls.client = cls.app.test_client()
+
+    def test_1_request_and_query_metrics(self):
+        """Requests, their queries and caches are exposed in text format"""
+        self.client.get('/api/v1/cities/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        data = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{endpoint="cities",method="GET",status="200"}', data)
+        self.assertIn('http_request_duration_seconds_count{endpoint="cities",method="GET"}', data)
+        self.assertIn('db_queries_per_request_bucket{endpoint="cities",le="+Inf"}', data)
+        self.assertIn('db_query_duration_seconds_count{statement="SELECT"}', data)
+        self.assertIn('cache_requests_total{cache="weather",result="hit"}', data)
+
+    @patch('weather.getting_weather.requests')
+    def test_2_upstream_metrics(self, requests_mock):
+        """Weather api calls are measured by outcome"""
+        requests_mock.get.return_value = MagicMock(status_code=401, content=b'{"message": "Invalid API key"}')
+        with self.assertRaises(RuntimeError):
+            get_weather('Paris', 'key')
+        data = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('weather_upstream_duration_seconds_count{outcome="401"} 1', data)
+
+    def test_3_per_thread_aggregation(self):
+        """Updates from many threads are summed when rendered"""
+        counter = Counter('jobs_total', 'Jobs.', ('kind',))
+        histogram = Histogram('job_seconds', 'Job time.', buckets=(0.1, 1))
+
+        def work():
+            for _ in range(1000):
+                counter.inc('a')
+                histogram.observe(0.5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.values(), {('a',): 4000})
+        lines = histogram.render()
+        self.assertIn('job_seconds_bucket{le="0.1"} 0', lines)
+        self.assertIn('job_seconds_bucket{le="1"} 4000', lines)
+        self.assertIn('job_seconds_count 4000', lines)
+        self.assertIn('jobs_total{kind="a"} 4000', counter.render())
+
+    def test_4_finished_thread_shards_are_merged(self):
+        """Shards of finished threads are folded into totals and dropped"""
+        counter = Counter('tasks_total', 'Tasks.')
+        histogram = Histogram('task_seconds', 'Task time.', buckets=(1,))
+        for _ in range(3):
+            thread = threading.Thread(target=lambda: (counter.inc(), histogram.observe(0.5)))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(counter.shards), 1)
+        self.assertEqual(counter.values(), {(): 3})
+        self.assertEqual(histogram.values(), {(): [3, 0, 1.5]})
+        self.assertEqual(counter.shards, [])
+        self.assertEqual(histogram.shards, [])
+
+        counter.inc()
+        self.assertEqual(counter.values(), {(): 4})
+        self.assertEqual(len(counter.shards), 1)
+
+    def test_5_forked_workers(self):
+        """Forked workers count from zero, shared file gives totals of all workers"""
+        alone = Registry()
+        alone.register(Counter('forks_total', 'Forks.')).inc(amount=5)
+        alone.fork()
+        alone.metrics[0].inc()
+        self.assertIn(f'forks_total{{worker="{os.getpid()}"}} 1', alone.render())
+
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.db')
+        workers = []
+        for amount in (1, 2):
+            worker = Registry()
+            worker.configure(path)
+            counter = worker.register(Counter('forks_total', 'Forks.'))
+            histogram = worker.register(Histogram('fork_seconds', 'Fork time.', buckets=(1,)))
+            counter.inc(amount=5)
+            worker.fork()
+            counter.inc(amount=amount)
+            histogram.observe(0.5)
+            workers.append(worker)
+        first, second = workers
+        second.publish(force=True)
+        lines = first.render().splitlines()
+        self.assertIn('forks_total 3', lines)
+        self.assertIn('fork_seconds_count 2', lines)
+
+        first.retire()
+        self.assertIn('forks_total 3', second.render().splitlines())
+        workers_in_file = first.shared.connection.execute('SELECT DISTINCT worker FROM metric').fetchall()
+        self.assertEqual(sorted(workers_in_file), sorted([('retired',), (second.shared.worker,)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
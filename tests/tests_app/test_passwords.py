@@ -0,0 +1,85 @@
+import threading
+import unittest
+from unittest import mock
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.auth.models import Profile, Role, User
+from app.auth.passwords import DEFAULT_METHOD, PasswordHasherBusy, normalize_method, password_hasher
+
+
+class PasswordsTestCase(unittest.TestCase):
+    """Test password hashing pool and rehash on login"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['db'].create_tables([Role, Profile, User])
+        self.client = self.app.test_client()
+
+    def test_1_hash_and_rehash(self):
+        """Hashes use configured method, other methods need rehash"""
+        password_hash = password_hasher.hash('secret')
+        self.assertTrue(password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(password_hasher.verify(password_hash, 'secret'))
+        self.assertFalse(password_hasher.verify(password_hash, 'wrong'))
+        self.assertFalse(password_hasher.needs_rehash(password_hash))
+        self.assertTrue(password_hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:500')))
+        self.assertEqual(normalize_method('pbkdf2'), DEFAULT_METHOD)
+
+    def test_2_queue_limit(self):
+        """Calls beyond pool size and queue limit are rejected, hashing on calling thread is not"""
+        password_hasher.configure('pbkdf2:sha256:1000', workers=1, queue_limit=0)
+        self.addCleanup(password_hasher.configure, 'pbkdf2:sha256:1000', 16, 2, 16)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=password_hasher.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        with self.assertRaises(PasswordHasherBusy):
+            password_hasher.verify(password_hasher.method, 'secret')
+        self.assertTrue(password_hasher.hash_now('secret').startswith('pbkdf2:sha256:1000$'))
+        release.set()
+        thread.join()
+        self.assertTrue(password_hasher.verify(generate_password_hash('secret', 'pbkdf2:sha256:1000'), 'secret'))
+
+    def test_3_rehash_on_login(self):
+        """Login upgrades hash made with outdated parameters"""
+        role = Role.create(name='user')
+        profile = Profile.create(avatar='avatar.png')
+        User.create(
+            name='user', email='user@example.com', role=role, profile=profile,
+            password_hash=generate_password_hash('secret', 'pbkdf2:sha256:500')
+        )
+        response = self.client.post('/auth/login', data={'email': 'user@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 302)
+        user = User.get(User.email == 'user@example.com')
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(user.verify_password('secret'))
+
+    def test_4_login_when_rehash_is_busy(self):
+        """Verified login succeeds with old hash when pool is busy, rehash happens on next login"""
+        role = Role.create(name='user')
+        profile = Profile.create(avatar='avatar.png')
+        old_hash = generate_password_hash('secret', 'pbkdf2:sha256:500')
+        User.create(name='user', email='user@example.com', role=role, profile=profile, password_hash=old_hash)
+        data = {'email': 'user@example.com', 'password': 'secret'}
+
+        busy = mock.patch.object(password_hasher, 'hash', side_effect=PasswordHasherBusy('busy'))
+        with busy, self.assertLogs('app.auth.passwords', 'WARNING'):
+            response = self.client.post('/auth/login', data=data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(User.get(User.email == 'user@example.com').password_hash, old_hash)
+
+        self.client.get('/auth/logout')
+        self.assertEqual(self.client.post('/auth/login', data=data).status_code, 302)
+        self.assertTrue(User.get(User.email == 'user@example.com').password_hash.startswith('pbkdf2:sha256:1000$'))
+
+
+if __name__ == "__main__":
+    unittest.main()
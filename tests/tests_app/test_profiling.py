@@ -0,0 +1,81 @@
+import threading
+import unittest
+
+from app import create_app
+from app.auth.models import Role, User
+from app.profiling import format_collapsed, sampling_profiler
+from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class ProfilingTestCase(unittest.TestCase):
+    """Test admin profiling endpoints"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        create_db(cls.app.config['db'], USERS, PROFILES, ROLES)
+        cls.client = cls.app.test_client()
+
+    def login(self, role_name: str):
+        user = User.select().join(Role).where(Role.name == role_name).first()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    def test_1_sampling_profiler(self):
+        """Stacks of busy thread are collected in collapsed format"""
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_loop, args=(stop,))
+        thread.start()
+        try:
+            stacks = sampling_profiler.sample(0.2, 0.001, threads={thread.ident})
+        finally:
+            stop.set()
+            thread.join()
+        output = format_collapsed(stacks)
+        first_line = output.splitlines()[0]
+        stack, count = first_line.rsplit(' ', 1)
+        self.assertIn('busy_loop (test_profiling.py:', stack)
+        self.assertTrue(stack.startswith('_bootstrap ('))
+        self.assertGreater(int(count), 0)
+
+    def test_2_admin_endpoints(self):
+        """Profiler and memory endpoints are available for admins only"""
+        self.login('user')
+        self.assertEqual(self.client.get('/admin/profile?seconds=0.1').status_code, 302)
+
+        self.login('admin')
+        response = self.client.get('/admin/profile?seconds=0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        self.assertEqual(self.client.get('/admin/profile?seconds=3600').status_code, 400)
+
+        response = self.client.get('/admin/memory?seconds=0.1&limit=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('allocation sites', response.get_data(as_text=True))
+
+        with sampling_profiler.lock:
+            self.assertEqual(self.client.get('/admin/profile?seconds=0.1').status_code, 409)
+
+    def test_3_profile_single_request(self):
+        """Profiling header returns profile of request to admins"""
+        self.login('user')
+        response = self.client.get('/email/show', headers={'X-Profile': '1'})
+        self.assertEqual(response.mimetype, 'text/html')
+
+        self.login('admin')
+        response = self.client.get('/email/show', headers={'X-Profile': 'tottime'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        self.assertIn('function calls', response.get_data(as_text=True))
+        self.assertIn('X-Profile-Duration', response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
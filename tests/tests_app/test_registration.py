@@ -0,0 +1,69 @@
+import unittest
+
+from app import create_app
+from app.auth.forms import RegisterForm
+from app.auth.models import Profile, Role, User
+from app.migrations import Migration, get_pending, migrate
+
+
+class RegistrationTestCase(unittest.TestCase):
+    """Test registration uniqueness checks"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.db = self.app.config['db']
+        self.db.create_tables([Role, Profile, User])
+        Role.create(name='user')
+        self.client = self.app.test_client()
+        self.queries = []
+        self.db.add_query_listener(lambda sql, params, start, duration: self.queries.append(sql))
+
+    def register(self, username: str, email: str):
+        return self.client.post('/auth/register', data={
+            'username': username, 'email': email, 'password': 'secret', 'password_repeat': 'secret'
+        })
+
+    def test_1_taken_email_and_username(self):
+        """Taken email and case-insensitive username are reported by one query"""
+        self.assertEqual(self.register('John', 'john@example.com').status_code, 302)
+        self.assertEqual(User.get().profile.avatar[:4], 'http')
+
+        with self.app.test_request_context(method='POST', data={
+            'username': 'JOHN', 'email': 'John@Example.com', 'password': 'secret', 'password_repeat': 'secret'
+        }):
+            form = RegisterForm()
+            self.queries.clear()
+            self.assertFalse(form.validate())
+        self.assertEqual(len(self.queries), 1)
+        self.assertIn('user_name_lower', self.db.execute_sql(f'EXPLAIN QUERY PLAN {self.queries[0]}', (
+            'john@example.com', 'john', 2
+        )).fetchall()[-1][-1])
+        self.assertEqual(form.email.errors, ['Email already registered.'])
+        self.assertEqual(form.username.errors, ['Username already in use.'])
+
+    def test_2_unique_constraints(self):
+        """Registration racing past validation is rejected by constraints without leftover profile"""
+        self.assertEqual(self.register('John', 'john@example.com').status_code, 302)
+        form = RegisterForm
+        self.addCleanup(setattr, form, 'validate', form.validate)
+        form.validate = lambda self, extra_validators=None: super(RegisterForm, self).validate(extra_validators)
+
+        response = self.register('jOHN', 'other@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Username already in use.', response.get_data(as_text=True))
+        self.assertEqual((User.select().count(), Profile.select().count()), (1, 1))
+
+    def test_3_migration(self):
+        """Migration adds index to existing table once"""
+        self.db.execute_sql('DROP INDEX user_name_lower')
+        self.assertEqual(get_pending(self.db)[0], '0001_user_name_lower_index')
+        applied = migrate(self.db)
+        self.assertEqual(applied[0], '0001_user_name_lower_index')
+        self.assertEqual(migrate(self.db), [])
+        self.assertIn('user_name_lower', [index.name for index in self.db.get_indexes('user')])
+        self.assertEqual(Migration.select().count(), len(applied))
+
+
+if __name__ == "__main__":
+    unittest.main()
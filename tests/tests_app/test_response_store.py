@@ -0,0 +1,119 @@
+import io
+import os
+import json
+import sys
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from weather.data import read_fixtures
+from weather.response_store import WeatherResponseStore
+from weather.weather_cache import WeatherCache
+from weather.weather_record import WeatherRecord
+
+
+class ResponseStoreTestCase(unittest.TestCase):
+    """Test weather response store"""
+
+    def setUp(self):
+        """Before each test"""
+        self.store = WeatherResponseStore(':memory:')
+        self.cities = read_fixtures()
+
+    def tearDown(self):
+        """After each test"""
+        self.store.close()
+
+    def test_1_latest_response(self):
+        """Latest response is returned for city whatever order responses were appended"""
+        paris = self.cities['paris_fr']
+        self.store.append('Paris', {**paris, 'dt': 2}, fetched_at=200)
+        self.store.append('paris', {**paris, 'dt': 1}, fetched_at=100)
+        fetched_at, payload = self.store.latest('PARIS')
+        self.assertEqual(fetched_at, 200)
+        self.assertEqual(payload['dt'], 2)
+        self.assertIsNone(self.store.latest('Tokyo'))
+
+    def test_2_range_and_compact(self):
+        """Range query is ordered by time and compaction keeps latest response"""
+        tokyo = self.cities['tokyo_jp']
+        for fetched_at in range(10):
+            self.store.append('Tokyo', tokyo, fetched_at=fetched_at)
+        self.assertEqual([row[0] for row in self.store.range('Tokyo', 3, 6)], [3, 4, 5])
+        self.assertEqual(self.store.compact(older_than=100), 9)
+        self.assertEqual(self.store.count('Tokyo'), 1)
+        self.assertEqual(self.store.latest('Tokyo')[0], 9)
+
+    def test_3_export_imported_json_files(self):
+        """Import legacy json files and export them as ndjson"""
+        from weather.data import PATH_TO_FIXTURES
+
+        imported = self.store.import_json_files(PATH_TO_FIXTURES)
+        self.assertEqual(len(imported), len(self.cities))
+        buffer = io.StringIO()
+        self.assertEqual(self.store.export(buffer), len(self.cities))
+        rows = [json.loads(line) for line in buffer.getvalue().splitlines()]
+        self.assertEqual(
+            sorted(row['payload']['name'] for row in rows),
+            sorted(payload['name'] for payload in self.cities.values())
+        )
+        self.assertEqual(len(self.store.latest_all()), len(self.cities))
+
+    def test_4_vacuum_outside_lock(self):
+        """Vacuum after compaction runs without holding store lock"""
+        store = WeatherResponseStore(os.path.join(tempfile.mkdtemp(), 'responses.db'))
+        self.addCleanup(store.close)
+        for fetched_at in range(10):
+            store.append('Tokyo', self.cities['tokyo_jp'], fetched_at=fetched_at)
+        vacuum = store.vacuum
+        locked = []
+        with mock.patch.object(store, 'vacuum', lambda: (locked.append(store.lock.locked()), vacuum())):
+            self.assertEqual(store.compact(older_than=100, vacuum=True), 9)
+        self.assertEqual(locked, [False])
+        self.assertEqual(store.latest('Tokyo')[0], 9)
+
+
+class WeatherCacheTestCase(unittest.TestCase):
+    """Test weather record cache"""
+
+    def setUp(self):
+        """Before each test"""
+        self.cities = read_fixtures()
+
+    def test_1_record_is_smaller_than_response(self):
+        """Record keeps only used fields of response"""
+        payload = self.cities['tokyo_jp']
+        record = WeatherRecord.from_response(payload)
+        self.assertEqual(record.country, 'JP')
+        self.assertEqual(record.icon_url, f'http://openweathermap.org/img/w/{payload["weather"][0]["icon"]}.png')
+        self.assertLess(sys.getsizeof(record), sys.getsizeof(payload))
+        self.assertNotIn('timestamp', record.to_dict())
+
+    def test_2_lru_and_ttl(self):
+        """Cache evicts least recently used and expired records"""
+        cache = WeatherCache(ttl=60, maxsize=2)
+        records = {name: WeatherRecord.from_response(payload) for name, payload in self.cities.items()}
+        cache.put('Paris', records['paris_fr'])
+        cache.put('Tokyo', records['tokyo_jp'])
+        self.assertEqual(cache.get('paris'), records['paris_fr'])
+        cache.put('Madrid', records['madrid_es'])
+        self.assertIsNone(cache.get('Tokyo'))
+        cache.put('Tokyo', records['tokyo_jp'], fetched_at=time.time() - 120)
+        self.assertIsNone(cache.get('Tokyo'))
+        self.assertEqual(cache.get('Madrid'), records['madrid_es'])
+
+    def test_3_warm_up_from_store(self):
+        """Fresh responses from store are loaded into cache"""
+        store = WeatherResponseStore(':memory:')
+        store.append('Paris', self.cities['paris_fr'])
+        store.append('Tokyo', self.cities['tokyo_jp'], fetched_at=time.time() - 3600)
+        cache = WeatherCache(ttl=600)
+        self.assertEqual(cache.warm_up(store), 1)
+        self.assertEqual(cache.get('paris').sky, self.cities['paris_fr']['weather'][0]['description'])
+        self.assertIsNone(cache.get('tokyo'))
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import unittest
+
+from app import create_app
+from app.api.serializers import JSON, MSGPACK, msgpack, orjson, serializer, stdlib_json
+from app.weather.models import City, Country, UserCity, WeatherObservation, WeatherRollup
+
+
+class SerializersTestCase(unittest.TestCase):
+    """Test API response serialization and content negotiation"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.db = self.app.config['db']
+        self.db.create_tables([Country, City, UserCity, WeatherObservation, WeatherRollup])
+        country = Country.create(code='FR', name='France', flag='fr.png')
+        for name in ('Paris', 'Lyon', 'Zürich'):
+            City.create(name=name, country=country)
+        self.expected = [
+            {'id': city.id, 'name': city.name, 'country_id': country.id} for city in City.select().order_by(City.id)
+        ]
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        serializer.configure()
+
+    def test_1_json_backends(self):
+        """Cities are listed by every json backend, errors use same encoder"""
+        self.assertEqual(serializer.json_backend, 'orjson' if orjson else 'stdlib')
+        for backend in ('stdlib', serializer.json_backend):
+            serializer.configure(backend)
+            response = self.client.get('/api/v1/cities/')
+            self.assertEqual(response.mimetype, JSON)
+            self.assertEqual(json.loads(response.data), self.expected)
+        self.assertEqual(stdlib_json({'name': 'Zürich'}), '{"name":"Zürich"}'.encode('utf-8'))
+        with self.assertRaises(ValueError):
+            serializer.configure('missing')
+
+        response = self.client.get('/api/v1/cities/paris/history/?resolution=week')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('resolution', response.get_json()['message'])
+
+    @unittest.skipIf(msgpack is not None, 'msgpack is installed')
+    def test_2_negotiation_without_msgpack(self):
+        """Json is sent for msgpack requests when msgpack is not installed"""
+        response = self.client.get('/api/v1/cities/', headers={'Accept': MSGPACK})
+        self.assertEqual(response.mimetype, JSON)
+        self.assertEqual(serializer.mimetypes, [JSON])
+
+    @unittest.skipUnless(msgpack is not None, 'msgpack is not installed')
+    def test_3_negotiation(self):
+        """Msgpack is sent when accepted, etag depends on format"""
+        response = self.client.get('/api/v1/cities/', headers={'Accept': MSGPACK})
+        self.assertEqual(response.mimetype, MSGPACK)
+        self.assertEqual(msgpack.unpackb(response.data), self.expected)
+        self.assertIn('Accept', response.vary)
+        json_etag = self.client.get('/api/v1/cities/').headers['ETag']
+        self.assertNotEqual(response.headers['ETag'], json_etag)
+
+        serializer.configure(msgpack_enabled=False)
+        response = self.client.get('/api/v1/cities/', headers={'Accept': MSGPACK})
+        self.assertEqual(response.mimetype, JSON)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import re
+import sys
+import signal
+import unittest
+import threading
+import subprocess
+
+import requests
+
+from app import create_app
+from app.warmup import warm_up
+from app.weather.models import Country
+from app.weather.countries import country_table
+from definitions import PATH_TO_ROOT
+
+
+LISTENING = re.compile(r'listening on (http://\S+)')
+
+
+class ServerTestCase(unittest.TestCase):
+    """Test warm up and preforked server"""
+
+    def test_1_warm_up(self):
+        """Countries and templates are loaded before serving"""
+        app = create_app('testing')
+        app.config['db'].create_tables([Country])
+        Country.create(code='FR', name='France', flag='fr.png')
+
+        loaded = warm_up(app)
+        self.assertEqual(loaded['countries'], 1)
+        self.assertGreater(loaded['templates'], 0)
+        self.assertEqual(len(app.jinja_env.cache), loaded['templates'])
+
+        Country.delete().execute()
+        self.assertEqual(country_table.get('FR').name, 'France')
+        self.assertIsNone(country_table.get('DE'))
+
+    def test_2_graceful_reload(self):
+        """Requests keep succeeding while workers are replaced on HUP"""
+        process = subprocess.Popen(
+            [sys.executable, 'server.py', '--config', 'testing', '--bind', '127.0.0.1:0',
+             '--workers', '2', '--threads', '2'],
+            cwd=PATH_TO_ROOT, stderr=subprocess.PIPE, text=True
+        )
+        self.addCleanup(process.kill)
+        url = None
+        for line in process.stderr:
+            matched = LISTENING.search(line)
+            if matched:
+                url = matched.group(1)
+                break
+        self.assertIsNotNone(url)
+        threading.Thread(target=process.stderr.read, daemon=True).start()
+
+        statuses = []
+        stop = threading.Event()
+
+        def browse():
+            while not stop.is_set():
+                statuses.append(requests.get(f'{url}/auth/login', timeout=10).status_code)
+
+        thread = threading.Thread(target=browse)
+        thread.start()
+        try:
+            stop.wait(0.5)
+            process.send_signal(signal.SIGHUP)
+            stop.wait(2)
+        finally:
+            stop.set()
+            thread.join()
+
+        process.send_signal(signal.SIGTERM)
+        self.assertEqual(process.wait(timeout=10), 0)
+        self.assertGreater(len(statuses), 10)
+        self.assertEqual(set(statuses), {200})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from app import create_app
+from app.auth.models import Role, User
+from app.slow_queries import get_query_shape, slow_query_log
+from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+
+class SlowQueriesTestCase(unittest.TestCase):
+    """Test slow query log"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.app.config['WTF_CSRF_ENABLED'] = False
+        create_db(cls.app.config['db'], USERS, PROFILES, ROLES)
+        cls.client = cls.app.test_client()
+
+    def setUp(self):
+        """Before each test"""
+        slow_query_log.clear()
+        slow_query_log.threshold = 0
+        slow_query_log.explain = True
+        slow_query_log.log_params = False
+
+    def login(self, role_name: str):
+        user = User.select().join(Role).where(Role.name == role_name).first()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    def test_1_query_shape(self):
+        """Queries differing only in values share shape"""
+        self.assertEqual(
+            get_query_shape('SELECT "t1"."id" FROM "city" AS "t1" WHERE ("t1"."id" IN (?, ?, ?)) LIMIT ?'),
+            get_query_shape('SELECT "t1"."id" FROM "city" AS "t1" WHERE ("t1"."id" IN (?, ?)) LIMIT ?')
+        )
+        self.assertEqual(
+            get_query_shape('INSERT INTO "city" ("name") VALUES (?), (?), (?)'),
+            'INSERT INTO "city" ("name") VALUES (?), ...'
+        )
+
+    def test_2_slow_queries_grouped_with_plans(self):
+        """Slow queries are grouped by shape with endpoint and query plan"""
+        self.client.get('/email/show')
+        self.client.get('/email/show?page=2')
+        shapes = {shape.shape: shape for shape in slow_query_log.report()}
+        count_shape = next(shape for sql, shape in shapes.items() if sql.startswith('SELECT COUNT(1)'))
+        self.assertEqual(count_shape.count, 2)
+        self.assertEqual(count_shape.endpoints, {'main.show_emails': 2})
+        self.assertTrue(count_shape.plan)
+        self.assertGreaterEqual(count_shape.p95, 0)
+        self.assertTrue(any(query.endpoint == 'main.show_emails' for query in slow_query_log.recent))
+
+    def test_3_report_for_admins_only(self):
+        """Report page is shown to admin and hidden from other users"""
+        self.login('user')
+        response = self.client.get('/admin/slow-queries')
+        self.assertEqual(response.status_code, 302)
+
+        self.login('admin')
+        response = self.client.get('/admin/slow-queries')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('FROM &#34;user&#34;', response.get_data(as_text=True))
+
+    def test_4_params_are_redacted(self):
+        """Parameter values are left out of log and report unless enabled"""
+        email = User.select().first().email
+        with self.assertLogs('app.slow_queries', 'WARNING') as logs:
+            User.get(User.email == email)
+        self.assertNotIn(email, '\n'.join(logs.output))
+        self.assertEqual(slow_query_log.recent[-1].params, '3 params: str, int, int')
+
+        slow_query_log.log_params = True
+        User.get(User.email == email)
+        self.assertIn(email, slow_query_log.recent[-1].params)
+
+
+if __name__ == "__main__":
+    unittest.main()
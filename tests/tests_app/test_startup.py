@@ -0,0 +1,19 @@
+import unittest
+
+from benchmarks.startup import LAZY_MODULES, STARTUP_BUDGET, measure_startup
+
+
+class StartupTestCase(unittest.TestCase):
+    """Test worker startup budget"""
+
+    def test_1_startup_budget(self):
+        """Application starts within budget without seeding and ops modules"""
+        startup = measure_startup()
+        loaded = [name for name in startup.imports if name.split('.')[0] in LAZY_MODULES]
+        self.assertEqual(loaded, [])
+        self.assertIn('app', startup.imports)
+        self.assertLess(startup.seconds, STARTUP_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import weather.getting_weather as getting_weather
+from benchmarks.load import Recorder
+from benchmarks.stub_server import Latency, RateLimiter, StubWeatherApi, start_server
+from weather.data import read_fixtures
+
+
+class StubServerTestCase(unittest.TestCase):
+    """Test stub weather api over real http"""
+
+    def start(self, **kwargs):
+        api = StubWeatherApi(read_fixtures(), Latency('uniform:1:5', seed=1), seed=1, **kwargs)
+        server, url = start_server(api)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        getting_weather.configure(url)
+        self.addCleanup(getting_weather.configure)
+        return api
+
+    def test_1_replay_fixtures(self):
+        """Fixtures are served to get_weather by city name"""
+        api = self.start()
+        city_weather = getting_weather.get_weather('Paris', 'key')
+        self.assertEqual(city_weather, read_fixtures()['paris_fr'])
+        with self.assertRaisesRegex(RuntimeError, 'city not found'):
+            getting_weather.get_weather('Atlantis', 'key')
+        self.assertEqual(api.stats, {200: 1, 404: 1})
+
+    def test_2_errors_and_throttling(self):
+        """Error rate and rate limit produce 500 and 429 responses"""
+        api = self.start(error_rate=1.0)
+        with self.assertRaisesRegex(RuntimeError, 'Actual code is: 500'):
+            getting_weather.get_weather('Paris', 'key')
+
+        api.error_rate = 0.0
+        api.rate_limit = RateLimiter(rate=0.001, burst=2)
+        statuses = []
+        for _ in range(4):
+            try:
+                getting_weather.get_weather('Tokyo', 'key')
+                statuses.append(200)
+            except RuntimeError as error:
+                statuses.append(429 if 'Actual code is: 429' in str(error) else None)
+        self.assertEqual(statuses, [200, 200, 429, 429])
+
+    def test_3_latency_and_report(self):
+        """Latency samples follow spec and report has percentiles"""
+        self.assertEqual(Latency('fixed:20').sample(), 0.02)
+        samples = [Latency('uniform:10:20', seed=1).sample() for _ in range(100)]
+        self.assertTrue(all(0.01 <= sample <= 0.02 for sample in samples))
+        with self.assertRaises(ValueError):
+            Latency('poisson:1')
+
+        recorder = Recorder()
+        for index in range(100):
+            recorder.record('show_city', index / 1000, 200, index != 0)
+        report = recorder.report(elapsed=2.0)
+        self.assertEqual(report['rps'], 50)
+        self.assertEqual(report['steps']['show_city']['failures'], 1)
+        self.assertAlmostEqual(report['steps']['show_city']['p90'], 89.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
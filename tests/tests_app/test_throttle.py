@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.auth.models import Profile, Role, User
+from app.auth.throttle import MemoryBackend, SqliteBackend, Throttle, throttle
+from app.config import TestingConfig
+
+
+LIMITS = {'login': {'ip': (3, 60), 'email': (2, 60)}}
+
+
+class ThrottleTestCase(unittest.TestCase):
+    """Test sliding window throttling of login and registration"""
+
+    def check_window(self, backend):
+        limiter = Throttle()
+        limiter.configure(True, LIMITS)
+        limiter.backend = backend
+        allowed = [limiter.allow('login', {'ip': '10.0.0.1'}, now=600 + second) for second in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+        self.assertFalse(limiter.allow('login', {'ip': '10.0.0.1'}, now=690))
+        self.assertTrue(limiter.allow('login', {'ip': '10.0.0.1'}, now=715))
+        self.assertTrue(limiter.allow('login', {'ip': '10.0.0.2'}, now=715))
+        self.assertTrue(limiter.allow('register', {'ip': '10.0.0.1'}, now=715))
+        self.assertEqual(limiter.counters(), {
+            ('login', 'allowed', ''): 5, ('login', 'rejected', 'ip'): 3, ('register', 'allowed', ''): 1
+        })
+
+    def test_1_memory_window(self):
+        """Attempts over limit are rejected until sliding window moves on"""
+        self.check_window(MemoryBackend())
+
+    def test_2_shared_window(self):
+        """Sqlite backend counts like memory backend"""
+        descriptor, path = tempfile.mkstemp(suffix='.db')
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        self.check_window(SqliteBackend(path))
+
+    def test_3_login_rejected_before_queries(self):
+        """Throttled login answers 429 without touching database"""
+        app = create_app('testing')
+        app.config['WTF_CSRF_ENABLED'] = False
+        db = app.config['db']
+        db.create_tables([Role, Profile, User])
+        throttle.configure(True, LIMITS)
+        self.addCleanup(throttle.configure, True, app.config['THROTTLE_LIMITS'])
+        queries = []
+        db.add_query_listener(lambda sql, params, start, duration: queries.append(sql))
+
+        client = app.test_client()
+        data = {'email': 'User@example.com', 'password': 'wrong'}
+        statuses = [client.post('/auth/login', data=data).status_code for _ in range(2)]
+        queries.clear()
+        response = client.post('/auth/login', data={'email': 'user@example.com ', 'password': 'wrong'})
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertIn('Too many login attempts', response.get_data(as_text=True))
+        self.assertEqual(queries, [])
+
+    def test_4_clients_behind_proxy(self):
+        """Behind trusted proxy clients are throttled by forwarded address"""
+        with mock.patch.object(TestingConfig, 'PROXY_FIX_X_FOR', 1):
+            app = create_app('testing')
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['db'].create_tables([Role, Profile, User])
+        throttle.configure(True, {'login': {'ip': (2, 60)}})
+        self.addCleanup(throttle.configure, True, app.config['THROTTLE_LIMITS'])
+
+        client = app.test_client()
+
+        def login(address, number):
+            data = {'email': f'user{number}@example.com', 'password': 'wrong'}
+            return client.post('/auth/login', data=data, headers={'X-Forwarded-For': address}).status_code
+
+        self.assertEqual([login('203.0.113.1', number) for number in range(3)], [200, 200, 429])
+        self.assertEqual(login('203.0.113.2', 3), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import weather
+from app import create_app
+from app.tracing import SERVER, FileExporter, init_app, tracer
+from app.weather.models import City
+from weather import getting_weather
+from weather.data import read_fixtures
+from weather.fill_country_db import main as main_fill_weather, FILENAME as countries_json
+
+
+PATH_TO_COUNTRIES_JSON = os.path.join(Path(weather.__file__).parent, countries_json)
+
+
+class TracingTestCase(unittest.TestCase):
+    """Test request tracing"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.path_to_traces = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+        cls.app.config.update(TRACING_FILE=cls.path_to_traces, TRACING_SAMPLE_RATE=1.0)
+        init_app(cls.app)
+        cls.app.config['db'].create_tables([City])
+        main_fill_weather(PATH_TO_COUNTRIES_JSON, cls.app.config['db'])
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """After all tests"""
+        tracer.configure(None, 0.0)
+        getting_weather.upstream_listeners.remove(tracer.on_upstream)
+
+    def read_traces(self):
+        with open(self.path_to_traces) as traces_file:
+            return [json.loads(line) for line in traces_file]
+
+    @patch('weather.getting_weather.requests')
+    def test_1_request_spans(self, requests_mock):
+        """Request, weather lookup, upstream call and queries are exported as nested spans"""
+        requests_mock.get.return_value = MagicMock(
+            status_code=200, content=json.dumps(read_fixtures()['paris_fr']).encode()
+        )
+        response = self.client.post('/api/v1/cities/', json={'name': 'paris'})
+        self.assertEqual(response.status_code, 201)
+        trace_id = response.headers['X-Trace-Id']
+        self.assertRegex(response.headers['traceparent'], f'^00-{trace_id}-[0-9a-f]{{16}}-01$')
+
+        resource_spans = self.read_traces()[-1]['resourceSpans'][0]
+        spans = {span['name']: span for span in resource_spans['scopeSpans'][0]['spans']}
+        request_span = spans['POST cities']
+        self.assertEqual(request_span['kind'], SERVER)
+        self.assertNotIn('parentSpanId', request_span)
+        self.assertEqual(spans['weather.lookup']['parentSpanId'], request_span['spanId'])
+        self.assertIn({'key': 'cache.hit', 'value': {'boolValue': False}}, spans['weather.lookup']['attributes'])
+        self.assertEqual(spans['weather.upstream']['parentSpanId'], spans['weather.lookup']['spanId'])
+        self.assertEqual(spans['db.query']['traceId'], trace_id)
+        self.assertLessEqual(int(request_span['startTimeUnixNano']), int(spans['weather.lookup']['startTimeUnixNano']))
+
+    def test_2_propagation_and_sampling(self):
+        """Incoming trace context is continued and its sampling decision respected"""
+        exported = len(self.read_traces())
+        parent = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00'
+        response = self.client.get('/api/v1/cities/', headers={'traceparent': parent})
+        self.assertEqual(response.headers['X-Trace-Id'], '0af7651916cd43dd8448eb211c80319c')
+        self.assertTrue(response.headers['traceparent'].endswith('-00'))
+        self.assertEqual(len(self.read_traces()), exported)
+
+        response = self.client.get('/api/v1/cities/', headers={'traceparent': parent[:-2] + '01'})
+        spans = self.read_traces()[-1]['resourceSpans'][0]['scopeSpans'][0]['spans']
+        request_span = next(span for span in spans if span['kind'] == SERVER)
+        self.assertEqual(request_span['parentSpanId'], 'b7ad6b7169203331')
+
+    def test_3_exporter_reopened_per_process(self):
+        """Exporter reopened after fork writes to file of its own process"""
+        folder = tempfile.mkdtemp()
+        exporter = FileExporter(os.path.join(folder, 'traces.jsonl'))
+        self.addCleanup(exporter.close)
+        exporter.reopen_for_process()
+        exporter.export([])
+        self.assertEqual(os.listdir(folder), [f'traces.{os.getpid()}.jsonl'])
+
+
+if __name__ == "__main__":
+    unittest.main()
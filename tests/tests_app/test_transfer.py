@@ -0,0 +1,103 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+
+from app import create_app
+from app.auth.models import Profile, Role, User
+from app.jobs import job_queue
+from app.transfer import TABLES, export_rows, import_rows
+from app.weather.models import City, Country, UserCity
+from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
+
+
+class TransferTestCase(unittest.TestCase):
+    """Test streaming export and import"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.db = self.app.config['db']
+        self.db.create_tables([Country, City, UserCity])
+        create_db(self.db, USERS, PROFILES, ROLES)
+        self.client = self.app.test_client()
+
+    def login(self, role_name: str):
+        user = User.select().join(Role).where(Role.name == role_name).first()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    def test_1_round_trip(self):
+        """Exported users, profiles and cities are imported back unchanged"""
+        country = Country.create(code='FR', name='France', flag='fr.png')
+        city = City.create(name='Paris', country=country)
+        UserCity.create(city=city, user=User.select().first())
+        exported = {}
+        for name, file_format in (('profiles', 'csv'), ('users', 'ndjson'), ('user_cities', 'csv')):
+            exported[name] = (file_format, ''.join(export_rows(TABLES[name], file_format)))
+        users = list(User.select().order_by(User.id).dicts())
+
+        UserCity.delete().execute()
+        User.delete().execute()
+        Profile.delete().execute()
+        for name, (file_format, data) in exported.items():
+            report = import_rows(self.db, TABLES[name], io.StringIO(data, newline=''), file_format, chunk_size=7)
+            self.assertEqual(report.failed, 0)
+        self.assertEqual(list(User.select().order_by(User.id).dicts()), users)
+        self.assertEqual(UserCity.select().count(), 1)
+
+    def test_2_row_errors(self):
+        """Invalid rows are reported by line and valid rows of same chunk are kept"""
+        user = User.select().first()
+        lines = [
+            json.dumps({'name': 'new_user', 'email': 'new@example.com', 'password_hash': '-',
+                        'role_id': user.role_id, 'profile_id': user.profile_id}),
+            'not json',
+            json.dumps({'name': 'other', 'email': user.email, 'password_hash': '-',
+                        'role_id': user.role_id, 'profile_id': user.profile_id}),
+            json.dumps({'name': 'no_email', 'password_hash': '-', 'role_id': 1, 'profile_id': 1}),
+            json.dumps({'name': 'late', 'email': 'late@example.com', 'password_hash': '-', 'last_visit': 'yesterday',
+                        'role_id': user.role_id, 'profile_id': user.profile_id}),
+        ]
+        report = import_rows(self.db, TABLES['users'], io.StringIO('\n'.join(lines)), 'ndjson')
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual([error['line'] for error in report.to_json()['errors']], [2, 3, 4, 5])
+        self.assertIn('UNIQUE', report.errors[-1].message)
+        self.assertEqual(User.select().where(User.email == 'new@example.com').count(), 1)
+
+    def test_3_admin_endpoints_and_cli(self):
+        """Admins stream exports and import uploads, commands write and read files"""
+        response = self.client.get('/admin/export/users.csv')
+        self.assertEqual(response.status_code, 302)
+
+        self.login('admin')
+        response = self.client.get('/admin/export/users.csv')
+        self.assertEqual(response.headers['Content-Disposition'], 'attachment; filename=users.csv')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), len(USERS) + 1)
+
+        self.app.config['IMPORT_UPLOAD_FOLDER'] = tempfile.mkdtemp()
+        response = self.client.post('/admin/import/profiles', data={
+            'file': (io.BytesIO(b'id,avatar,info\n,avatar.png,\n'), 'profiles.csv')
+        }, headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 202)
+        with self.app.app_context():
+            self.assertEqual(job_queue.run_pending(), 1)
+        job = self.client.get(response.get_json()['url']).get_json()
+        self.assertEqual(job['result'], {'inserted': 1, 'failed': 0, 'errors': []})
+        self.assertEqual(os.listdir(self.app.config['IMPORT_UPLOAD_FOLDER']), [])
+
+        descriptor, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['admin', 'export', 'profiles', '-o', path])
+        self.assertEqual(result.exit_code, 0)
+        result = runner.invoke(args=['admin', 'import', 'profiles', path])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(f'0 rows imported, {len(PROFILES) + 1} failed', result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
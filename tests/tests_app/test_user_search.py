@@ -0,0 +1,65 @@
+import unittest
+
+from app import create_app
+from app.auth.models import Profile, Role, User
+from app.auth.search import UserSearch, make_match_query, search_users
+from app.migrations import migrate
+
+
+class UserSearchTestCase(unittest.TestCase):
+    """Test full text search over users"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.db = self.app.config['db']
+        self.db.create_tables([Role, Profile, User])
+        role = Role.create(name='admin')
+        profile = Profile.create(avatar='avatar.png')
+        for name, email in (
+            ('thomas_lopez', 'thomas_lopez1234@gmail.com'),
+            ('anna_smith', 'anna_lopez@yahoo.com'),
+            ('john_brown', 'john_brown5678@gmail.com'),
+        ):
+            User.create(name=name, email=email, password_hash='-', role=role, profile=profile)
+        self.client = self.app.test_client()
+
+    def names(self, text: str):
+        return [user.name for user in search_users(text)]
+
+    def test_1_prefix_search_and_sync(self):
+        """Prefixes of words match, name matches rank first, index follows user changes"""
+        self.assertEqual(make_match_query('Lop "gm'), '"Lop"* "gm"*')
+        self.assertIsNone(make_match_query(' *" '))
+        self.assertEqual(self.names('lop'), ['thomas_lopez', 'anna_smith'])
+        self.assertEqual(self.names('lop gmail'), ['thomas_lopez'])
+        self.assertEqual(self.names('JOHN_B'), ['john_brown'])
+        self.assertEqual(self.names('"'), [])
+
+        User.update(name='thomas_green').where(User.name == 'thomas_lopez').execute()
+        User.delete().where(User.name == 'anna_smith').execute()
+        self.assertEqual(self.names('green'), ['thomas_green'])
+        self.assertEqual(self.names('lop'), ['thomas_green'])
+        self.assertEqual(self.names('anna'), [])
+
+    def test_2_search_endpoints(self):
+        """Search box filters email list and json endpoint returns ranked users"""
+        response = self.client.get('/email/search?q=lop&limit=1')
+        self.assertEqual(response.get_json(), [
+            {'id': 1, 'name': 'thomas_lopez', 'email': 'thomas_lopez1234@gmail.com', 'role': 'admin'}
+        ])
+        page = self.client.get('/email/show?q=brown').get_data(as_text=True)
+        self.assertIn('john_brown5678@gmail.com', page)
+        self.assertNotIn('thomas_lopez1234@gmail.com', page)
+        self.assertIn('value="brown"', page)
+
+    def test_3_migration_indexes_existing_users(self):
+        """Migration builds index of users created before it"""
+        self.db.drop_tables([UserSearch])
+        for trigger in ('user_search_insert', 'user_search_delete', 'user_search_update'):
+            self.db.execute_sql(f'DROP TRIGGER {trigger}')
+        self.assertIn('0002_user_search', migrate(self.db))
+        self.assertEqual(self.names('anna'), ['anna_smith'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import os
+import json
 import unittest
 from unittest.mock import patch, MagicMock
 from flask import url_for
@@ -12,7 +13,8 @@ from app import create_app
 from generate_data.db.create_test_database import create_db, USERS, PROFILES, ROLES
 from app.auth.models import Role, User
 from app.weather.models import Country, UserCity, City
-from weather.getting_weather import main as main_weather, parse_weather_data, read_city_weather_from_json
+from weather.getting_weather import main as main_weather, parse_weather_data
+from weather.data import read_fixtures
 from weather.fill_country_db import main as main_fill_weather, FILENAME as countries_json
 
 
@@ -38,7 +40,7 @@ class UsersTestCase(unittest.TestCase):
         cls.users = USERS
         cls.profiles = PROFILES
         cls.roles = ROLES
-        cls.cities = read_city_weather_from_json()
+        cls.cities = read_fixtures()
         create_db(cls.db, cls.users, cls.profiles, cls.roles)
         main_fill_weather(PATH_TO_COUNTRIES_JSON, cls.db)
 
@@ -59,13 +61,13 @@ class UsersTestCase(unittest.TestCase):
         """Get city weather info from weather index page"""
         city_name = 'tokyo'
         city_tokyo_json = self.cities['tokyo_jp']
-        prepared_tokyo = parse_weather_data(city_tokyo_json)
+        prepared_tokyo = parse_weather_data(city_tokyo_json).to_dict()
         country = Country.select().where(Country.code == prepared_tokyo['country']).first()
         prepared_tokyo['country'] = country.name
 
         request_response_mock = MagicMock()
         request_response_mock.status_code = 200
-        request_response_mock.json.return_value = city_tokyo_json
+        request_response_mock.content = json.dumps(city_tokyo_json).encode()
         requests_mock.get.return_value = request_response_mock
         response = self.client.post(
             url_for('weather.index'),
@@ -271,12 +273,12 @@ class UsersTestCase(unittest.TestCase):
         city = City.select().where(City.id == choice(self.user.city_user).city_id).first()
         city_json = self.cities[f'{city.name.lower()}_{city.country.code.lower()}']
 
-        prepared_city = parse_weather_data(city_json)
+        prepared_city = parse_weather_data(city_json).to_dict()
         prepared_city['country'] = city.country.name
 
         request_response_mock = MagicMock()
         request_response_mock.status_code = 200
-        request_response_mock.json.return_value = city_json
+        request_response_mock.content = json.dumps(city_json).encode()
         requests_mock.get.return_value = request_response_mock
 
         login_user(self.user)
@@ -340,7 +342,7 @@ class UsersTestCase(unittest.TestCase):
 
         request_response_mock = MagicMock()
         request_response_mock.status_code = 404
-        request_response_mock.json.return_value = error_json
+        request_response_mock.content = json.dumps(error_json).encode()
         requests_mock.get.return_value = request_response_mock
 
         response = self.client.get(
@@ -0,0 +1,118 @@
+import os
+import json
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import weather
+from app import create_app
+from app.weather.models import Country, City, WeatherObservation, WeatherRollup
+from app.weather.history import (
+    record_observation, aggregate_observations, _aggregate_python, get_observations, load_numpy
+)
+from weather.data import read_fixtures
+from weather.weather_record import WeatherRecord
+from weather.getting_weather import main as main_weather
+from weather.fill_country_db import main as main_fill_weather, FILENAME as countries_json
+
+
+PATH_TO_COUNTRIES_JSON = os.path.join(Path(weather.__file__).parent, countries_json)
+
+
+class WeatherHistoryTestCase(unittest.TestCase):
+    """Test weather history"""
+    ctx = None
+    db = None
+    app = None
+
+    @classmethod
+    def setUpClass(cls):
+        """Before all tests"""
+        cls.app = create_app('testing')
+        cls.db = cls.app.config['db']
+        cls.cities = read_fixtures()
+        main_fill_weather(PATH_TO_COUNTRIES_JSON, cls.db)
+        cls.madrid = City.create(name='Madrid', country=Country.get(Country.code == 'ES'))
+        cls.ctx = cls.app.test_request_context()
+        cls.ctx.push()
+        cls.client = cls.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        """After all tests"""
+        cls.ctx.pop()
+
+    def test_1_record_observation_updates_rollups(self):
+        """Observations of monitored city are folded into hourly and daily rollups once"""
+        madrid = self.cities['madrid_es']
+        start = 1673308800
+        for minutes, temperature in ((0, 10.0), (10, 14.0), (70, 6.0)):
+            payload = {**madrid, 'dt': start + minutes * 60, 'main': {**madrid['main'], 'temp': temperature}}
+            self.assertTrue(record_observation('madrid', WeatherRecord.from_response(payload)))
+        record_observation('madrid', WeatherRecord.from_response({**madrid, 'dt': start}))
+        self.assertFalse(record_observation('atlantis', WeatherRecord.from_response(madrid)))
+
+        self.assertEqual(WeatherObservation.select().where(WeatherObservation.city == self.madrid).count(), 3)
+        hours = list(
+            WeatherRollup
+            .select()
+            .where(WeatherRollup.city == self.madrid, WeatherRollup.resolution == 'hour')
+            .order_by(WeatherRollup.bucket)
+        )
+        self.assertEqual([hour.samples for hour in hours], [2, 1])
+        self.assertEqual((hours[0].temperature_min, hours[0].temperature_max), (10.0, 14.0))
+        self.assertEqual(hours[0].temperature_avg, 12.0)
+        day = WeatherRollup.get(WeatherRollup.city == self.madrid, WeatherRollup.resolution == 'day')
+        self.assertEqual(day.samples, 3)
+        self.assertEqual(day.temperature_min, 6.0)
+
+    def test_2_history_api(self):
+        """History endpoint returns rollups, raw and ad-hoc aggregated observations"""
+        url = '/api/v1/cities/madrid/history/'
+        daily = self.client.get(url, query_string={'resolution': 'day'}).get_json()
+        self.assertEqual(daily['history'][0]['samples'], 3)
+        raw = self.client.get(url, query_string={'resolution': 'raw', 'start': 1673308800 + 600}).get_json()
+        self.assertEqual([row['temperature'] for row in raw['history']], [14.0, 6.0])
+        two_hours = self.client.get(url, query_string={'bucket': 7200}).get_json()
+        self.assertEqual(two_hours['history'][0]['temperature_max'], 14.0)
+        self.assertEqual(self.client.get('/api/v1/cities/atlantis/history/').status_code, 404)
+        self.assertEqual(self.client.get(url, query_string={'resolution': 'week'}).status_code, 400)
+
+    @unittest.skipUnless(load_numpy() is not None, 'numpy is not installed')
+    def test_3_vectorized_aggregation_matches_fallback(self):
+        """Vectorized aggregation matches pure python aggregation"""
+        observations = get_observations(self.madrid.id)
+        self.assertEqual(
+            aggregate_observations(observations, 1800),
+            _aggregate_python(observations, 1800)
+        )
+
+    @patch('weather.getting_weather.requests')
+    def test_4_upstream_fetch_is_recorded(self, requests_mock):
+        """Every upstream fetch of monitored city is recorded"""
+        madrid = {**self.cities['madrid_es'], 'dt': 1673500000}
+        request_response_mock = MagicMock()
+        request_response_mock.status_code = 200
+        request_response_mock.content = json.dumps(madrid).encode()
+        requests_mock.get.return_value = request_response_mock
+        main_weather('madrid', self.app.config['WEATHER_API_KEY'])
+        self.assertTrue(
+            WeatherObservation
+            .select()
+            .where(WeatherObservation.city == self.madrid, WeatherObservation.timestamp == 1673500000)
+            .exists()
+        )
+
+    def test_5_missing_history_tables(self):
+        """Application creates history tables, failed history write does not break weather lookup"""
+        self.assertTrue(self.db.table_exists('weatherobservation'))
+        self.db.drop_tables([WeatherRollup])
+        self.addCleanup(self.db.create_tables, [WeatherRollup])
+        madrid = {**self.cities['madrid_es'], 'dt': 1673600000}
+        with self.assertLogs('app.weather.history', 'ERROR'):
+            self.assertFalse(record_observation('madrid', WeatherRecord.from_response(madrid)))
+        self.assertFalse(WeatherObservation.select().where(WeatherObservation.timestamp == 1673600000).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,11 @@
 import json
-from datapackage import Package
 from typing import List, Dict
 
 
 def get_codes(url: str):
     """Get countries codes from datapackage json"""
+    from datapackage import Package
+
     package = Package(url)
 
     for resource in package.resources:
@@ -0,0 +1,18 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+
+PATH_TO_FIXTURES = Path(__file__).parent
+
+
+def read_fixtures(path_to_dir: str = PATH_TO_FIXTURES) -> Dict[str, dict]:
+    """Read sample openweathermap.org responses (city_cc.json) from directory"""
+    fixtures = {}
+    for filename in os.listdir(path_to_dir):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(path_to_dir, filename)) as json_file:
+            fixtures[filename.split('.')[0]] = json.load(json_file)
+    return fixtures
@@ -1,26 +1,23 @@
 import os
-from pathlib import Path
 from dotenv import load_dotenv
 from typing import List, Dict
 
-import web
-from app.weather.models import Country, City, UserCity
+from definitions import PATH_TO_ENV_FILE, PATH_TO_ROOT
+from app.weather.models import Country, City, UserCity, WeatherObservation, WeatherRollup
 from weather.country_codes import read_codes_data_from_json, FILENAME
 
 
 def get_path_to_db():
     """Get path to database"""
-    path_to_base_dir = Path(web.__file__).parent
-    path_to_env_file = os.path.join(path_to_base_dir, '.flaskenv')
-    load_dotenv(path_to_env_file)
+    load_dotenv(PATH_TO_ENV_FILE)
     db_name = os.environ.get('DATABASE')
-    path_to_db = os.path.join(path_to_base_dir, db_name)
+    path_to_db = os.path.join(PATH_TO_ROOT, db_name)
     return path_to_db
 
 
 def convert_data_from_json_to_db(countries: List[Dict[str, str]], db):
     """Convert data from json file to db"""
-    db.create_tables([Country, City, UserCity])
+    db.create_tables([Country, City, UserCity, WeatherObservation, WeatherRollup])
     Country.delete().execute()
 
     for country in countries:
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, TextIO
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS weather_response (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    city TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weather_response_city_fetched_at
+    ON weather_response (city, fetched_at);
+CREATE TABLE IF NOT EXISTS weather_response_latest (
+    city TEXT PRIMARY KEY,
+    response_id INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def normalize_city(city: str):
+    """Normalize city name to store key"""
+    return city.strip().lower()
+
+
+def compress_payload(payload: dict):
+    """Compress raw upstream response"""
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def decompress_payload(blob: bytes):
+    """Decompress raw upstream response"""
+    return json.loads(zlib.decompress(blob))
+
+
+class WeatherResponseStore:
+    """Append-only log of raw openweathermap.org responses keyed by city and time"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = None
+        self.connection = None
+        self.lock = threading.Lock()
+        if path:
+            self.initialize(path)
+
+    def initialize(self, path: str):
+        """Open (or create) store at path, ':memory:' keeps it in process"""
+        self.close()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    @property
+    def is_initialized(self):
+        return self.connection is not None
+
+    def close(self):
+        """Close store connection"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def append(self, city: str, payload: dict, fetched_at: Optional[float] = None):
+        """Append raw response and move latest pointer of city"""
+        city = normalize_city(city)
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        blob = compress_payload(payload)
+        with self.lock:
+            self.connection.execute('BEGIN')
+            try:
+                cursor = self.connection.execute(
+                    'INSERT INTO weather_response (city, fetched_at, payload) VALUES (?, ?, ?)',
+                    (city, fetched_at, blob)
+                )
+                self.connection.execute(
+                    'INSERT INTO weather_response_latest (city, response_id, fetched_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT (city) DO UPDATE SET response_id = excluded.response_id, '
+                    'fetched_at = excluded.fetched_at WHERE excluded.fetched_at >= fetched_at',
+                    (city, cursor.lastrowid, fetched_at)
+                )
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+        return cursor.lastrowid
+
+    def latest(self, city: str):
+        """Return (fetched_at, payload) of the latest response for city or None"""
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT r.fetched_at, r.payload FROM weather_response_latest l '
+                'JOIN weather_response r ON r.id = l.response_id WHERE l.city = ?',
+                (normalize_city(city),)
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], decompress_payload(row[1])
+
+    def latest_all(self, newer_than: Optional[float] = None):
+        """Return {city: (fetched_at, payload)} of latest responses, used for cache warm start"""
+        query = ('SELECT l.city, r.fetched_at, r.payload FROM weather_response_latest l '
+                 'JOIN weather_response r ON r.id = l.response_id')
+        params = ()
+        if newer_than is not None:
+            query += ' WHERE l.fetched_at >= ?'
+            params = (newer_than,)
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return {city: (fetched_at, decompress_payload(blob)) for city, fetched_at, blob in rows}
+
+    def range(self, city: str, start: Optional[float] = None, end: Optional[float] = None):
+        """Return list of (fetched_at, payload) for city in [start, end) ordered by time"""
+        query = 'SELECT fetched_at, payload FROM weather_response WHERE city = ?'
+        params = [normalize_city(city)]
+        if start is not None:
+            query += ' AND fetched_at >= ?'
+            params.append(start)
+        if end is not None:
+            query += ' AND fetched_at < ?'
+            params.append(end)
+        query += ' ORDER BY fetched_at'
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [(fetched_at, decompress_payload(blob)) for fetched_at, blob in rows]
+
+    def count(self, city: Optional[str] = None):
+        """Count stored responses"""
+        with self.lock:
+            if city is None:
+                return self.connection.execute('SELECT COUNT(*) FROM weather_response').fetchone()[0]
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM weather_response WHERE city = ?', (normalize_city(city),)
+            ).fetchone()[0]
+
+    def cities(self) -> List[str]:
+        """List cities with at least one stored response"""
+        with self.lock:
+            rows = self.connection.execute('SELECT city FROM weather_response_latest ORDER BY city').fetchall()
+        return [row[0] for row in rows]
+
+    def compact(self, older_than: float, vacuum: bool = False):
+        """Delete responses older than timestamp, latest response of every city is always kept"""
+        with self.lock:
+            cursor = self.connection.execute(
+                'DELETE FROM weather_response WHERE fetched_at < ? '
+                'AND id NOT IN (SELECT response_id FROM weather_response_latest)',
+                (older_than,)
+            )
+            deleted = cursor.rowcount
+        if vacuum and self.path != ':memory:':
+            self.vacuum()
+        return deleted
+
+    def vacuum(self):
+        """Rebuild store file in own connection, store lock stays free for appends and reads meanwhile"""
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            connection.execute('VACUUM')
+        finally:
+            connection.close()
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over all stored responses ordered by id"""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    'SELECT id, city, fetched_at, payload FROM weather_response WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, city, fetched_at, blob in rows:
+                yield {'city': city, 'fetched_at': fetched_at, 'payload': decompress_payload(blob)}
+            last_id = rows[-1][0]
+
+    def export(self, file: TextIO):
+        """Export all responses as newline delimited json, return number of exported rows"""
+        exported = 0
+        for row in self.iter_all():
+            file.write(json.dumps(row, separators=(',', ':')))
+            file.write('\n')
+            exported += 1
+        return exported
+
+    def import_json_files(self, path_to_dir: str):
+        """Import legacy per city json files (city_cc.json) from directory"""
+        imported = []
+        for filename in sorted(os.listdir(path_to_dir)):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(path_to_dir, filename)) as json_file:
+                payload = json.load(json_file)
+            city = payload.get('name') or filename.split('_')[0]
+            self.append(city, payload, fetched_at=payload.get('dt'))
+            imported.append(city)
+        return imported
+
+
+response_store = WeatherResponseStore()
+
+
+def record_response(city: str, payload: dict):
+    """Write response into store when store is initialized"""
+    if response_store.is_initialized:
+        response_store.append(city, payload)
+
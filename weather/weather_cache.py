@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from weather.response_store import WeatherResponseStore, normalize_city
+from weather.weather_record import WeatherRecord
+
+
+class WeatherCache:
+    """Bounded LRU cache of WeatherRecord by city with time to live"""
+
+    def __init__(self, ttl: int = 0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.records = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl: int, maxsize: int):
+        """Set time to live (0 disables cache) and size limit"""
+        with self.lock:
+            self.ttl = ttl
+            self.maxsize = maxsize
+            self.records.clear()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, city: str) -> Optional[WeatherRecord]:
+        """Get fresh record of city"""
+        if not self.enabled:
+            return None
+        key = normalize_city(city)
+        with self.lock:
+            entry = self.records.get(key)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            self.records.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, city: str, record: WeatherRecord, fetched_at: Optional[float] = None):
+        """Put record of city, fetched_at defaults to now"""
+        if not self.enabled:
+            return
+        expires_at = (time.time() if fetched_at is None else fetched_at) + self.ttl
+        key = normalize_city(city)
+        with self.lock:
+            self.records[key] = (expires_at, record)
+            self.records.move_to_end(key)
+            while len(self.records) > self.maxsize:
+                self.records.popitem(last=False)
+
+    def clear(self):
+        """Drop all records"""
+        with self.lock:
+            self.records.clear()
+
+    def warm_up(self, store: WeatherResponseStore):
+        """Load still fresh responses from store, return number of loaded records"""
+        if not self.enabled or not store.is_initialized:
+            return 0
+        latest = store.latest_all(newer_than=time.time() - self.ttl)
+        for city, (fetched_at, payload) in latest.items():
+            self.put(city, WeatherRecord.from_response(payload), fetched_at)
+        return len(latest)
+
+    def __len__(self):
+        return len(self.records)
+
+
+weather_cache = WeatherCache()
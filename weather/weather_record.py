@@ -0,0 +1,51 @@
+import sys
+from typing import NamedTuple
+
+
+def get_weather_icon_url(icon_name: str):
+    """Get weather url icon"""
+    icon_url = f'http://openweathermap.org/img/w/{icon_name}.png'
+    return icon_url
+
+
+class WeatherRecord(NamedTuple):
+    """Fields of openweathermap.org response used by the app"""
+    icon: str
+    latitude: float
+    longitude: float
+    sky: str
+    temperature: float
+    wind_speed: float
+    country: str
+    timestamp: int
+
+    @classmethod
+    def from_response(cls, city_weather: dict):
+        """Build record from raw response, repeated strings are interned"""
+        weather = city_weather['weather'][0]
+        return cls(
+            sys.intern(weather['icon']),
+            city_weather['coord']['lat'],
+            city_weather['coord']['lon'],
+            sys.intern(weather['description']),
+            city_weather['main']['temp'],
+            city_weather['wind']['speed'],
+            sys.intern(city_weather['sys']['country']),
+            city_weather.get('dt', 0),
+        )
+
+    @property
+    def icon_url(self):
+        return get_weather_icon_url(self.icon)
+
+    def to_dict(self):
+        """Fields shown on weather pages"""
+        return {
+            'icon_url': self.icon_url,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'sky': self.sky,
+            'temperature': self.temperature,
+            'wind_speed': self.wind_speed,
+            'country': self.country
+        }